@@ -38,7 +38,9 @@ async def get_db():
 async def init_db():
     from App.Models import stock  # Import models inside the function
     print("Initializing Database...")  # Debugging message
+    from App.Services.partition_service import ensure_partitions
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await ensure_partitions(conn)  # 🗂️ Partitioned tables reject rows without a matching month partition
     print("Database Initialized!")  # Debugging message
 
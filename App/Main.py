@@ -5,7 +5,11 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from App.Config.database import get_db, init_db
 from App.Services.stock_service import load_csv_to_db
 from contextlib import asynccontextmanager
-from App.Routers import stock_routers, auth_routers, feat_routers
+from App.Routers import stock_routers, auth_routers, feat_routers, alert_routers
+from App.Services.alert_service import load_alert_index
+from App.Services.trending_service import seed_trending
+from App.Services.quote_board import seed_quote_board
+from App.Services.price_listener import price_listener
 from starlette.middleware.sessions import SessionMiddleware
 import os
 from fastapi.middleware.cors import CORSMiddleware
@@ -22,14 +26,20 @@ async def lifespan(app: FastAPI):
     async for db in get_db():
         await init_db()
         # await load_csv_to_db(db)
+        await load_alert_index(db)  # 🔔 In-memory threshold index for price alerts
+        await seed_quote_board(db)  # 📋 No-op when another worker already filled the shared board
+        await seed_trending(db)  # 🔥 Top movers ranked over every stored quote, not only this process's ticks
         break
 
     # ✅ START SCHEDULER HERE!
     app.state.db_session = SessionLocal
     start_scheduler(app)
+    price_listener.start()  # 📡 Applies other workers' price writes to this worker's caches
 
     yield
 
+    await price_listener.stop()
+
 app = FastAPI(lifespan=lifespan)
 
 # ✅ Allow requests from your frontend (adjust the URL accordingly)
@@ -65,6 +75,7 @@ async def log_requests(request: Request, call_next):
 app.include_router(stock_routers.stock_router)
 app.include_router(stock_routers.user_router)
 app.include_router(feat_routers.feat_router)
+app.include_router(alert_routers.alert_router)
 # ✅ Register watchlist stock routes
 
 
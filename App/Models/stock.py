@@ -1,6 +1,6 @@
 # App/Models/stock.py
 
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Text, ARRAY
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Boolean, ForeignKey, DateTime, Date, Text, ARRAY, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from App.Config.database import Base
 from datetime import datetime
@@ -28,19 +28,24 @@ class UserStock(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
-    symbol = Column(String, ForeignKey("stocks.symbol"), nullable=False)  
+    symbol = Column(String, ForeignKey("stocks.symbol"), nullable=False, index=True)  # Index: symbol -> holders on each tick
     name = Column(String, nullable=False)
     purchase_price = Column(Float, nullable=False)
     quantity = Column(Integer, nullable=False)
     purchase_date = Column(DateTime, default=datetime.utcnow)
     notes = Column(Text, nullable=True)
+    mark_price = Column(Float, nullable=True)  # Price this holding is valued at in portfolio_aggregates
 
     # Relationship with Stock
     stock = relationship("Stock", back_populates="user_stocks")
 
-# ✅ Portfolio Snapshot Model
+# ✅ Portfolio Snapshot Model (monthly RANGE partitions on created_at, see partition_service)
 class PortfolioSnapshot(Base):
     __tablename__ = "portfolio_snapshots"  # Renamed from `portfolio` for clarity
+    __table_args__ = (
+        Index("ix_portfolio_snapshots_user_id_created_at", "user_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
@@ -48,13 +53,17 @@ class PortfolioSnapshot(Base):
     current_value = Column(Float, nullable=False)
     total_profit_loss = Column(Float, nullable=False)
     overall_change = Column(Float, nullable=False)
-    created_at = Column(DateTime, default=func.now())
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow)  # Partition key must be in the PK
 
-# ✅ Stock Analysis Snapshot Model (MODIFIED)
+# ✅ Stock Analysis Snapshot Model (monthly RANGE partitions on timestamp)
 class StockAnalysisSnapshot(Base):
     __tablename__ = "stock_analysis_snapshots"
+    __table_args__ = (
+        Index("ix_stock_analysis_snapshots_symbol_timestamp", "symbol", "timestamp"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     symbol = Column(String, ForeignKey("stocks.symbol"), index=True)  # Added ForeignKey to maintain integrity
     name = Column(String)
@@ -65,7 +74,7 @@ class StockAnalysisSnapshot(Base):
     percentage_change = Column(Float)
     total_investment = Column(Float)
     current_value = Column(Float)
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, primary_key=True, default=datetime.utcnow)  # Partition key must be in the PK
 
     # Relationship with Stock (NEW)
     stock = relationship("Stock", back_populates="stock_snapshots")
@@ -88,24 +97,37 @@ class TrendingStock(Base):
 
 
 
-class Watchlist(Base):
-    __tablename__ = "watchlist"
+# ✅ One row per watched symbol (max 10 per user); PK serves user -> symbols, index serves symbol -> users
+class WatchlistItem(Base):
+    __tablename__ = "watchlist_items"
+    __table_args__ = (Index("ix_watchlist_items_symbol_user_id", "symbol", "user_id"),)
 
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)  
-    stocks = Column(ARRAY(String), default=[])  # Store up to 10 stock symbols
-    created_at = Column(DateTime, default=datetime.utcnow)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    symbol = Column(String, primary_key=True)
+    added_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+
+# ✅ Symbols someone holds or watches, ref-counted by the add/remove paths
+class ActiveSymbol(Base):
+    __tablename__ = "active_symbols"
+
+    symbol = Column(String, primary_key=True)
+    holder_count = Column(Integer, nullable=False, default=0)  # Distinct users with at least one user_stocks lot
+    watcher_count = Column(Integer, nullable=False, default=0)  # watchlist_items rows
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
 
 
+# Monthly RANGE partitions on recorded_at
 class StockHistory(Base):
     __tablename__ = "stock_history"
+    __table_args__ = {"postgresql_partition_by": "RANGE (recorded_at)"}
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     symbol = Column(String, ForeignKey("stock_data.symbol"), nullable=False, index=True)  # Link to StockData
     company_name = Column(String, nullable=True)
-    recorded_at = Column(DateTime, default=datetime.utcnow)  # Timestamp of the data entry
+    recorded_at = Column(DateTime, primary_key=True, default=datetime.utcnow)  # Timestamp of the data entry (partition key)
     current_price = Column(Float, nullable=False)
     previous_close_price = Column(Float, nullable=True)
     percent_change = Column(Float, nullable=True)
@@ -117,6 +139,22 @@ class StockHistory(Base):
     stock = relationship("StockData", back_populates="history")
 
 
+# ✅ Pre-aggregated OHLCV per symbol per day / week / month, maintained from ingested bars
+class PriceRollup(Base):
+    __tablename__ = "price_rollups"
+
+    symbol = Column(String, primary_key=True)
+    resolution = Column(String, primary_key=True)  # day / week / month
+    bucket_start = Column(Date, primary_key=True)  # Day, Monday of the week, or 1st of the month
+    open = Column(Float, nullable=True)
+    high = Column(Float, nullable=True)
+    low = Column(Float, nullable=True)
+    close = Column(Float, nullable=False)  # Last close inside the bucket
+    volume = Column(BigInteger, nullable=False, default=0)
+    bar_count = Column(Integer, nullable=False, default=1)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class StockData(Base):
     __tablename__ = "stock_data"
 
@@ -134,3 +172,81 @@ class StockData(Base):
     # Relationship with StockHistory
     history = relationship("StockHistory", back_populates="stock", cascade="all, delete-orphan")
 
+
+
+# ✅ Ledger of scheduled refresh runs so a crashed run can resume from its checkpoint
+class RefreshRun(Base):
+    __tablename__ = "refresh_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_name = Column(String, nullable=False, index=True)  # e.g. "user_snapshots", "user_stocks"
+    status = Column(String, nullable=False, default="running")  # running / failed / completed / abandoned
+    cursor = Column(Integer, nullable=False, default=0)  # Highest user id whose chunk is committed
+    resume_count = Column(Integer, nullable=False, default=0, server_default="0")  # Times picked up after a failure or stall
+    chunk_size = Column(Integer, nullable=False)
+    chunks_completed = Column(Integer, nullable=False, default=0)
+    users_processed = Column(Integer, nullable=False, default=0)
+    users_failed = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+    chunks = relationship("RefreshRunChunk", back_populates="run", cascade="all, delete-orphan")
+
+
+class RefreshRunChunk(Base):
+    __tablename__ = "refresh_run_chunks"
+    __table_args__ = (UniqueConstraint("run_id", "chunk_index", name="uq_refresh_run_chunk"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(Integer, ForeignKey("refresh_runs.id", ondelete="CASCADE"), nullable=False)
+    chunk_index = Column(Integer, nullable=False)
+    first_user_id = Column(Integer, nullable=False)
+    last_user_id = Column(Integer, nullable=False)
+    status = Column(String, nullable=False, default="running")  # running / completed
+    processed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+    run = relationship("RefreshRun", back_populates="chunks")
+
+
+
+# ✅ "Notify me when SYMBOL goes above/below X" (one-shot: deactivated once triggered)
+class PriceAlert(Base):
+    __tablename__ = "price_alerts"
+    __table_args__ = (Index("ix_price_alerts_active_symbol", "active", "symbol"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    symbol = Column(String, nullable=False)
+    direction = Column(String, nullable=False)  # above / below
+    threshold = Column(Float, nullable=False)
+    active = Column(Boolean, nullable=False, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    triggered_at = Column(DateTime, nullable=True)
+    triggered_price = Column(Float, nullable=True)
+
+
+# ✅ Push destinations (FCM registration tokens) a user's alerts are delivered to
+class DeviceToken(Base):
+    __tablename__ = "device_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    token = Column(String, unique=True, nullable=False)
+    platform = Column(String, nullable=False, default="web")
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_seen_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+# ✅ Running per-user totals, moved by price deltas and holding edits (see portfolio_aggregates service)
+class PortfolioAggregate(Base):
+    __tablename__ = "portfolio_aggregates"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    total_investment = Column(Float, nullable=False, default=0.0)
+    current_value = Column(Float, nullable=False, default=0.0)
+    holdings = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
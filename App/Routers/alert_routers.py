@@ -0,0 +1,71 @@
+# App/Routers/alert_routers.py
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from App.Config.database import get_db
+from App.Config.debs import get_current_user
+from App.Models.user import User
+from App.Schemas.stock import PriceAlertCreate, PriceAlertResponse, DeviceTokenCreate
+from App.Services.alert_service import create_alert, get_user_alerts, delete_alert
+from App.Services.notification_service import register_device, remove_device, delivery_metrics
+from typing import List
+import asyncio
+
+
+alert_router = APIRouter(
+    prefix="/alerts",
+    tags=["Alerts"]
+)
+
+
+@alert_router.post("/", response_model=PriceAlertResponse, summary="Alert when a watchlist stock crosses a price")
+async def add_alert(
+    request: PriceAlertCreate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)):
+    return await create_alert(db, current_user.id, request)
+
+
+@alert_router.get("/", response_model=List[PriceAlertResponse], summary="List the user's alerts")
+async def list_alerts(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)):
+    return await get_user_alerts(db, current_user.id)
+
+
+# Fixed paths first, so they are not read as /{alert_id}
+@alert_router.post("/devices", summary="Register a push token for alert notifications")
+async def add_device(
+    request: DeviceTokenCreate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)):
+    await register_device(db, current_user.id, request)
+    return {"message": "Device registered successfully"}
+
+
+@alert_router.delete("/devices", summary="Stop sending alert notifications to a push token")
+async def delete_device(
+    token: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)):
+    if not await remove_device(db, current_user.id, token):
+        raise HTTPException(status_code=404, detail="Device not found")
+    return {"message": "Device removed successfully"}
+
+
+@alert_router.get("/metrics", summary="Notification throughput and tick-to-delivery latency")
+async def notification_metrics(current_user: User = Depends(get_current_user)):
+    try:
+        return await asyncio.to_thread(delivery_metrics)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Notification metrics unavailable: {e}")
+
+
+@alert_router.delete("/{alert_id}", summary="Delete an alert")
+async def remove_alert(
+    alert_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)):
+    if not await delete_alert(db, current_user.id, alert_id):
+        raise HTTPException(status_code=404, detail="Alert not found")
+    return {"message": "Alert deleted successfully"}
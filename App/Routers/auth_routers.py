@@ -14,6 +14,7 @@ from App.Config.debs import get_current_user
 from App.Schemas.auth import Token
 from sqlalchemy.future import select
 from App.Config.Oauth import get_oauth, SECRET_KEY, ALGORITHM
+from App.Services.portfolio_analytics import load_holdings
 
 
 router = APIRouter(prefix="/auth", tags=["auth"])
@@ -108,17 +109,11 @@ async def google_callback(request: Request, oauth=Depends(get_oauth)):
 
 @router.get("/portfolio")
 async def portfolio_value(db: AsyncSession=Depends(get_db)) :
-    result = await db.execute(
-        select(
-            UserStock.symbol,
-            (UserStock.purchase_price * UserStock.quantity).label("total_value")
-            )
-    )
-    value = result.all()
-    portfolio = [{"symbol": stock[0], "total": stock[1]} for stock in value]
-    stock_val = sum(stock["total"] for stock in portfolio)
+    holdings = await load_holdings(db)
+    totals = holdings["purchase_price"].to_numpy() * holdings["quantity"].to_numpy()  # ✅ One vectorized multiply
+    portfolio = [{"symbol": symbol, "total": float(total)} for symbol, total in zip(holdings["symbol"], totals)]
 
-    return {"total_portfolio_value": stock_val, "portfolio": portfolio}
+    return {"total_portfolio_value": float(totals.sum()), "portfolio": portfolio}
 
 
 
@@ -1,17 +1,21 @@
 # App/Routers/feat_router.py
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.sql import func
 from App.Schemas.stock import WatchlistRequest
 from App.Models.user import User
-from App.Models.stock import Watchlist, StockData
+from App.Models.stock import StockData
 from App.Config.debs import get_current_user
 from App.Config.database import get_db
+from typing import List, Optional
+from App.Services.refresh_planner import request_traffic
+from App.Services.correlation_service import correlation_engine, DEFAULT_CORRELATION_WINDOW
 from App.Services.feat_service import(
     add_stock_to_watchlist, get_user_watchlist, check_stock_data,
-    update_watchlist_stocks, get_updated_watchlist
+    update_watchlist_stocks, get_updated_watchlist, remove_stock_from_watchlist,
+    get_watchlist_symbols, WATCHLIST_LIMIT
     )
 
 
@@ -37,6 +41,24 @@ async def get_watchlist(
 
 
 
+@feat_router.get("/correlation", summary="Correlation matrix of daily returns across the watchlist")
+async def get_watchlist_correlation(
+    window: int = Query(DEFAULT_CORRELATION_WINDOW, ge=10, le=1000, description="Most recent common trading days"),
+    symbols: Optional[List[str]] = Query(None, description=f"Up to {WATCHLIST_LIMIT} symbols; defaults to the user's watchlist"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)):
+    """
+    Pearson correlation of daily returns from stored history, for a heatmap.
+    """
+    symbols = symbols or await get_watchlist_symbols(current_user.id, db)
+    if not symbols:
+        raise HTTPException(status_code=404, detail="No watchlist found for user")
+    if len(symbols) > WATCHLIST_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {WATCHLIST_LIMIT} symbols")
+
+    return correlation_engine.correlation(symbols, window)
+
+
 @feat_router.post("/add", summary="Add a stock to the user's watchlist")
 async def add_stock(
     request: WatchlistRequest,
@@ -60,37 +82,12 @@ async def remove_watchlist(
 ):
     """Remove a stock from the user's watchlist without deleting the entire entry."""
 
-    # Fetch the user's watchlist
-    result = await db.execute(select(Watchlist).where(Watchlist.user_id == current_user.id))
-    watchlist = result.scalars().first()
+    # ✅ Deletes a single (user, symbol) row
+    removed = await remove_stock_from_watchlist(current_user.id, stock_symbol, db)
 
-    if not watchlist:
-        raise HTTPException(status_code=404, detail="Watchlist does not exist")
-
-    if stock_symbol not in watchlist.stocks:
+    if not removed:
         raise HTTPException(status_code=404, detail="Stock not found in watchlist")
 
-    # Use array_remove to update the array correctly
-    stmt = (
-        Watchlist.__table__.update()
-        .where(Watchlist.user_id == current_user.id)
-        .values(
-            stocks=func.array_remove(Watchlist.stocks, stock_symbol),
-            updated_at=func.now()
-        )
-    )
-    await db.execute(stmt)
-
-    # Fetch the updated watchlist
-    result = await db.execute(select(Watchlist).where(Watchlist.user_id == current_user.id))
-    watchlist = result.scalars().first()
-
-    # If the stocks array is empty, delete the watchlist
-    if not watchlist.stocks:
-        await db.delete(watchlist)
-
-    await db.commit()
-
     return {"message": f"Stock {stock_symbol} removed from watchlist"}
 
 
@@ -103,6 +100,7 @@ async def check_stock(
     db: AsyncSession = Depends(get_db),
 ):
     """Retrieve stock data from both StockData and StockHistory."""
+    request_traffic.record(symbol)
     return await check_stock_data(symbol, db)
 
 
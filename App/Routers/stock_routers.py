@@ -15,6 +15,16 @@ from App.Schemas.stock import (
     StockSymbolsRequest, UserStockResponse, UserStockCreate,
     UserStockUpdate, TrendingStockSchema, StockHistoryResponse                            
 )
+from App.Services.refresh_planner import request_traffic
+from App.Services.history_store import history_store, bars_to_columns
+from App.Services.downsampling import lttb_indices, MAX_CHART_POINTS
+from App.Services.rollup_service import get_rollups, RESOLUTIONS, DEFAULT_MAX_POINTS
+from App.Services.indicator_service import indicator_engine, resolve_params, INDICATORS
+from App.Services.trending_service import get_trending, TRENDING_TOP_K
+from App.Services.quote_board import quote_board
+from App.Services.portfolio_aggregates import get_portfolio_totals
+from App.Services.valuation_service import portfolio_value_series
+from App.Services.risk_service import portfolio_risk
 from App.Models.user import User
 from App.Models.stock import  UserStock, StockAnalysisSnapshot
 from sqlalchemy.future import select
@@ -33,15 +43,104 @@ user_router = APIRouter(prefix="/userstocks", tags=["User Stocks"])
 async def fetch_all_stocks(db: AsyncSession = Depends(get_db)):
     return await get_all_stocks(db)
 
+# 🔥 Top gainers, losers and most active (declared before /{symbol} so it is not read as a symbol)
+@stock_router.get("/trending")
+async def fetch_trending_stocks(
+    limit: int = Query(TRENDING_TOP_K, ge=1, le=TRENDING_TOP_K),
+    db: AsyncSession = Depends(get_db)
+):
+    return await get_trending(db, limit)
+
 # ✅ Get stock by symbol
 @stock_router.get("/{symbol}")
 async def fetch_stock(symbol: str, db: AsyncSession = Depends(get_db)):
+    request_traffic.record(symbol)
     stock = await get_stock_by_symbol(db, symbol)
     if not stock:
         raise HTTPException(status_code=404, detail="Stock not found")
     return stock
 
 
+# 📋 Latest quote from the shared-memory board (no DB round trip)
+@stock_router.get("/{symbol}/quote")
+async def fetch_stock_quote(symbol: str):
+    request_traffic.record(symbol)
+    quote = quote_board.get(symbol.upper())
+    if quote is None:
+        raise HTTPException(status_code=404, detail="No live quote for this symbol")
+    return quote
+
+
+# ✅ Daily OHLCV bars from the columnar history store (column arrays, not row objects)
+@stock_router.get("/{symbol}/ohlcv")
+async def fetch_stock_ohlcv(
+    symbol: str,
+    start_date: Optional[datetime] = Query(None, description="Start date (YYYY-MM-DD)"),
+    end_date: Optional[datetime] = Query(None, description="End date (YYYY-MM-DD)"),
+    max_points: Optional[int] = Query(None, ge=3, le=MAX_CHART_POINTS, description="Downsample to at most this many bars (LTTB on close)")
+):
+    request_traffic.record(symbol)
+    bars = history_store.read(symbol, start_date, end_date)
+    if max_points and len(bars) > max_points:
+        bars = bars[lttb_indices(bars["ts"], bars["close"], max_points)]
+    return {"symbol": symbol.upper(), **bars_to_columns(bars)}
+
+
+# ✅ Pre-aggregated day/week/month OHLCV; by default the finest resolution that fits max_points is picked (coarsest if none fits)
+@stock_router.get("/{symbol}/rollups")
+async def fetch_stock_rollups(
+    symbol: str,
+    start_date: Optional[datetime] = Query(None, description="Start date (YYYY-MM-DD), default one year back"),
+    end_date: Optional[datetime] = Query(None, description="End date (YYYY-MM-DD)"),
+    resolution: Optional[str] = Query(None, description=f"One of {', '.join(RESOLUTIONS)}"),
+    max_points: int = Query(DEFAULT_MAX_POINTS, ge=3, le=MAX_CHART_POINTS),
+    db: AsyncSession = Depends(get_db)
+):
+    if resolution and resolution not in RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of {', '.join(RESOLUTIONS)}")
+
+    request_traffic.record(symbol)
+    return await get_rollups(
+        db, symbol,
+        start_date.date() if start_date else None,
+        end_date.date() if end_date else None,
+        resolution, max_points
+    )
+
+
+# ✅ Latest SMA/EMA/RSI/MACD/Bollinger values at default parameters
+@stock_router.get("/{symbol}/indicators")
+async def fetch_stock_indicators(symbol: str):
+    request_traffic.record(symbol)
+    indicators = indicator_engine.latest(symbol)
+    if not indicators:
+        raise HTTPException(status_code=404, detail="No price history stored for this stock")
+    return {"symbol": symbol.upper(), "indicators": indicators}
+
+
+# ✅ One indicator's recent series (cached, advanced incrementally as bars arrive)
+@stock_router.get("/{symbol}/indicators/{name}")
+async def fetch_stock_indicator(
+    symbol: str,
+    name: str,
+    period: Optional[int] = Query(None, ge=2, le=500),
+    fast: Optional[int] = Query(None, ge=2, le=500),
+    slow: Optional[int] = Query(None, ge=2, le=500),
+    signal: Optional[int] = Query(None, ge=2, le=500),
+    std: Optional[float] = Query(None, gt=0, le=10),
+    points: int = Query(100, ge=1, le=MAX_CHART_POINTS)
+):
+    if name not in INDICATORS:
+        raise HTTPException(status_code=400, detail=f"indicator must be one of {', '.join(INDICATORS)}")
+
+    request_traffic.record(symbol)
+    params = resolve_params(name, period=period, fast=fast, slow=slow, signal=signal, std=std)
+    data = indicator_engine.get(symbol, name, params, points)
+    if not data:
+        raise HTTPException(status_code=404, detail="No price history stored for this stock")
+    return data
+
+
 # ✅ Update stock price
 @stock_router.put("/{symbol}")
 async def modify_stock(symbol: str, price: float, db: AsyncSession = Depends(get_db)):
@@ -153,6 +252,15 @@ async def get_user_portfolio_performance(
     return portfolio_data
 
 
+# 🧮 Running totals kept current by every price tick (one primary-key read)
+@user_router.get("/portfolio/summary")
+async def get_user_portfolio_summary(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    return await get_portfolio_totals(db, current_user.id)
+
+
 @user_router.post("/update-stocks")
 async def update_stocks_route(
     current_user: User = Depends(get_current_user),
@@ -171,10 +279,12 @@ async def get_stock_history(
     symbol: str,
     start_date: Optional[datetime] = Query(None, description="Start date (YYYY-MM-DD)"),
     end_date: Optional[datetime] = Query(None, description="End date (YYYY-MM-DD)"),
+    max_points: Optional[int] = Query(None, ge=3, le=MAX_CHART_POINTS, description="Downsample to at most this many points (LTTB)"),
     db: AsyncSession = Depends(get_db)
 ):
     """API endpoint to fetch stock price history with optional date filters"""
-    return await fetch_stock_history(symbol, start_date, end_date, db)
+    request_traffic.record(symbol)
+    return await fetch_stock_history(symbol, start_date, end_date, db, max_points)
 
 
 
@@ -191,3 +301,36 @@ async def update_stocks_route(
 
 
 
+
+
+# 🕰️ Portfolio worth at every day in a range, from stored closes (as_of answers a single day)
+@user_router.get("/portfolio/valuation")
+async def get_user_portfolio_valuation(
+    start_date: Optional[datetime] = Query(None, description="Start date (YYYY-MM-DD), default one year back"),
+    end_date: Optional[datetime] = Query(None, description="End date (YYYY-MM-DD), default today"),
+    as_of: Optional[datetime] = Query(None, description="Single date (YYYY-MM-DD); overrides start/end"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if as_of is not None:
+        start_date = end_date = as_of
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must be on or before end_date")
+    return await portfolio_value_series(
+        db, current_user.id,
+        start_date.date() if start_date else None,
+        end_date.date() if end_date else None
+    )
+
+
+# 📐 Volatility, beta and VaR from the daily cached covariance matrix
+@user_router.get("/portfolio/risk")
+async def get_user_portfolio_risk(
+    confidence: float = Query(0.95, ge=0.5, le=0.999, description="VaR confidence level"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    risk = await portfolio_risk(db, current_user.id, confidence)
+    if risk is None:
+        raise HTTPException(status_code=404, detail="No holdings with enough price history for risk metrics")
+    return risk
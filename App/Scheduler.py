@@ -3,15 +3,38 @@
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 import asyncio
 from App.Models.user import User
-from App.Services.stock_service import update_user_stocks
+from App.Services.stock_service import stage_user_stocks
+from App.Services.quote_service import fetch_quotes, save_quotes
+from App.Services.run_ledger import run_checkpointed, has_resumable_run
+from App.Services.alert_service import evaluate_price_ticks
+from App.Services.price_events import publish_price_events
+from App.Services.portfolio_aggregates import apply_price_deltas
+from App.Services.active_symbols import rebuild_active_symbols, get_active_symbols
+from App.Services.backfill_service import backfill_symbols
+from App.Services.partition_service import maintain_partitions
+from App.Services.rollup_service import refresh_rollups
+from App.Services.portfolio_analytics import revalue_all_users
+from App.Services.portfolio_aggregates import rebuild_portfolio_aggregates
+from App.Services.valuation_service import backfill_portfolio_snapshots
+from App.Services.risk_service import get_risk_model, RISK_BENCHMARK
+from App.Services.feat_service import refresh_stale_watchlist_data, STOCK_DATA_TTL_MINUTES
+from App.Services.refresh_planner import refresh_planner, compute_symbol_demand
+from App.Services.job_leader import quote_refresh_leader
+from App.Services.trending_service import flush_trending, TRENDING_FLUSH_SECONDS
 from App.Config.database import get_db
 from asyncio import get_event_loop, run_coroutine_threadsafe, get_running_loop
+from datetime import datetime, timedelta
+import os
 
 
+DEMAND_REFRESH_MINUTES = int(os.getenv("DEMAND_REFRESH_MINUTES", 15))
+RUN_RESUME_MINUTES = int(os.getenv("RUN_RESUME_MINUTES", 10))
+
 
 # Called in main.py's startup event
 def start_scheduler(app):
@@ -29,6 +52,45 @@ def start_scheduler(app):
         # ✅ Schedule coroutine to run in main event loop
         run_coroutine_threadsafe(run_all_user_updates(app), loop)
 
+    @scheduler.scheduled_job(
+        IntervalTrigger(minutes=RUN_RESUME_MINUTES)
+    )
+    def resume_stale_runs():
+        # ✅ Picks up checkpointed runs that failed or stopped checkpointing (crashed process)
+        run_coroutine_threadsafe(run_resume_stale_runs(app), loop)
+
+    @scheduler.scheduled_job(
+        IntervalTrigger(minutes=1)
+    )
+    def planned_refresh():
+        # ✅ Cheap when every exchange is closed: no provider call is made
+        run_coroutine_threadsafe(run_planned_refresh(app), loop)
+
+    @scheduler.scheduled_job(
+        IntervalTrigger(minutes=STOCK_DATA_TTL_MINUTES)
+    )
+    def stale_watchlist_refresh():
+        run_coroutine_threadsafe(run_stale_watchlist_refresh(app), loop)
+
+    @scheduler.scheduled_job(
+        CronTrigger(hour=1, minute=0, timezone="UTC")  # After the US close, before the NSE open
+    )
+    def history_backfill():
+        run_coroutine_threadsafe(run_history_backfill(app), loop)
+
+    @scheduler.scheduled_job(
+        CronTrigger(hour=0, minute=30, timezone="UTC")
+    )
+    def partition_maintenance():
+        run_coroutine_threadsafe(run_partition_maintenance(app), loop)
+
+    @scheduler.scheduled_job(
+        IntervalTrigger(seconds=TRENDING_FLUSH_SECONDS)
+    )
+    def trending_flush():
+        # ✅ No-op unless a quote arrived since the last flush
+        run_coroutine_threadsafe(run_trending_flush(app), loop)
+
     scheduler.start()
 
 
@@ -47,25 +109,162 @@ async def run_all_user_updates(app):
     try:
         # Use async_session() to create an actual session object
         async with async_session() as session:  # Create a session here
-            result = await session.execute(select(User.id))  # Fetch user IDs from DB
-            user_ids = [row[0] for row in result.fetchall()]  # Extract user IDs
+            # 🔁 Reconcile the incrementally maintained hot-symbol counts once a day
+            await rebuild_active_symbols(session)
+
+            # ✅ Chunked + checkpointed: a crashed run resumes after its last committed chunk
+            prices = {}
+            run_id = await run_checkpointed(
+                session, "user_stocks",
+                lambda user_id, db: stage_user_stocks(user_id, db, prices)
+            )
+            if run_id is None:
+                return  # Another process is running this job's current run
 
-            if len(user_ids) == 0:
-                print("❌ No users found in the database!")
-                return  # No users to update
+            # 📡 Prices the run saw: caches, running totals, then alerts (after the chunks committed)
+            await publish_price_events(session, {ticker: {"current_price": price} for ticker, price in prices.items()})
+            await apply_price_deltas(session, prices)
+            await session.commit()
+            await evaluate_price_ticks(session, prices)
 
-            print(f"👥 Found {len(user_ids)} user(s) to update.")
+            # 📸 Every user's portfolio valued in one vectorized pass
+            await revalue_all_users(session)
 
-            for user_id in user_ids:
-                try:
-                    print(f"📈 Updating user {user_id}...")
-                    await update_user_stocks(user_id, session)  # Call update for each user
-                except Exception as e:
-                    print(f"❌ Error updating user {user_id}: {e}")
+            # 🧮 Re-mark the running totals from scratch once a day
+            await rebuild_portfolio_aggregates(session)
 
     except Exception as e:
         print(f"❌ Error in run_all_user_updates: {e}")
 
 
+# Resumes the checkpointed user jobs whose last run failed or went stale
+async def run_resume_stale_runs(app):
+    async_session = app.state.db_session
+
+    try:
+        async with async_session() as session:
+            resume_stocks = await has_resumable_run(session, "user_stocks")
+            resume_snapshots = await has_resumable_run(session, "user_snapshots")
+
+        if resume_stocks:
+            print("♻️ Resuming the user_stocks run.")
+            await run_all_user_updates(app)  # start_or_resume_run picks the run up (one process wins)
+
+        if resume_snapshots:
+            from App.tasks.update_snapshots import update_all_users_snapshots  # Celery only when needed
+            await asyncio.to_thread(update_all_users_snapshots.apply_async, retry=False)
+            print("♻️ Queued a resume of the user_snapshots run.")
+
+    except Exception as e:
+        print(f"❌ Error in run_resume_stale_runs: {e}")
+
+
+# Refreshes the most in-demand due symbols in open markets, within the per-minute provider budget
+async def run_planned_refresh(app):
+    async_session = app.state.db_session
+
+    try:
+        # 👑 One process plans and spends the provider budget; every other worker's scheduler skips
+        if not await quote_refresh_leader.is_leader():
+            return
+
+        async with async_session() as session:
+            now = datetime.utcnow()
+            if (
+                refresh_planner.demand_updated_at is None
+                or now - refresh_planner.demand_updated_at >= timedelta(minutes=DEMAND_REFRESH_MINUTES)
+            ):
+                refresh_planner.set_demand(await compute_symbol_demand(session), now)
+                print(f"📊 Refresh demand recomputed for {len(refresh_planner)} symbol(s).")
+
+            due_symbols = refresh_planner.take_due(now)
+            if not due_symbols:
+                return
 
+            print(f"📡 Refreshing {len(due_symbols)} due symbol(s) in open markets.")
+            quotes = {}
+            try:
+                quotes = await asyncio.to_thread(fetch_quotes, due_symbols)
+                await save_quotes(session, quotes)
+            except Exception:
+                quotes = {}  # Nothing was saved: retry every symbol
+                raise
+            finally:
+                refresh_planner.mark_refreshed([symbol for symbol in due_symbols if symbol in quotes])
+                refresh_planner.mark_failed([symbol for symbol in due_symbols if symbol not in quotes])
 
+    except Exception as e:
+        print(f"❌ Error in run_planned_refresh: {e}")
+
+
+# Catches any watched StockData row the budgeted planner left older than the TTL
+async def run_stale_watchlist_refresh(app):
+    async_session = app.state.db_session
+
+    try:
+        if not await quote_refresh_leader.is_leader():
+            return  # Spends the same provider budget as the planner, so runs in the same process
+
+        async with async_session() as session:
+            await refresh_stale_watchlist_data(session, open_markets_only=True)
+
+    except Exception as e:
+        print(f"❌ Error in run_stale_watchlist_refresh: {e}")
+
+
+# Appends yesterday's daily bar (and repairs any gap) for every held or watched symbol,
+# then settles yesterday's portfolio snapshots on those closes
+async def run_history_backfill(app):
+    async_session = app.state.db_session
+
+    try:
+        async with async_session() as session:
+            symbols = await get_active_symbols(session)
+
+            # 📐 The risk model's benchmark is never held or watched but needs daily bars too
+            result = await asyncio.to_thread(backfill_symbols, [*symbols, RISK_BENCHMARK])
+            print(f"📚 History backfill: {result['requests']} request(s), {len(result['touched'])} symbol(s) updated.")
+
+            # 🔁 Roll up the last week for everyone too: snapshot jobs append bars without touching rollups
+            since = datetime.utcnow().date() - timedelta(days=7)
+            touched = {symbol: min(result["touched"].get(symbol, since), since) for symbol in symbols}
+            await refresh_rollups(session, touched)
+
+            # ✅ New bars in: rebuild this process's returns/covariance matrix now rather than on a request
+            await get_risk_model(session, force=True)
+
+            # 📸 Exactly one snapshot per user for yesterday, valued only once its bars have landed
+            yesterday = datetime.utcnow().date() - timedelta(days=1)
+            await backfill_portfolio_snapshots(session, yesterday, yesterday)
+
+    except Exception as e:
+        print(f"❌ Error in run_history_backfill: {e}")
+
+
+# Keeps future monthly partitions ready and retires expired ones
+async def run_partition_maintenance(app):
+    async_session = app.state.db_session
+
+    try:
+        async with async_session() as session:
+            result = await maintain_partitions(session)
+            print(f"🗂️ Partition maintenance: {result}")
+
+    except Exception as e:
+        print(f"❌ Error in run_partition_maintenance: {e}")
+
+
+# Writes the tracker's current top movers to trending_stocks
+async def run_trending_flush(app):
+    async_session = app.state.db_session
+
+    try:
+        # 👑 Only the worker that fetches quotes writes the table, so workers don't overwrite each other
+        if not await quote_refresh_leader.is_leader():
+            return
+
+        async with async_session() as session:
+            await flush_trending(session)
+
+    except Exception as e:
+        print(f"❌ Error in run_trending_flush: {e}")
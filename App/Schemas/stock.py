@@ -1,7 +1,7 @@
 # App/Schemas/stock.py
 
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Optional, List, Literal
 from datetime import datetime, date
 
 
@@ -59,7 +59,7 @@ class TrendingStockSchema(BaseModel):
     price: float
     change: float
     volume: int
-    last_updated: date
+    last_updated: datetime
 
     class Config:
         from_attributes = True   # ✅ Allows converting SQLAlchemy models to Pydantic
@@ -77,3 +77,28 @@ class StockHistoryResponse(BaseModel):
     current_value: float
     percentage_change: float
 
+
+# ✅ Price alert schemas
+class PriceAlertCreate(BaseModel):
+    symbol: str
+    direction: Literal["above", "below"]
+    threshold: float = Field(gt=0)
+
+
+class PriceAlertResponse(BaseModel):
+    id: int
+    symbol: str
+    direction: str
+    threshold: float
+    active: bool
+    created_at: datetime
+    triggered_at: Optional[datetime] = None
+    triggered_price: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
+
+class DeviceTokenCreate(BaseModel):
+    token: str = Field(min_length=1)
+    platform: Literal["web", "android", "ios"] = "web"
@@ -0,0 +1,71 @@
+# App/Services/active_symbols.py
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import delete, text
+from App.Models.stock import ActiveSymbol
+from datetime import datetime
+
+
+# ✅ Adjust a symbol's ref counts inside the caller's transaction (caller commits).
+# holder_count counts distinct users, so callers pass holders=±1 only for a user's first/last lot.
+async def adjust_active_symbol(db: AsyncSession, symbol: str, holders: int = 0, watchers: int = 0):
+    stmt = insert(ActiveSymbol).values(
+        symbol=symbol,
+        holder_count=max(holders, 0),
+        watcher_count=max(watchers, 0),
+        updated_at=datetime.utcnow()
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[ActiveSymbol.symbol],
+            set_={
+                "holder_count": ActiveSymbol.holder_count + holders,
+                "watcher_count": ActiveSymbol.watcher_count + watchers,
+                "updated_at": stmt.excluded.updated_at,
+            }
+        )
+    )
+
+    if holders < 0 or watchers < 0:
+        # Nobody holds or watches it any more
+        await db.execute(
+            delete(ActiveSymbol)
+            .where(ActiveSymbol.symbol == symbol)
+            .where(ActiveSymbol.holder_count <= 0, ActiveSymbol.watcher_count <= 0)
+        )
+
+
+async def get_active_symbols(db: AsyncSession, held: bool = True, watched: bool = True) -> list[str]:
+    """Read the hot set directly instead of scanning every user's holdings/watchlists."""
+    query = select(ActiveSymbol.symbol)
+    if held and not watched:
+        query = query.where(ActiveSymbol.holder_count > 0)
+    elif watched and not held:
+        query = query.where(ActiveSymbol.watcher_count > 0)
+    result = await db.execute(query)
+    return result.scalars().all()
+
+
+async def get_active_symbol_counts(db: AsyncSession) -> dict[str, tuple[int, int]]:
+    """{symbol: (holder_count, watcher_count)}"""
+    result = await db.execute(select(ActiveSymbol.symbol, ActiveSymbol.holder_count, ActiveSymbol.watcher_count))
+    return {symbol: (holders, watchers) for symbol, holders, watchers in result.all()}
+
+
+# ✅ Full recount from user_stocks + watchlist_items, for the nightly reconcile
+async def rebuild_active_symbols(db: AsyncSession):
+    await db.execute(text("DELETE FROM active_symbols"))
+    await db.execute(text("""
+        INSERT INTO active_symbols (symbol, holder_count, watcher_count, updated_at)
+        SELECT symbol, SUM(holders), SUM(watchers), NOW()
+        FROM (
+            SELECT symbol, COUNT(DISTINCT user_id) AS holders, 0 AS watchers FROM user_stocks GROUP BY symbol
+            UNION ALL
+            SELECT symbol, 0 AS holders, COUNT(*) AS watchers FROM watchlist_items GROUP BY symbol
+        ) AS counts
+        GROUP BY symbol
+    """))
+    await db.commit()
+    print("✅ Active symbol set rebuilt.")
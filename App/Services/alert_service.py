@@ -0,0 +1,256 @@
+# App/Services/alert_service.py
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import update, delete, case, func
+from fastapi import HTTPException
+from App.Models.stock import PriceAlert, WatchlistItem
+from App.Schemas.stock import PriceAlertCreate
+from App.Services.price_events import publish_alert_events
+from App.Services.quote_board import quote_board
+from datetime import datetime
+import bisect
+import os
+import threading
+
+
+ALERTS_PER_USER_LIMIT = int(os.getenv("ALERTS_PER_USER_LIMIT", 50))
+
+
+class _SymbolRules:
+    """Thresholds kept sorted next to their alert ids (parallel lists, so bisect runs on floats)."""
+    __slots__ = ("above_prices", "above_ids", "below_prices", "below_ids")
+
+    def __init__(self):
+        self.above_prices, self.above_ids = [], []
+        self.below_prices, self.below_ids = [], []
+
+    def __len__(self):
+        return len(self.above_ids) + len(self.below_ids)
+
+
+# ✅ Per-symbol sorted thresholds: a tick finds every crossed rule in O(log n + k)
+class AlertIndex:
+    def __init__(self):
+        self._symbols: dict[str, _SymbolRules] = {}
+        self._alerts: dict[int, tuple[str, str, float]] = {}  # id -> (symbol, direction, threshold)
+        self._unarmed: dict[str, set[int]] = {}  # Rules added while already past their threshold
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def __len__(self):
+        return len(self._alerts)
+
+    def _lists(self, rules: _SymbolRules, direction: str):
+        if direction == "above":
+            return rules.above_prices, rules.above_ids
+        return rules.below_prices, rules.below_ids
+
+    def add(self, alert_id: int, symbol: str, direction: str, threshold: float, reference: float | None = None):
+        """reference: the price the rule was set against (default: the quote board's); a rule already past it waits to be armed."""
+        if reference is None:
+            reference = quote_board.price(symbol)
+        with self._lock:
+            if alert_id in self._alerts:
+                return
+            rules = self._symbols.setdefault(symbol, _SymbolRules())
+            prices, ids = self._lists(rules, direction)
+            position = bisect.bisect_right(prices, threshold)
+            prices.insert(position, threshold)
+            ids.insert(position, alert_id)
+            self._alerts[alert_id] = (symbol, direction, threshold)
+
+            if reference is not None and (reference >= threshold if direction == "above" else reference <= threshold):
+                self._unarmed.setdefault(symbol, set()).add(alert_id)
+
+    def remove(self, alert_id: int):
+        with self._lock:
+            entry = self._alerts.pop(alert_id, None)
+            if entry is None:
+                return
+            symbol, direction, threshold = entry
+            rules = self._symbols[symbol]
+            prices, ids = self._lists(rules, direction)
+
+            # Only the run of equal thresholds needs a linear look
+            position = bisect.bisect_left(prices, threshold)
+            while ids[position] != alert_id:
+                position += 1
+            del prices[position]
+            del ids[position]
+
+            unarmed = self._unarmed.get(symbol)
+            if unarmed is not None:
+                unarmed.discard(alert_id)
+                if not unarmed:
+                    del self._unarmed[symbol]
+
+            if not rules:
+                del self._symbols[symbol]
+
+    def match(self, symbol: str, price: float) -> list[int]:
+        """Ids of rules crossed at `price`: above-rules with threshold <= price, below-rules with threshold >= price.
+
+        Rules that were already past their threshold when added only fire after the price
+        has been back on the other side (a crossing, not a level).
+        """
+        with self._lock:
+            rules = self._symbols.get(symbol)
+            if rules is None:
+                return []
+            crossed_up = rules.above_ids[:bisect.bisect_right(rules.above_prices, price)]
+            crossed_down = rules.below_ids[bisect.bisect_left(rules.below_prices, price):]
+            matched = crossed_up + crossed_down
+
+            unarmed = self._unarmed.get(symbol)
+            if unarmed:
+                matched = [alert_id for alert_id in matched if alert_id not in unarmed]
+                for alert_id in list(unarmed):
+                    _, direction, threshold = self._alerts[alert_id]
+                    if (price < threshold) if direction == "above" else (price > threshold):
+                        unarmed.discard(alert_id)  # Back on the near side: the next crossing counts
+                if not unarmed:
+                    del self._unarmed[symbol]
+            return matched
+
+    def clear(self):
+        with self._lock:
+            self._symbols.clear()
+            self._alerts.clear()
+            self._unarmed.clear()
+
+
+alert_index = AlertIndex()
+
+
+# ✅ Rebuild this process's index from every active rule
+async def load_alert_index(db: AsyncSession) -> int:
+    result = await db.execute(
+        select(PriceAlert.id, PriceAlert.symbol, PriceAlert.direction, PriceAlert.threshold)
+        .where(PriceAlert.active.is_(True))
+    )
+    alert_index.clear()
+    for alert_id, symbol, direction, threshold in result.all():
+        alert_index.add(alert_id, symbol, direction, threshold)
+    alert_index.loaded = True
+    print(f"🔔 Alert index loaded with {len(alert_index)} active rule(s).")
+    return len(alert_index)
+
+
+async def ensure_alert_index(db: AsyncSession):
+    if not alert_index.loaded:
+        await load_alert_index(db)
+
+
+# ✅ Check fresh prices against the index; crossed rules are deactivated exactly once in the DB
+async def evaluate_price_ticks(db: AsyncSession, prices: dict[str, float], tick_time: datetime | None = None) -> list[dict]:
+    """Never raises: alerting must not break the quote pipeline that calls it."""
+    try:
+        await ensure_alert_index(db)
+
+        matched, matched_prices = [], {}
+        for symbol, price in prices.items():
+            if price is None:
+                continue
+            ids = alert_index.match(symbol, price)
+            if ids:
+                matched.extend(ids)
+                matched_prices[symbol] = float(price)
+
+        if not matched:
+            return []
+
+        tick_time = tick_time or datetime.utcnow()
+        result = await db.execute(
+            update(PriceAlert)
+            .where(PriceAlert.id.in_(matched), PriceAlert.active.is_(True))  # Another process may have fired it already
+            .values(
+                active=False,
+                triggered_at=tick_time,
+                triggered_price=case(matched_prices, value=PriceAlert.symbol)
+            )
+            .returning(
+                PriceAlert.id, PriceAlert.user_id, PriceAlert.symbol,
+                PriceAlert.direction, PriceAlert.threshold, PriceAlert.triggered_price
+            )
+        )
+        triggered = [dict(row) for row in result.mappings().all()]
+        await publish_alert_events(db, removed=[alert["id"] for alert in triggered])
+        await db.commit()
+
+        for alert_id in matched:
+            alert_index.remove(alert_id)
+
+        for alert in triggered:
+            alert["triggered_at"] = tick_time
+            print(f"🔔 Alert {alert['id']}: {alert['symbol']} {alert['direction']} {alert['threshold']} (price {alert['triggered_price']})")
+
+        # 📨 Delivery runs on the notifications queue, so slow push endpoints never hold up ticks
+        from App.tasks.notifications import enqueue_alert_notifications  # Lazy: keeps Celery out of API imports
+        await enqueue_alert_notifications(triggered)
+        return triggered
+
+    except Exception as e:
+        await db.rollback()
+        print(f"❌ Alert evaluation failed: {e}")
+        return []
+
+
+async def create_alert(db: AsyncSession, user_id: int, data: PriceAlertCreate) -> PriceAlert:
+    watched = await db.execute(
+        select(WatchlistItem.symbol).where(WatchlistItem.user_id == user_id, WatchlistItem.symbol == data.symbol)
+    )
+    if watched.first() is None:
+        raise HTTPException(status_code=400, detail="Alerts can only be set on stocks in your watchlist")
+
+    active_count = await db.execute(
+        select(func.count()).select_from(PriceAlert)
+        .where(PriceAlert.user_id == user_id, PriceAlert.active.is_(True))
+    )
+    if active_count.scalar() >= ALERTS_PER_USER_LIMIT:
+        raise HTTPException(status_code=400, detail=f"Cannot have more than {ALERTS_PER_USER_LIMIT} active alerts")
+
+    alert = PriceAlert(user_id=user_id, symbol=data.symbol, direction=data.direction, threshold=data.threshold)
+    db.add(alert)
+    await db.flush()
+    await publish_alert_events(db, added=[(alert.id, alert.symbol, alert.direction, alert.threshold)])  # Other workers' indexes
+    await db.commit()
+    await db.refresh(alert)
+
+    alert_index.add(alert.id, alert.symbol, alert.direction, alert.threshold)
+    return alert
+
+
+async def get_user_alerts(db: AsyncSession, user_id: int) -> list[PriceAlert]:
+    result = await db.execute(
+        select(PriceAlert).where(PriceAlert.user_id == user_id).order_by(PriceAlert.created_at.desc())
+    )
+    return result.scalars().all()
+
+
+async def deactivate_symbol_alerts(db: AsyncSession, user_id: int, symbol: str) -> list[int]:
+    """Switch off a user's active rules on one symbol (it left their watchlist). The caller commits, then drops the ids from alert_index."""
+    result = await db.execute(
+        update(PriceAlert)
+        .where(PriceAlert.user_id == user_id, PriceAlert.symbol == symbol, PriceAlert.active.is_(True))
+        .values(active=False)
+        .returning(PriceAlert.id)
+    )
+    alert_ids = list(result.scalars().all())
+    await publish_alert_events(db, removed=alert_ids)
+    return alert_ids
+
+
+async def delete_alert(db: AsyncSession, user_id: int, alert_id: int) -> bool:
+    result = await db.execute(
+        delete(PriceAlert)
+        .where(PriceAlert.id == alert_id, PriceAlert.user_id == user_id)
+        .returning(PriceAlert.id)
+    )
+    removed = result.first() is not None
+    if removed:
+        await publish_alert_events(db, removed=[alert_id])
+    await db.commit()
+    if removed:
+        alert_index.remove(alert_id)
+    return removed
@@ -0,0 +1,123 @@
+# App/Services/backfill_service.py
+
+from App.Services.history_store import history_store, bars_from_frame, day_ts
+from App.Services.market_hours import exchange_for_symbol
+from App.Services.quote_service import symbol_frame
+from App.Services.rollup_service import refresh_rollups
+from App.Config.database import SessionLocal
+from collections import defaultdict
+from datetime import datetime, date, timedelta
+from typing import Optional
+import asyncio
+import numpy as np
+import os
+import yfinance as yf
+
+
+BACKFILL_YEARS = int(os.getenv("BACKFILL_YEARS", 5))            # Depth of the first load for a new symbol
+BACKFILL_MERGE_GAP_DAYS = int(os.getenv("BACKFILL_MERGE_GAP_DAYS", 5))  # Refetch up to this many stored trading days to save a request
+
+_background_tasks = set()  # Keep fire-and-forget backfills referenced until they finish
+
+
+def _trading_days(symbol: str, start: date, end: date) -> list[date]:
+    exchange = exchange_for_symbol(symbol)
+    days, day = [], start
+    while day <= end:
+        if exchange.is_trading_day(day):
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def missing_ranges(symbol: str, start: date, end: date) -> list[tuple[date, date]]:
+    """Trading-day ranges in [start, end] that are neither stored nor already requested.
+
+    Bars stored after the last backfilled day were written by quote refreshes and may be
+    intraday partials, so they are re-requested until a backfill has covered them.
+    Gaps separated by weekends/holidays, or by at most BACKFILL_MERGE_GAP_DAYS stored
+    trading days, are coalesced into one provider request.
+    """
+    days = _trading_days(symbol, start, end)
+    if not days:
+        return []
+
+    stamps = np.array([day_ts(day) for day in days], dtype="<i8")
+    coverage = history_store.coverage(symbol)
+    final_through = day_ts(coverage[-1][1]) if coverage else -1
+    have = np.isin(stamps, history_store.read(symbol, start, end)["ts"]) & (stamps <= final_through)
+    for lo, hi in coverage:
+        have |= (stamps >= day_ts(lo)) & (stamps <= day_ts(hi))
+
+    ranges, last_index = [], None
+    for index in np.flatnonzero(~have):
+        if last_index is not None and index - last_index <= BACKFILL_MERGE_GAP_DAYS + 1:
+            ranges[-1] = (ranges[-1][0], days[index])
+        else:
+            ranges.append((days[index], days[index]))
+        last_index = index
+
+    return ranges
+
+
+def _download_range(symbols: list[str], start: date, end: date) -> list[str]:
+    """One provider call for every symbol sharing the same missing range; returns symbols that got bars."""
+    data = yf.download(
+        tickers=" ".join(symbols), start=start.isoformat(), end=(end + timedelta(days=1)).isoformat(),
+        interval="1d", group_by="ticker", auto_adjust=False, progress=False
+    )
+
+    stored = []
+    for symbol in symbols:
+        # yfinance reports per-ticker failures (errors, rate limits) only as a missing or all-NaN column
+        frame = symbol_frame(data, symbol) if data is not None and not data.empty else None
+        bars = bars_from_frame(frame) if frame is not None and "Close" in frame else None
+        if bars is None or not len(bars):
+            print(f"⚠️ No bars for {symbol} {start}..{end}, will retry.")
+            continue
+
+        history_store.append(symbol, bars)
+        stored.append(symbol)
+        # Days inside the range without a bar (pre-listing, suspensions) are final, not retried
+        history_store.mark_covered(symbol, start, end)
+
+    return stored
+
+
+# ✅ Fill every missing range for these symbols, grouping identical ranges into bulk downloads
+def backfill_symbols(symbols: list[str], start: Optional[date] = None, end: Optional[date] = None) -> dict:
+    """Blocking; run it with asyncio.to_thread from async code."""
+    requests = defaultdict(list)  # (start, end) -> symbols
+    for symbol in dict.fromkeys(s.upper() for s in symbols):
+        # Today's bar is still forming; it comes from the quote refresh, not the backfill
+        symbol_end = end or datetime.now(exchange_for_symbol(symbol).tz).date() - timedelta(days=1)
+        symbol_start = start or symbol_end - timedelta(days=365 * BACKFILL_YEARS)
+        for gap in missing_ranges(symbol, symbol_start, symbol_end):
+            requests[gap].append(symbol)
+
+    touched, errors = {}, []  # symbol -> earliest day that received bars (for rollups)
+    for (gap_start, gap_end), gap_symbols in sorted(requests.items()):
+        try:
+            for symbol in _download_range(gap_symbols, gap_start, gap_end):
+                touched.setdefault(symbol, gap_start)
+        except Exception as e:
+            print(f"❌ Backfill {gap_start}..{gap_end} failed for {gap_symbols}: {e}")
+            errors.append({"symbols": gap_symbols, "range": [gap_start.isoformat(), gap_end.isoformat()], "error": str(e)})
+
+    if requests:
+        print(f"📚 Backfilled {len(touched)} symbol(s) with {len(requests)} provider request(s).")
+    return {"requests": len(requests), "touched": touched, "errors": errors or None}
+
+
+async def _backfill_and_roll_up(symbols: list[str]):
+    result = await asyncio.to_thread(backfill_symbols, symbols)
+    if result["touched"]:
+        async with SessionLocal() as db:
+            await refresh_rollups(db, result["touched"])
+
+
+def schedule_backfill(symbol: str):
+    """Load a newly tracked symbol's history in the background without delaying the request."""
+    task = asyncio.get_running_loop().create_task(_backfill_and_roll_up([symbol]))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
@@ -0,0 +1,133 @@
+# App/Services/correlation_service.py
+
+from App.Services.history_store import history_store
+from collections import OrderedDict
+from functools import reduce
+import math
+import os
+import threading
+import numpy as np
+
+
+RETURNS_CACHE_SIZE = int(os.getenv("RETURNS_CACHE_SIZE", 5000))            # Symbols whose return vectors are kept
+CORRELATION_MEMO_SIZE = int(os.getenv("CORRELATION_MEMO_SIZE", 2000))      # (symbol set, window) results kept
+DEFAULT_CORRELATION_WINDOW = 90
+
+
+class _Returns:
+    __slots__ = ("ts", "returns", "first_ts", "last_ts", "last_close", "count")
+
+
+class CorrelationEngine:
+    """Pearson correlation of daily returns across small symbol sets (a watchlist).
+
+    Per-symbol return vectors are cached (LRU) for every stored bar except the newest, so
+    overlapping watchlists share them; the newest (intraday) return is recomputed on each read.
+    Results are memoized per (symbol set, window) and reused while no member's latest bar moved.
+    """
+
+    def __init__(self, max_symbols: int = RETURNS_CACHE_SIZE, max_results: int = CORRELATION_MEMO_SIZE):
+        self.max_symbols = max_symbols
+        self.max_results = max_results
+        self._returns = OrderedDict()
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _lru_put(cache: OrderedDict, key, value, limit: int):
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > limit:
+            cache.popitem(last=False)
+
+    def _committed_returns(self, symbol: str, bars) -> _Returns:
+        """Returns of bars[:-1], extended in place when bars were appended, rebuilt if history was rewritten."""
+        committed = bars[:-1]
+        entry = self._returns.get(symbol)
+        valid = (
+            entry is not None
+            and len(committed) >= entry.count
+            and (entry.count == 0 or (
+                committed["ts"][0] == entry.first_ts
+                and committed["ts"][entry.count - 1] == entry.last_ts
+                and committed["close"][entry.count - 1] == entry.last_close  # A backfill may rewrite a day's close in place
+            ))
+        )
+
+        if not valid:
+            entry = _Returns()
+            close = np.asarray(committed["close"], dtype="f8")
+            entry.ts = np.asarray(committed["ts"][1:], dtype="<i8")
+            entry.returns = close[1:] / close[:-1] - 1
+        elif len(committed) > entry.count:
+            # ✅ Incremental: only the newly committed bars (plus the one before them)
+            close = np.asarray(committed["close"][max(entry.count - 1, 0):], dtype="f8")
+            entry.ts = np.concatenate([entry.ts, np.asarray(committed["ts"][max(entry.count, 1):], dtype="<i8")])
+            entry.returns = np.concatenate([entry.returns, close[1:] / close[:-1] - 1])
+
+        entry.count = len(committed)
+        entry.first_ts = int(committed["ts"][0]) if len(committed) else None
+        entry.last_ts = int(committed["ts"][-1]) if len(committed) else None
+        entry.last_close = float(committed["close"][-1]) if len(committed) else None
+        self._lru_put(self._returns, symbol, entry, self.max_symbols)
+        return entry
+
+    def _series(self, symbol: str, bars):
+        with self._lock:
+            entry = self._committed_returns(symbol, bars)
+        if len(bars) < 2:
+            return entry.ts, entry.returns
+        latest = float(bars["close"][-1]) / float(bars["close"][-2]) - 1
+        return np.append(entry.ts, int(bars["ts"][-1])), np.append(entry.returns, latest)
+
+    def correlation(self, symbols: list[str], window: int = DEFAULT_CORRELATION_WINDOW) -> dict:
+        symbols = sorted({symbol.upper() for symbol in symbols})
+        bars = {symbol: history_store.read(symbol) for symbol in symbols}
+        missing = [symbol for symbol in symbols if len(bars[symbol]) < 2]
+        present = [symbol for symbol in symbols if symbol not in missing]
+
+        # Memo stays valid while no member's newest bar (day or intraday close) has moved
+        key = (frozenset(symbols), window)
+        signature = tuple((int(bars[s]["ts"][-1]), float(bars[s]["close"][-1])) for s in present)
+        with self._lock:
+            cached = self._memo.get(key)
+            if cached is not None and cached[0] == signature:
+                self._memo.move_to_end(key)
+                return cached[1]
+
+        series = {symbol: self._series(symbol, bars[symbol]) for symbol in present}
+
+        # ✅ Align on the days every symbol traded, then the last `window` of them
+        common = reduce(np.intersect1d, (series[s][0] for s in present)) if present else np.empty(0, dtype="<i8")
+        common = common[-window:]
+        matrix = np.empty((len(common), len(present)))
+        for column, symbol in enumerate(present):
+            ts, returns = series[symbol]
+            matrix[:, column] = returns[np.searchsorted(ts, common)]
+
+        # Pearson, vectorized: standardized columns, then one Z'Z product
+        if len(common) >= 2:
+            centered = matrix - matrix.mean(axis=0)
+            std = np.sqrt((centered ** 2).sum(axis=0))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                z = centered / std
+                corr = z.T @ z
+            np.fill_diagonal(corr, np.where(std > 0, 1.0, np.nan))
+        else:
+            corr = np.full((len(present), len(present)), np.nan)
+
+        result = {
+            "symbols": present,
+            "missing": missing,
+            "window": window,
+            "observations": len(common),
+            "start": str(np.datetime64(int(common[0]), "s").astype("datetime64[D]")) if len(common) else None,
+            "end": str(np.datetime64(int(common[-1]), "s").astype("datetime64[D]")) if len(common) else None,
+            "matrix": [[None if math.isnan(v) else round(float(v), 4) for v in row] for row in corr],
+        }
+        with self._lock:
+            self._lru_put(self._memo, key, (signature, result), self.max_results)
+        return result
+
+
+correlation_engine = CorrelationEngine()
@@ -0,0 +1,61 @@
+# App/Services/downsampling.py
+
+import numpy as np
+
+
+MAX_CHART_POINTS = 5000  # Upper bound accepted for `max_points` on chart endpoints
+
+
+# ✅ Largest-Triangle-Three-Buckets: keep the points that preserve the visual shape of a series
+def lttb_indices(x, y, max_points: int) -> np.ndarray:
+    """Indices of at most `max_points` points of (x, y) chosen by LTTB; x must be ascending.
+
+    The first and last points are always kept. Each bucket is scored with one vectorized
+    triangle-area computation, so the cost is O(n) with a Python loop of `max_points` steps.
+    """
+    x = np.asarray(x, dtype="f8")
+    y = np.asarray(y, dtype="f8")
+    n = len(x)
+    if max_points >= n or n <= 2:
+        return np.arange(n)
+    if max_points < 3:
+        return np.array([0, n - 1])[:max_points]
+
+    # Bucket edges over the inner points (first and last are fixed)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    selected = np.empty(max_points, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+
+    previous = 0
+    for bucket in range(max_points - 2):
+        lo, hi = edges[bucket], edges[bucket + 1]
+
+        # Average of the next bucket (or the last point) is the triangle's third vertex
+        next_lo, next_hi = hi, edges[bucket + 2] if bucket + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[lo:hi] - y[previous])
+            - (x[previous] - x[lo:hi]) * (avg_y - y[previous])
+        )
+        previous = lo + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+
+    return selected
+
+
+def lttb(rows: list, x_key: str, y_key: str, max_points: int) -> list:
+    """Downsample a list of dict rows on (x_key, y_key); timestamps are compared as epoch seconds."""
+    if not max_points or len(rows) <= max_points:
+        return rows
+
+    x = np.array([_as_number(row[x_key]) for row in rows], dtype="f8")
+    y = np.array([row[y_key] if row[y_key] is not None else np.nan for row in rows], dtype="f8")
+    y = np.where(np.isnan(y), np.nanmean(y) if np.isfinite(y).any() else 0.0, y)
+
+    return [rows[i] for i in lttb_indices(x, y, max_points)]
+
+
+def _as_number(value) -> float:
+    return value.timestamp() if hasattr(value, "timestamp") else float(value)
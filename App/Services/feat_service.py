@@ -4,21 +4,58 @@ from datetime import datetime
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
-from App.Models.stock import Stock, Watchlist
+from App.Models.stock import Stock, WatchlistItem
 from sqlalchemy.sql import func
-from sqlalchemy.dialects.postgresql import array
+from sqlalchemy.dialects.postgresql import array, insert
+from sqlalchemy import delete, or_
 import yfinance as yf
-from App.Models.stock import StockData, StockHistory
-from datetime import datetime
+from App.Models.stock import StockData, StockHistory, ActiveSymbol
+from App.Services.quote_service import fetch_quotes, save_quotes
+from App.Services.market_hours import split_by_market_status, exchange_for_symbol
+from App.Services.history_store import history_store, make_bars, day_ts
+from App.Services.backfill_service import schedule_backfill
+from App.Services.alert_service import evaluate_price_ticks, deactivate_symbol_alerts, alert_index
+from App.Services.trending_service import trending_tracker
+from App.Services.quote_board import quote_board
+from App.Services.price_events import publish_price_events
+from App.Services.portfolio_aggregates import apply_price_deltas
+from App.Services.active_symbols import adjust_active_symbol, get_active_symbols
+from App.Services.refresh_planner import provider_calls
+from datetime import datetime, timedelta
+import asyncio
+import os
+import numpy as np
+
+
+STOCK_DATA_TTL_MINUTES = int(os.getenv("STOCK_DATA_TTL_MINUTES", 15))  # StockData older than this is refreshed
+REFRESH_BATCH_SIZE = int(os.getenv("REFRESH_BATCH_SIZE", 50))  # Symbols per bulk provider call
+WATCHLIST_FETCH_CONCURRENCY = int(os.getenv("WATCHLIST_FETCH_CONCURRENCY", 10))  # Parallel provider calls per refresh (10 = full watchlist)
+
+
+WATCHLIST_LIMIT = 10
+
+
+async def get_watchlist_symbols(user_id: int, db: AsyncSession) -> list[str]:
+    """Symbols on the user's watchlist, oldest first (primary-key range scan)."""
+    result = await db.execute(
+        select(WatchlistItem.symbol)
+        .where(WatchlistItem.user_id == user_id)
+        .order_by(WatchlistItem.added_at)
+    )
+    return result.scalars().all()
+
 
+async def get_symbol_watchers(symbol: str, db: AsyncSession) -> list[int]:
+    """Reverse lookup: ids of users watching `symbol` (uses the symbol index)."""
+    result = await db.execute(select(WatchlistItem.user_id).where(WatchlistItem.symbol == symbol))
+    return result.scalars().all()
 
 
 async def add_stock_to_watchlist(user_id: int, stock_symbol: str, db: AsyncSession):
     """Add a single stock to the user's watchlist with validation."""
 
     # 1️⃣ Fetch the user's watchlist
-    result = await db.execute(select(Watchlist).where(Watchlist.user_id == user_id))
-    watchlist = result.scalars().first()
+    watchlist_stocks = await get_watchlist_symbols(user_id, db)
 
     # 2️⃣ Fetch stock details from Stock table
     stock_result = await db.execute(select(Stock).where(Stock.symbol == stock_symbol))
@@ -27,38 +64,21 @@ async def add_stock_to_watchlist(user_id: int, stock_symbol: str, db: AsyncSessi
     if not stock:  # ❌ Invalid stock symbol
         raise HTTPException(status_code=400, detail="Invalid stock symbol")
 
-    if watchlist:
-        watchlist_stocks = watchlist.stocks or []  # Ensure it's a list
-
-        # 3️⃣ Check if stock is already in the watchlist
-        if stock_symbol in watchlist_stocks:
-            raise HTTPException(status_code=400, detail="Stock already in watchlist")
-
-        # 4️⃣ Enforce the limit of 10 stocks
-        if len(watchlist_stocks) >= 10:
-            raise HTTPException(status_code=400, detail="Watchlist cannot exceed 10 stocks")
-
-        # ✅ Use PostgreSQL `array_append()` to update the ARRAY column
-        stmt = (
-            Watchlist.__table__.update()
-            .where(Watchlist.user_id == user_id)
-            .values(
-                stocks=func.array_append(Watchlist.stocks, stock_symbol),
-                updated_at=func.now()
-            )
-        )
-        await db.execute(stmt)
-
-    else:
-        # 6️⃣ Create a new watchlist
-        watchlist = Watchlist(user_id=user_id, stocks=[stock_symbol])
-        db.add(watchlist)
-
-    # 7️⃣ Commit changes to DB with error handling
+    # 3️⃣ Check if stock is already in the watchlist
+    if stock_symbol in watchlist_stocks:
+        raise HTTPException(status_code=400, detail="Stock already in watchlist")
+
+    # 4️⃣ Enforce the limit of 10 stocks
+    if len(watchlist_stocks) >= WATCHLIST_LIMIT:
+        raise HTTPException(status_code=400, detail="Watchlist cannot exceed 10 stocks")
+
+    # ✅ Adding touches a single small row
+    db.add(WatchlistItem(user_id=user_id, symbol=stock_symbol))
+    await adjust_active_symbol(db, stock_symbol, watchers=1)
+
+    # 5️⃣ Commit changes to DB with error handling
     try:
         await db.commit()
-        if watchlist:
-            await db.refresh(watchlist)
     except Exception as e:
         await db.rollback()
         print(f"❌ Commit failed: {e}")  # Log the actual error
@@ -67,27 +87,45 @@ async def add_stock_to_watchlist(user_id: int, stock_symbol: str, db: AsyncSessi
     # 🔥 Ensure the stock update runs
     print(f"🚀 Triggering update for: {stock_symbol}") 
 
-    # 8️⃣ Fetch fresh stock data from yfinance **only once**
+    # 6️⃣ Fetch fresh stock data from yfinance **only once**
     await update_stock_data(stock_symbol, db)
+    schedule_backfill(stock_symbol)  # 📚 Load daily history once; later runs only fetch the tail
 
     return {"message": f"{stock_symbol} added to watchlist"}
 
 
+async def remove_stock_from_watchlist(user_id: int, stock_symbol: str, db: AsyncSession) -> bool:
+    """Delete one watchlist row; False if the symbol wasn't on the watchlist."""
+    result = await db.execute(
+        delete(WatchlistItem)
+        .where(WatchlistItem.user_id == user_id, WatchlistItem.symbol == stock_symbol)
+        .returning(WatchlistItem.symbol)
+    )
+    removed = result.first() is not None
+    alert_ids = []
+    if removed:
+        await adjust_active_symbol(db, stock_symbol, watchers=-1)
+        alert_ids = await deactivate_symbol_alerts(db, user_id, stock_symbol)  # 🔕 Alerts only live on watched stocks
+    await db.commit()
+    for alert_id in alert_ids:
+        alert_index.remove(alert_id)
+    return removed
+
+
 
 async def get_user_watchlist(user_id: int, db: AsyncSession):
     """Retrieve and display the user's watchlist with stock details."""
 
     # 1️⃣ Fetch the user's watchlist
-    result = await db.execute(select(Watchlist).where(Watchlist.user_id == user_id))
-    watchlist = result.scalars().first()
+    watchlist_stocks = await get_watchlist_symbols(user_id, db)
 
     # 2️⃣ If the user has no watchlist, return an empty list
-    if not watchlist or not watchlist.stocks:
+    if not watchlist_stocks:
         return {"message": "Your watchlist is empty", "watchlist": []}
 
     # 3️⃣ Fetch stock details from the Stock table
     stock_details_result = await db.execute(
-        select(Stock).where(Stock.symbol.in_(watchlist.stocks))
+        select(Stock).where(Stock.symbol.in_(watchlist_stocks))
     )
     stock_details = stock_details_result.scalars().all()
 
@@ -106,67 +144,106 @@ async def get_user_watchlist(user_id: int, db: AsyncSession):
     return {"watchlist": watchlist_data}
 
 
+def _fetch_stock_info(symbol: str) -> dict:
+    """Blocking yfinance lookup of one symbol's StockData fields."""
+    provider_calls.record()
+    stock_info = yf.Ticker(symbol).info
+    new_price = stock_info.get("regularMarketPrice")
+    if new_price is None:
+        raise ValueError(f"No market price returned for {symbol}")
+
+    prev_close = stock_info.get("regularMarketPreviousClose")
+    return {
+        "company_name": stock_info.get("shortName"),
+        "current_price": new_price,
+        "previous_close_price": prev_close,
+        "percent_change": ((new_price - prev_close) / prev_close) * 100 if prev_close else None,
+        "high_24h": stock_info.get("dayHigh"),
+        "low_24h": stock_info.get("dayLow"),
+        "volume": stock_info.get("volume"),
+    }
+
+
+def _new_stock_rows(symbol: str, fields: dict, now: datetime):
+    """StockData row plus its first StockHistory entry."""
+    return (
+        StockData(symbol=symbol, last_updated=now, **fields),
+        StockHistory(symbol=symbol, recorded_at=now, **fields),
+    )
+
+
+def _record_info_bar(symbol: str, fields: dict):
+    """Store a `.info` snapshot as today's daily bar (exchange-local date).
+
+    `.info` has no open: keep the open of a bar already stored for today (e.g. from fetch_quotes),
+    else use the previous close, so rollups never see a NaN open.
+    """
+    try:
+        today_ts = day_ts(datetime.now(exchange_for_symbol(symbol).tz).date())
+        stored = history_store.read(symbol)
+        same_day = stored[-1] if len(stored) and int(stored["ts"][-1]) == today_ts else None
+
+        open_ = same_day["open"] if same_day is not None else np.nan
+        if np.isnan(open_):
+            previous = stored[stored["ts"] < today_ts]
+            open_ = fields.get("previous_close_price") or (float(previous["close"][-1]) if len(previous) else fields["current_price"])
+
+        close = fields["current_price"]
+        high = fields["high_24h"] if fields.get("high_24h") is not None else max(open_, close)
+        low = fields["low_24h"] if fields.get("low_24h") is not None else min(open_, close)
+        bar = make_bars([today_ts], [open_], [high], [low], [close], [fields["volume"] or 0])
+        history_store.append(symbol, bar)
+    except Exception as e:
+        print(f"❌ History store append failed for {symbol}: {e}")
+
+
 async def update_stock_data(symbol: str, db: AsyncSession):
-    """Fetch new stock data only if it’s not already stored."""
+    """Fetch new stock data unless a fresh (within the TTL) copy is already stored."""
     print(f"🔍 Checking stock data for: {symbol}")  # Debugging
 
     # Check if stock already exists
     result = await db.execute(select(StockData).where(StockData.symbol == symbol))
     stock = result.scalars().first()
 
-    if stock:  
-        print(f"✅ Stock {symbol} already exists, returning stored data: {stock}")
-        return {"message": f"Stock {symbol} data already stored", "data": stock}
+    if stock:
+        cutoff = datetime.utcnow() - timedelta(minutes=STOCK_DATA_TTL_MINUTES)
+        if stock.last_updated and stock.last_updated >= cutoff:
+            print(f"✅ Stock {symbol} already exists, returning stored data: {stock}")
+            return {"message": f"Stock {symbol} data already stored", "data": stock}
+
+        # ♻️ Stale: refresh in place (also appends a StockHistory row)
+        quotes = await asyncio.to_thread(fetch_quotes, [symbol])
+        if symbol not in quotes:
+            return {"error": f"Failed to refresh stale stock data for {symbol}"}
+        await save_quotes(db, quotes)
+        await db.refresh(stock)
+        return {"message": f"Stock {symbol} refreshed successfully", "data": stock}
 
     # Fetch new data
     print(f"🌐 Fetching new data for: {symbol}")
     try:
-        stock_info = yf.Ticker(symbol).info
-        new_price = stock_info.get("regularMarketPrice")
-        prev_close = stock_info.get("regularMarketPreviousClose")
-        percent_change = ((new_price - prev_close) / prev_close) * 100 if prev_close else None
-        high_24h = stock_info.get("dayHigh")
-        low_24h = stock_info.get("dayLow")
-        volume = stock_info.get("volume")
+        fields = await asyncio.to_thread(_fetch_stock_info, symbol)
     except Exception as e:
         print(f"❌ Error fetching data: {e}")
         return {"error": f"Failed to fetch stock data: {e}"}
 
-    # Insert into StockData table
-    new_stock = StockData(
-        symbol=symbol,
-        company_name=stock_info.get("shortName"),
-        current_price=new_price,
-        previous_close_price=prev_close,
-        percent_change=percent_change,
-        high_24h=high_24h,
-        low_24h=low_24h,
-        volume=volume,
-        last_updated=datetime.utcnow()
-    )
+    # Insert into StockData + StockHistory tables
+    new_stock, stock_history_entry = _new_stock_rows(symbol, fields, datetime.utcnow())
     db.add(new_stock)
-    print(f"✅ New stock {symbol} added to StockData: {new_stock}")
-
-    # Insert into StockHistory table
-    stock_history_entry = StockHistory(
-        symbol=new_stock.symbol,
-        company_name=new_stock.company_name,
-        current_price=new_price,
-        previous_close_price=prev_close,
-        percent_change=percent_change,
-        high_24h=high_24h,
-        low_24h=low_24h,
-        volume=volume,
-        recorded_at=new_stock.last_updated
-    )
     db.add(stock_history_entry)
-    print(f"📌 Stock history entry added for {symbol}: {stock_history_entry}")
+    print(f"✅ New stock {symbol} added to StockData: {new_stock}")
 
     # Commit changes
     try:
+        await publish_price_events(db, {symbol: fields})
+        await apply_price_deltas(db, {symbol: fields["current_price"]})
         await db.commit()
         await db.refresh(new_stock)
+        _record_info_bar(symbol, fields)
+        trending_tracker.observe_quotes({symbol: fields})
+        quote_board.publish({symbol: fields})
         print("✅ Commit successful!")
+        await evaluate_price_ticks(db, {symbol: fields["current_price"]})
     except Exception as e:
         await db.rollback()
         print(f"❌ Commit failed: {e}")
@@ -178,73 +255,137 @@ async def update_stock_data(symbol: str, db: AsyncSession):
 
 
 async def Add_stock_to_watchlist(user_id, stock_symbol, db):
-    # Fetch the user's watchlist
-    watchlist = await db.execute(
-        select(Watchlist).where(Watchlist.user_id == user_id)
+    # Insert the row unless it is already there
+    result = await db.execute(
+        insert(WatchlistItem)
+        .values(user_id=user_id, symbol=stock_symbol, added_at=datetime.utcnow())
+        .on_conflict_do_nothing(index_elements=["user_id", "symbol"])
+        .returning(WatchlistItem.symbol)
     )
-    watchlist = watchlist.scalar_one_or_none()
+    inserted = result.first() is not None
+    if inserted:
+        await adjust_active_symbol(db, stock_symbol, watchers=1)
+    await db.commit()
 
-    if not watchlist:
-        # Create a new watchlist if it doesn’t exist
-        watchlist = Watchlist(user_id=user_id, stocks=[], updated_at=datetime.utcnow())
-        db.add(watchlist)
-        await db.commit()
-        await db.refresh(watchlist)
+    if inserted:
+        schedule_backfill(stock_symbol)
 
-    # Check if stock is already in the watchlist
-    if stock_symbol in watchlist.stocks:
+    if not inserted:
         return {"message": f"{stock_symbol} is already in your watchlist"}
 
-
-    # Use PostgreSQL array_append to safely add the stock symbol
-    await db.execute(
-        Watchlist.__table__.update()
-        .where(Watchlist.user_id == user_id)
-        .values(
-            stocks=func.array_append(Watchlist.stocks, stock_symbol),
-            updated_at=datetime.utcnow()
-        )
-    )
-
-    await db.commit()
-
-    # Refresh the watchlist to get the latest data
-    await db.refresh(watchlist)
-
-    return watchlist
+    return {"user_id": user_id, "stocks": await get_watchlist_symbols(user_id, db)}
 
 
 async def update_watchlist_stocks(user_id: int, db: AsyncSession):
-    """Fetch all stocks from a user's watchlist and update their data."""
+    """Refresh a user's watchlist: one prefetch query, bounded concurrent fetches, one commit."""
     print("Update function triggers")
     
     # Retrieve user's watchlist
-    result = await db.execute(select(Watchlist).where(Watchlist.user_id == user_id))
-    watchlist = result.scalar_one_or_none()
+    watchlist_stocks = await get_watchlist_symbols(user_id, db)
 
-    if not watchlist or not watchlist.stocks:
+    if not watchlist_stocks:
         return {"message": "No stocks in watchlist to update"}
 
-    updated_stocks = set()  # Use a set to avoid duplicates
-    errors = []
-
-    # Loop through each stock and update
-    for symbol in watchlist.stocks:
-        normalized_symbol = symbol.upper()  # Normalize to uppercase
-        result = await update_stock_data(normalized_symbol, db)
-        
-        if "error" in result:
-            errors.append({normalized_symbol: result["error"]})
+    symbols = list(dict.fromkeys(symbol.upper() for symbol in watchlist_stocks))  # Normalize + dedupe, keep order
+
+    # 1️⃣ Prefetch every existing row in one IN query
+    result = await db.execute(select(StockData).where(StockData.symbol.in_(symbols)))
+    existing = {stock.symbol: stock for stock in result.scalars().all()}
+
+    cutoff = datetime.utcnow() - timedelta(minutes=STOCK_DATA_TTL_MINUTES)
+    fresh_stocks = [s for s in symbols if s in existing and existing[s].last_updated and existing[s].last_updated >= cutoff]
+    to_fetch = [s for s in symbols if s not in fresh_stocks]
+
+    # 2️⃣ Fetch missing/stale quotes concurrently, at most WATCHLIST_FETCH_CONCURRENCY at a time
+    semaphore = asyncio.Semaphore(WATCHLIST_FETCH_CONCURRENCY)
+
+    async def fetch(symbol: str):
+        async with semaphore:
+            try:
+                return symbol, await asyncio.to_thread(_fetch_stock_info, symbol), None
+            except Exception as e:
+                return symbol, None, str(e)
+
+    fetched = await asyncio.gather(*(fetch(symbol) for symbol in to_fetch))
+
+    # 3️⃣ Stage all writes, then commit once
+    now = datetime.utcnow()
+    updated_stocks, errors = [], []
+    for symbol, fields, error in fetched:
+        if error:
+            errors.append({symbol: f"Failed to fetch stock data: {error}"})
+            continue
+
+        stock = existing.get(symbol)
+        if stock:
+            for key, value in fields.items():
+                setattr(stock, key, value)
+            stock.last_updated = now
+            db.add(StockHistory(symbol=symbol, recorded_at=now, **fields))
         else:
-            updated_stocks.add(normalized_symbol)  # Store only uppercase symbols
-
+            db.add_all(_new_stock_rows(symbol, fields, now))
+        updated_stocks.append(symbol)
+
+    if updated_stocks:
+        try:
+            staged = {symbol: fields for symbol, fields, error in fetched if not error}
+            await publish_price_events(db, staged)
+            await apply_price_deltas(db, {symbol: fields["current_price"] for symbol, fields in staged.items()})
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            print(f"❌ Commit failed: {e}")
+            errors.extend({symbol: f"Database commit failed: {e}"} for symbol in updated_stocks)
+            updated_stocks = []
+
+    fetched_fields = {symbol: fields for symbol, fields, error in fetched if not error}
+    for symbol in updated_stocks:
+        _record_info_bar(symbol, fetched_fields[symbol])
+    refreshed = {symbol: fetched_fields[symbol] for symbol in updated_stocks}
+    trending_tracker.observe_quotes(refreshed)
+    quote_board.publish(refreshed)
+    await evaluate_price_ticks(db, {symbol: fetched_fields[symbol]["current_price"] for symbol in updated_stocks})
+
+    # Same contract as before the batched refresh: symbols within the TTL count as updated too
+    refreshed_symbols = set(updated_stocks)
     return {
-        "updated_stocks": list(updated_stocks),  # Convert back to list for JSON response
+        "updated_stocks": [s for s in symbols if s in refreshed_symbols or s in fresh_stocks],
+        "fresh_stocks": fresh_stocks,  # Additive: the subset served from the TTL without a provider call
         "errors": errors if errors else None
     }
 
 
 
+async def refresh_stale_watchlist_data(db: AsyncSession, open_markets_only: bool = False, ttl_minutes: int = STOCK_DATA_TTL_MINUTES):
+    """Refresh every watched StockData row older than the TTL, in bulk batches."""
+    cutoff = datetime.utcnow() - timedelta(minutes=ttl_minutes)
+
+    # 1️⃣ One query across all watchlists (via the maintained active-symbol set)
+    result = await db.execute(
+        select(StockData.symbol)
+        .join(ActiveSymbol, ActiveSymbol.symbol == StockData.symbol)
+        .where(or_(StockData.last_updated.is_(None), StockData.last_updated < cutoff))  # Never-refreshed rows are stale too
+        .where(ActiveSymbol.watcher_count > 0)
+    )
+    stale_symbols = result.scalars().all()
+    if open_markets_only:
+        stale_symbols, _ = split_by_market_status(stale_symbols)
+
+    if not stale_symbols:
+        return {"refreshed": 0, "stale": 0}
+
+    # 2️⃣ One provider call + one write per table per batch
+    refreshed = 0
+    for i in range(0, len(stale_symbols), REFRESH_BATCH_SIZE):
+        batch = stale_symbols[i:i + REFRESH_BATCH_SIZE]
+        quotes = await asyncio.to_thread(fetch_quotes, batch)
+        refreshed += await save_quotes(db, quotes)
+
+    print(f"♻️ Refreshed {refreshed}/{len(stale_symbols)} stale watchlist symbol(s).")
+    return {"refreshed": refreshed, "stale": len(stale_symbols)}
+
+
+
 async def check_stock_data(symbol: str, db: AsyncSession):
     """Retrieve stock data from both StockData and StockHistory."""
     
@@ -267,27 +408,30 @@ async def get_updated_watchlist(user_id: int, db: AsyncSession):
     """Retrieve and update the user's watchlist with the latest stock data, handling missing stocks."""
     
     # 1️⃣ Fetch the user's watchlist
-    result = await db.execute(select(Watchlist).where(Watchlist.user_id == user_id))
-    watchlist = result.scalars().first()
+    watchlist_stocks = await get_watchlist_symbols(user_id, db)
 
     # 2️⃣ If no watchlist or it's empty, return a message
-    if not watchlist or not watchlist.stocks:
+    if not watchlist_stocks:
         return {"message": "Your watchlist is empty", "watchlist": []}
 
     # 3️⃣ Fetch updated stock details from stock_data
     stock_data_result = await db.execute(
-        select(StockData).where(StockData.symbol.in_(watchlist.stocks))
+        select(StockData).where(StockData.symbol.in_(watchlist_stocks))
     )
     stock_data_list = stock_data_result.scalars().all()
 
     # 4️⃣ Convert stock_data_list to a dictionary for easy lookup
     stock_data_dict = {stock.symbol: stock for stock in stock_data_list}
+    live_quotes = quote_board.quotes(watchlist_stocks)  # 📋 Shared-memory prices, as fresh as the last refresh on this host
 
     # 5️⃣ Build the response, handling missing stocks
     watchlist_data = []
-    for symbol in watchlist.stocks:
+    for symbol in watchlist_stocks:
         if symbol in stock_data_dict:
             stock = stock_data_dict[symbol]
+            live = live_quotes.get(symbol)
+            if live and stock.last_updated and live["last_updated"] < stock.last_updated:
+                live = None  # The row is newer (written by another host)
             watchlist_data.append({
                 "symbol": stock.symbol,
                 "company_name": stock.company_name,
@@ -300,6 +444,8 @@ async def get_updated_watchlist(user_id: int, db: AsyncSession):
                 "last_updated": stock.last_updated,
                 "status": "Available"
             })
+            if live:
+                watchlist_data[-1].update(live)
         else:
             # Stock is in the watchlist but missing from StockData
             watchlist_data.append({
@@ -0,0 +1,221 @@
+# App/Services/history_store.py
+
+from collections import OrderedDict
+from datetime import datetime, date, timezone
+from typing import Optional
+import fcntl
+import json
+import os
+import re
+import threading
+import numpy as np
+import pandas as pd
+
+
+HISTORY_STORE_DIR = os.getenv("HISTORY_STORE_DIR", "App/Data/history")  # One <SYMBOL>.bars file per symbol
+HISTORY_MAP_CACHE_SIZE = int(os.getenv("HISTORY_MAP_CACHE_SIZE", 2000))    # Symbols whose file mappings stay open
+
+# ✅ One fixed-width record per daily bar; ts = bar date at 00:00 UTC (epoch seconds)
+BAR_DTYPE = np.dtype([
+    ("ts", "<i8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<i8"),
+])
+
+EMPTY_BARS = np.empty(0, dtype=BAR_DTYPE)
+
+
+def day_ts(day) -> int:
+    """Epoch seconds of a calendar day at 00:00 UTC."""
+    if isinstance(day, datetime):
+        day = day.date()
+    return int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp())
+
+
+def ts_day(ts: int) -> date:
+    return datetime.fromtimestamp(int(ts), tz=timezone.utc).date()
+
+
+def make_bars(ts, open_, high, low, close, volume) -> np.ndarray:
+    bars = np.empty(len(ts), dtype=BAR_DTYPE)
+    bars["ts"] = ts
+    bars["open"] = open_
+    bars["high"] = high
+    bars["low"] = low
+    bars["close"] = close
+    bars["volume"] = volume
+    return bars
+
+
+def bars_from_frame(frame: pd.DataFrame) -> np.ndarray:
+    """Convert a yfinance daily OHLCV frame (DatetimeIndex) into bar records."""
+    frame = frame.dropna(subset=["Close"])
+    if frame.empty:
+        return EMPTY_BARS
+
+    days = pd.DatetimeIndex(frame.index)
+    if days.tz is not None:
+        days = days.tz_localize(None)  # Keep the exchange-local calendar date
+    ts = days.normalize().values.astype("datetime64[s]").astype("<i8")
+
+    def column(name, default=np.nan):
+        return frame[name].to_numpy(dtype="f8") if name in frame else np.full(len(frame), default)
+
+    return make_bars(
+        ts, column("Open"), column("High"), column("Low"), column("Close"),
+        np.nan_to_num(column("Volume", 0.0)).astype("<i8")
+    )
+
+
+class HistoryStore:
+    """Append-only per-symbol OHLCV files, read back as memory-mapped NumPy arrays."""
+
+    def __init__(self, root: str = HISTORY_STORE_DIR, max_maps: int = HISTORY_MAP_CACHE_SIZE):
+        self.root = root
+        self.max_maps = max_maps
+        self._maps = OrderedDict()  # symbol -> ((inode, size), memmap), least recently read first
+        self._lock = threading.Lock()
+
+    def _path(self, symbol: str) -> str:
+        return os.path.join(self.root, re.sub(r"[^A-Z0-9._-]", "_", symbol.upper()) + ".bars")
+
+    def _coverage_path(self, symbol: str) -> str:
+        return self._path(symbol)[:-len(".bars")] + ".coverage.json"
+
+    def _locked(self):
+        os.makedirs(self.root, exist_ok=True)
+        lock_file = open(os.path.join(self.root, ".lock"), "w")
+        fcntl.flock(lock_file, fcntl.LOCK_EX)  # Writers may live in several processes
+        return lock_file
+
+    def _open(self, symbol: str) -> np.ndarray:
+        path = self._path(symbol)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return EMPTY_BARS
+        if stat.st_size < BAR_DTYPE.itemsize:
+            return EMPTY_BARS
+
+        # Remap only when another writer grew or swapped the file
+        key = (stat.st_ino, stat.st_size)
+        with self._lock:
+            cached = self._maps.get(symbol)
+            if cached and cached[0] == key:
+                self._maps.move_to_end(symbol)
+                return cached[1]
+            bars = np.memmap(path, dtype=BAR_DTYPE, mode="r", shape=(stat.st_size // BAR_DTYPE.itemsize,))
+            self._maps[symbol] = (key, bars)
+            self._maps.move_to_end(symbol)
+            while len(self._maps) > self.max_maps:
+                self._maps.popitem(last=False)  # Unmapped once no caller still holds a view
+            return bars
+
+    def read(self, symbol: str, start: Optional[datetime] = None, end: Optional[datetime] = None) -> np.ndarray:
+        """Zero-copy view of the bars with start <= day <= end (binary search on ts)."""
+        bars = self._open(symbol)
+        if not len(bars):
+            return bars
+
+        ts = bars["ts"]
+        lo = int(np.searchsorted(ts, day_ts(start), side="left")) if start else 0
+        hi = int(np.searchsorted(ts, day_ts(end), side="right")) if end else len(bars)
+        return bars[lo:hi]
+
+    def last_ts(self, symbol: str) -> Optional[int]:
+        bars = self._open(symbol)
+        return int(bars["ts"][-1]) if len(bars) else None
+
+    def append(self, symbol: str, bars: np.ndarray):
+        """Add bars; a bar for an already stored day replaces it."""
+        if not len(bars):
+            return
+
+        bars = np.sort(np.asarray(bars, dtype=BAR_DTYPE), order="ts", kind="stable")
+        # Same day twice in one batch: keep the latest
+        keep = np.append(bars["ts"][1:] != bars["ts"][:-1], True)
+        bars = bars[keep]
+
+        path = self._path(symbol)
+
+        with self._locked():
+            stored = self._open(symbol)
+            last = int(stored["ts"][-1]) if len(stored) else None
+
+            if last is None or bars["ts"][0] > last:
+                # ✅ Fast path: pure tail append
+                with open(path, "ab") as f:
+                    f.write(bars.tobytes())
+            elif bars["ts"][0] == last:
+                # ✅ Today's bar updated intraday: overwrite the last record in place
+                with open(path, "r+b") as f:
+                    f.seek((len(stored) - 1) * BAR_DTYPE.itemsize)
+                    f.write(bars.tobytes())
+            else:
+                # Out-of-order backfill: merge and atomically swap the file (open readers keep the old inode)
+                merged = np.concatenate([np.asarray(stored), bars])
+                order = np.argsort(merged["ts"], kind="stable")
+                merged = merged[order]
+                keep = np.append(merged["ts"][1:] != merged["ts"][:-1], True)
+                tmp_path = path + ".tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(merged[keep].tobytes())
+                os.replace(tmp_path, path)
+                with self._lock:
+                    self._maps.pop(symbol, None)
+
+    def coverage(self, symbol: str) -> list[tuple[date, date]]:
+        """Date ranges already requested from the provider (provider gaps inside them are final)."""
+        try:
+            with open(self._coverage_path(symbol)) as f:
+                return [(date.fromisoformat(start), date.fromisoformat(end)) for start, end in json.load(f)]
+        except (OSError, ValueError):
+            return []
+
+    def mark_covered(self, symbol: str, start: date, end: date):
+        """Merge [start, end] into the symbol's coverage ranges."""
+        if end < start:
+            return
+
+        with self._locked():
+            merged = []
+            for lo, hi in sorted(self.coverage(symbol) + [(start, end)]):
+                if merged and (lo - merged[-1][1]).days <= 1:
+                    merged[-1] = (merged[-1][0], max(merged[-1][1], hi))
+                else:
+                    merged.append((lo, hi))
+
+            path = self._coverage_path(symbol)
+            with open(path + ".tmp", "w") as f:
+                json.dump([[lo.isoformat(), hi.isoformat()] for lo, hi in merged], f)
+            os.replace(path + ".tmp", path)
+
+
+history_store = HistoryStore()
+
+
+def record_frame(symbol: str, frame: pd.DataFrame):
+    """Best-effort append of a yfinance history frame; never breaks the caller's update."""
+    try:
+        history_store.append(symbol, bars_from_frame(frame))
+    except Exception as e:
+        print(f"❌ History store append failed for {symbol}: {e}")
+
+
+def bars_to_columns(bars: np.ndarray) -> dict:
+    """JSON-friendly columnar payload (NaN -> None)."""
+    def column(values):
+        values = np.asarray(values, dtype="f8")
+        return np.where(np.isnan(values), None, values).tolist()
+
+    return {
+        "timestamp": bars["ts"].astype("datetime64[s]").astype("datetime64[D]").astype(str).tolist(),
+        "open": column(bars["open"]),
+        "high": column(bars["high"]),
+        "low": column(bars["low"]),
+        "close": column(bars["close"]),
+        "volume": bars["volume"].tolist(),
+    }
@@ -0,0 +1,324 @@
+# App/Services/indicator_service.py
+
+from App.Services.history_store import history_store
+from collections import OrderedDict, deque
+import math
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+
+INDICATOR_CACHE_SIZE = int(os.getenv("INDICATOR_CACHE_SIZE", 2000))  # (symbol, indicator, params) entries kept
+NAN = float("nan")
+
+
+# Each indicator: compute() = vectorized pass over a close series that also leaves the O(1)
+# state at the last bar; update() commits one more bar; peek() evaluates a bar without committing.
+
+class EMA:
+    outputs = ("ema",)
+
+    def __init__(self, period: int = 20):
+        self.period = period
+        self.alpha = 2 / (period + 1)
+        self.value = None
+        self.count = 0
+
+    def compute(self, close: np.ndarray) -> dict:
+        ema = pd.Series(close).ewm(span=self.period, adjust=False).mean().to_numpy(copy=True)
+        self.count = len(close)
+        self.value = float(ema[-1]) if len(ema) else None
+        ema[:self.period - 1] = np.nan  # Warm-up
+        return {"ema": ema}
+
+    def _next(self, x: float) -> float:
+        return x if self.value is None else self.alpha * x + (1 - self.alpha) * self.value
+
+    def peek(self, x: float) -> dict:
+        return {"ema": self._next(x) if self.count + 1 >= self.period else NAN}
+
+    def update(self, x: float) -> dict:
+        out = self.peek(x)
+        self.value = self._next(x)
+        self.count += 1
+        return out
+
+
+class SMA:
+    outputs = ("sma",)
+
+    def __init__(self, period: int = 20):
+        self.period = period
+        self.window = deque(maxlen=period)
+        self.total = 0.0
+
+    def compute(self, close: np.ndarray) -> dict:
+        sma = pd.Series(close).rolling(self.period).mean().to_numpy()
+        self.window = deque(close[-self.period:].tolist(), maxlen=self.period)
+        self.total = float(sum(self.window))
+        return {"sma": sma}
+
+    def _next_total(self, x: float) -> float:
+        dropped = self.window[0] if len(self.window) == self.period else 0.0
+        return self.total + x - dropped
+
+    def peek(self, x: float) -> dict:
+        ready = len(self.window) + 1 >= self.period
+        return {"sma": self._next_total(x) / self.period if ready else NAN}
+
+    def update(self, x: float) -> dict:
+        out = self.peek(x)
+        self.total = self._next_total(x)
+        self.window.append(x)
+        return out
+
+
+class Bollinger:
+    outputs = ("middle", "upper", "lower")
+
+    def __init__(self, period: int = 20, std: float = 2.0):
+        self.period = period
+        self.std = std
+        self.window = deque(maxlen=period)
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def compute(self, close: np.ndarray) -> dict:
+        rolling = pd.Series(close).rolling(self.period)
+        middle = rolling.mean().to_numpy()
+        deviation = rolling.std(ddof=0).to_numpy()
+        self.window = deque(close[-self.period:].tolist(), maxlen=self.period)
+        self.total = float(sum(self.window))
+        self.total_sq = float(sum(v * v for v in self.window))
+        return {"middle": middle, "upper": middle + self.std * deviation, "lower": middle - self.std * deviation}
+
+    def _next_sums(self, x: float):
+        dropped = self.window[0] if len(self.window) == self.period else 0.0
+        return self.total + x - dropped, self.total_sq + x * x - dropped * dropped
+
+    def peek(self, x: float) -> dict:
+        if len(self.window) + 1 < self.period:
+            return {"middle": NAN, "upper": NAN, "lower": NAN}
+        total, total_sq = self._next_sums(x)
+        mean = total / self.period
+        deviation = math.sqrt(max(total_sq / self.period - mean * mean, 0.0))
+        return {"middle": mean, "upper": mean + self.std * deviation, "lower": mean - self.std * deviation}
+
+    def update(self, x: float) -> dict:
+        out = self.peek(x)
+        self.total, self.total_sq = self._next_sums(x)
+        self.window.append(x)
+        return out
+
+
+class RSI:
+    """Wilder's RSI: smoothed average gain/loss with alpha = 1/period."""
+    outputs = ("rsi",)
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.prev = None
+        self.avg_gain = None
+        self.avg_loss = None
+        self.count = 0  # Price changes seen
+
+    def compute(self, close: np.ndarray) -> dict:
+        rsi = np.full(len(close), np.nan)
+        self.prev = float(close[-1]) if len(close) else None
+        self.count = max(len(close) - 1, 0)
+        if len(close) < 2:
+            return {"rsi": rsi}
+
+        change = np.diff(close)
+        gain = pd.Series(np.clip(change, 0, None)).ewm(alpha=1 / self.period, adjust=False).mean().to_numpy()
+        loss = pd.Series(np.clip(-change, 0, None)).ewm(alpha=1 / self.period, adjust=False).mean().to_numpy()
+        self.avg_gain, self.avg_loss = float(gain[-1]), float(loss[-1])
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = np.where(loss == 0, 100.0, 100 - 100 / (1 + gain / loss))
+        rsi[1:] = values
+        rsi[:self.period] = np.nan  # Warm-up
+        return {"rsi": rsi}
+
+    def _next(self, x: float):
+        if self.prev is None:
+            return None, None
+        change = x - self.prev
+        gain, loss = max(change, 0.0), max(-change, 0.0)
+        if self.avg_gain is None:
+            return gain, loss
+        alpha = 1 / self.period
+        return alpha * gain + (1 - alpha) * self.avg_gain, alpha * loss + (1 - alpha) * self.avg_loss
+
+    def peek(self, x: float) -> dict:
+        avg_gain, avg_loss = self._next(x)
+        if avg_gain is None or self.count + 1 < self.period:
+            return {"rsi": NAN}
+        return {"rsi": 100.0 if avg_loss == 0 else 100 - 100 / (1 + avg_gain / avg_loss)}
+
+    def update(self, x: float) -> dict:
+        out = self.peek(x)
+        avg_gain, avg_loss = self._next(x)
+        if avg_gain is not None:
+            self.avg_gain, self.avg_loss = avg_gain, avg_loss
+            self.count += 1
+        self.prev = x
+        return out
+
+
+class MACD:
+    outputs = ("macd", "signal", "histogram")
+
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9):
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+
+    def compute(self, close: np.ndarray) -> dict:
+        self.fast.compute(close)
+        self.slow.compute(close)
+        series = pd.Series(close)
+        line = (
+            series.ewm(span=self.fast.period, adjust=False).mean()
+            - series.ewm(span=self.slow.period, adjust=False).mean()
+        ).to_numpy(copy=True)
+        signal = self.signal.compute(line)["ema"]
+        line[:self.slow.period - 1] = np.nan
+        signal[:self.slow.period + self.signal.period - 2] = np.nan
+        return {"macd": line, "signal": signal, "histogram": line - signal}
+
+    def peek(self, x: float) -> dict:
+        line = self.fast._next(x) - self.slow._next(x)
+        signal = self.signal._next(line)
+        if self.slow.count + 1 < self.slow.period + self.signal.period - 1:
+            signal = NAN
+        if self.slow.count + 1 < self.slow.period:
+            line = NAN
+        return {"macd": line, "signal": signal, "histogram": line - signal}
+
+    def update(self, x: float) -> dict:
+        out = self.peek(x)
+        self.fast.update(x)
+        self.slow.update(x)
+        self.signal.update(self.fast.value - self.slow.value)
+        return out
+
+
+INDICATORS = {
+    "sma": (SMA, {"period": 20}),
+    "ema": (EMA, {"period": 20}),
+    "rsi": (RSI, {"period": 14}),
+    "macd": (MACD, {"fast": 12, "slow": 26, "signal": 9}),
+    "bollinger": (Bollinger, {"period": 20, "std": 2.0}),
+}
+
+
+def resolve_params(name: str, **given) -> dict:
+    """Defaults for `name` overridden by the non-None values it accepts."""
+    _, defaults = INDICATORS[name]
+    return {key: type(value)(given[key]) if given.get(key) is not None else value for key, value in defaults.items()}
+
+
+class _Entry:
+    __slots__ = ("indicator", "series", "first_ts", "last_ts", "last_close", "count")
+
+
+class IndicatorEngine:
+    """LRU cache of indicator series + O(1) state per (symbol, indicator, params).
+
+    Every stored bar except the newest is committed into the state; the newest bar
+    (today's, still updating intraday) is evaluated with peek() on each read.
+    """
+
+    def __init__(self, max_entries: int = INDICATOR_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _advance(self, key, bars):
+        """Bring the cached entry up to bars[:-1], recomputing only if history was rewritten."""
+        symbol, name, params = key
+        committed = bars[:-1]
+        entry = self._cache.get(key)
+
+        valid = (
+            entry is not None
+            and len(committed) >= entry.count
+            and (entry.count == 0 or (
+                committed["ts"][0] == entry.first_ts
+                and committed["ts"][entry.count - 1] == entry.last_ts
+                and committed["close"][entry.count - 1] == entry.last_close  # A backfill may rewrite a day's close in place
+            ))
+        )
+
+        if not valid:
+            entry = _Entry()
+            cls, _ = INDICATORS[name]
+            entry.indicator = cls(**dict(params))
+            close = np.asarray(committed["close"], dtype="f8")
+            entry.series = {output: values.tolist() for output, values in entry.indicator.compute(close).items()}
+        else:
+            # ✅ Incremental: O(1) per newly committed bar
+            for x in committed["close"][entry.count:]:
+                for output, value in entry.indicator.update(float(x)).items():
+                    entry.series[output].append(value)
+
+        entry.count = len(committed)
+        entry.first_ts = int(committed["ts"][0]) if len(committed) else None
+        entry.last_ts = int(committed["ts"][-1]) if len(committed) else None
+        entry.last_close = float(committed["close"][-1]) if len(committed) else None
+
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return entry
+
+    def get(self, symbol: str, name: str, params: dict, points: int = 100) -> dict | None:
+        symbol = symbol.upper()
+        bars = history_store.read(symbol)
+        if not len(bars):
+            return None
+
+        key = (symbol, name, tuple(sorted(params.items())))
+        with self._lock:
+            entry = self._advance(key, bars)
+            latest = entry.indicator.peek(float(bars["close"][-1]))
+            values = {output: entry.series[output][-(points - 1):] + [latest[output]] if points > 1 else [latest[output]]
+                      for output in entry.indicator.outputs}
+
+        timestamps = bars["ts"][-len(values[entry.indicator.outputs[0]]):]
+        return {
+            "symbol": symbol,
+            "indicator": name,
+            "params": params,
+            "timestamp": timestamps.astype("datetime64[s]").astype("datetime64[D]").astype(str).tolist(),
+            **{output: [None if v is None or math.isnan(v) else round(v, 4) for v in series] for output, series in values.items()},
+        }
+
+    def latest(self, symbol: str) -> dict:
+        """Latest value of every indicator at its default parameters."""
+        result = {}
+        for name in INDICATORS:
+            data = self.get(symbol, name, resolve_params(name), points=1)
+            if data:
+                result[name] = {output: data[output][-1] for output in INDICATORS[name][0].outputs}
+        return result
+
+    def refresh(self, symbols):
+        """Refresh pipeline hook: advance cached keys (and the defaults) of freshly updated symbols."""
+        symbols = {s.upper() for s in symbols}
+        with self._lock:
+            keys = [key for key in self._cache if key[0] in symbols]
+        for symbol in symbols:
+            keys.extend((symbol, name, tuple(sorted(resolve_params(name).items()))) for name in INDICATORS)
+
+        for symbol, name, params in dict.fromkeys(keys):
+            try:
+                self.get(symbol, name, dict(params), points=1)
+            except Exception as e:
+                print(f"❌ Indicator refresh failed for {symbol} {name}: {e}")
+
+
+indicator_engine = IndicatorEngine()
@@ -0,0 +1,83 @@
+# App/Services/job_leader.py
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from App.Config.database import DATABASE_URL
+import asyncio
+import zlib
+
+
+# Unpooled: closing a leader connection must end its Postgres session, which is what drops the lock
+leader_engine = create_async_engine(DATABASE_URL, poolclass=NullPool)
+
+
+class JobLeader:
+    """Session-level pg advisory lock held on a dedicated, unpooled connection.
+
+    Every uvicorn worker runs its own scheduler; jobs that must run in one process only
+    ask is_leader() first. The winner keeps the lock until its connection dies, then
+    the next worker to ask takes over.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.key = zlib.crc32(f"job_leader:{name}".encode())  # Stable across processes (hash() is salted)
+        self._connection = None
+        self._lock = asyncio.Lock()  # Two jobs asking at once must not open two competing connections
+
+    async def _release(self):
+        connection, self._connection = self._connection, None
+        if connection is None:
+            return
+        try:
+            await connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": self.key})
+            await connection.commit()
+        except Exception:
+            pass  # A dead session already lost the lock
+        try:
+            await connection.close()
+        except Exception:
+            pass
+
+    async def is_leader(self) -> bool:
+        async with self._lock:
+            return await self._check()
+
+    async def _check(self) -> bool:
+        if self._connection is not None:
+            try:
+                await self._connection.execute(text("SELECT 1"))
+                await self._connection.commit()  # Never sit idle in a transaction between checks
+                return True
+            except Exception as e:
+                print(f"⚠️ Lost '{self.name}' leadership: {e}")
+                await self._release()
+
+        connection = None
+        try:
+            connection = await leader_engine.connect()
+            acquired = (await connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": self.key})).scalar()
+            await connection.commit()  # Session-level lock outlives the transaction
+        except Exception as e:
+            print(f"❌ Leader election for '{self.name}' failed: {e}")
+            if connection is not None:
+                try:
+                    await connection.close()
+                except Exception:
+                    pass
+            return False
+
+        if not acquired:
+            await connection.close()
+            return False
+
+        self._connection = connection
+        print(f"👑 This process now runs '{self.name}' jobs.")
+        return True
+
+    async def resign(self):
+        await self._release()  # Unlocks, then ends the unpooled session
+
+
+quote_refresh_leader = JobLeader("quote_refresh")
@@ -0,0 +1,125 @@
+# App/Services/market_hours.py
+
+from dataclasses import dataclass, field
+from datetime import datetime, date, time, timedelta
+from typing import Iterable, Optional
+import json
+import os
+import pytz
+
+
+HOLIDAYS_FILE_PATH = "App/Data/market_holidays.json"  # Full-day closures per exchange, keep updated yearly
+
+
+# ✅ Trading session of a single exchange (local wall-clock times)
+@dataclass(frozen=True)
+class Exchange:
+    code: str
+    timezone: str
+    open_time: time
+    close_time: time
+    holidays: frozenset = field(default_factory=frozenset)
+
+    @property
+    def tz(self):
+        return pytz.timezone(self.timezone)
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() < 5 and day.isoformat() not in self.holidays
+
+
+def _load_holidays() -> dict:
+    if not os.path.exists(HOLIDAYS_FILE_PATH):
+        print(f"⚠️ Holiday calendar not found at {HOLIDAYS_FILE_PATH}, only weekends are closed.")
+        return {}
+    with open(HOLIDAYS_FILE_PATH) as f:
+        return json.load(f)
+
+
+def _warn_missing_years(holidays: dict, year: int):
+    """A calendar without the current year silently turns every holiday into a trading day."""
+    for code in ("NSE", "US"):
+        if not any(day.startswith(f"{year}-") for day in holidays.get(code, [])):
+            print(f"⚠️ No {year} holidays for {code} in {HOLIDAYS_FILE_PATH}, only weekends are closed.")
+
+
+_holidays = _load_holidays()
+if _holidays:
+    _warn_missing_years(_holidays, datetime.utcnow().year)
+
+EXCHANGES = {
+    "NSE": Exchange("NSE", "Asia/Kolkata", time(9, 15), time(15, 30), frozenset(_holidays.get("NSE", []))),
+    # BSE and NSE share one trading-holiday calendar, so BSE reuses the NSE list (no "BSE" key in the file)
+    "BSE": Exchange("BSE", "Asia/Kolkata", time(9, 15), time(15, 30), frozenset(_holidays.get("NSE", []))),
+    "US": Exchange("US", "America/New_York", time(9, 30), time(16, 0), frozenset(_holidays.get("US", []))),
+}
+
+# Yahoo-style suffixes; anything without a known suffix trades in the US
+SUFFIX_EXCHANGES = {
+    ".NS": "NSE",
+    ".BO": "BSE",
+}
+
+INDEX_EXCHANGES = {
+    "^NSEI": "NSE",
+    "^NSEBANK": "NSE",
+    "^BSESN": "BSE",
+}
+
+
+def exchange_for_symbol(symbol: str) -> Exchange:
+    """Infer the listing exchange from a ticker's suffix."""
+    symbol = symbol.upper()
+    if symbol in INDEX_EXCHANGES:
+        return EXCHANGES[INDEX_EXCHANGES[symbol]]
+    for suffix, code in SUFFIX_EXCHANGES.items():
+        if symbol.endswith(suffix):
+            return EXCHANGES[code]
+    return EXCHANGES["US"]
+
+
+def _local_now(exchange: Exchange, now: Optional[datetime]) -> datetime:
+    now = now or datetime.now(pytz.utc)
+    if now.tzinfo is None:
+        now = pytz.utc.localize(now)  # Naive datetimes in this project are UTC
+    return now.astimezone(exchange.tz)
+
+
+def is_exchange_open(exchange: Exchange, now: Optional[datetime] = None) -> bool:
+    local = _local_now(exchange, now)
+    if not exchange.is_trading_day(local.date()):
+        return False
+    return exchange.open_time <= local.time() < exchange.close_time
+
+
+def is_market_open(symbol: str, now: Optional[datetime] = None) -> bool:
+    """True while the symbol's exchange is in its regular session."""
+    return is_exchange_open(exchange_for_symbol(symbol), now)
+
+
+def next_open(exchange: Exchange, now: Optional[datetime] = None) -> datetime:
+    """Next session open (UTC, naive) at or after `now`."""
+    local = _local_now(exchange, now)
+    day = local.date()
+    if local.time() >= exchange.open_time:
+        day += timedelta(days=1)
+
+    while not exchange.is_trading_day(day):
+        day += timedelta(days=1)
+
+    opening = exchange.tz.localize(datetime.combine(day, exchange.open_time))
+    return opening.astimezone(pytz.utc).replace(tzinfo=None)
+
+
+def split_by_market_status(symbols: Iterable[str], now: Optional[datetime] = None):
+    """Partition symbols into (open, closed) lists, checking each exchange once."""
+    status = {code: is_exchange_open(exchange, now) for code, exchange in EXCHANGES.items()}
+
+    open_symbols, closed_symbols = [], []
+    for symbol in symbols:
+        if status[exchange_for_symbol(symbol).code]:
+            open_symbols.append(symbol)
+        else:
+            closed_symbols.append(symbol)
+
+    return open_symbols, closed_symbols
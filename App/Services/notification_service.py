@@ -0,0 +1,235 @@
+# App/Services/notification_service.py
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+from App.Models.stock import DeviceToken
+from App.Schemas.stock import DeviceTokenCreate
+from App.celery_config import CELERY_BROKER_URL
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+import json
+import os
+import time
+import redis
+import requests
+
+
+NOTIFY_TRANSPORT = os.getenv("NOTIFY_TRANSPORT", "file")  # file / http / firebase
+NOTIFY_REDIS_URL = os.getenv("NOTIFY_REDIS_URL", CELERY_BROKER_URL)
+NOTIFY_COOLDOWN_SECONDS = int(os.getenv("NOTIFY_COOLDOWN_SECONDS", 900))  # Same user/symbol/direction at most once per window
+NOTIFY_OUTBOX_PATH = Path(os.getenv("NOTIFY_OUTBOX_PATH", Path(__file__).resolve().parent.parent / "Data" / "notifications.jsonl"))
+NOTIFY_HTTP_URL = os.getenv("NOTIFY_HTTP_URL", "http://localhost:8001/push")
+NOTIFY_HTTP_TIMEOUT = float(os.getenv("NOTIFY_HTTP_TIMEOUT", 5))
+LATENCY_SAMPLES = 1000  # Most recent tick-to-delivery latencies kept for percentiles
+
+
+# ---------- Transports: send(messages) -> messages that failed ----------
+
+class FileTransport:
+    """Local stand-in for push: appends each message as a JSON line."""
+
+    def __init__(self, path: Path = NOTIFY_OUTBOX_PATH):
+        self.path = Path(path)
+
+    def send(self, messages: list[dict]) -> list[dict]:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a") as outbox:
+            for message in messages:
+                outbox.write(json.dumps({**message, "sent_at": time.time()}) + "\n")
+        return []
+
+
+class HttpTransport:
+    """POSTs a whole batch to a push gateway (or a local test server) in one request."""
+
+    def __init__(self, url: str = NOTIFY_HTTP_URL, timeout: float = NOTIFY_HTTP_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, messages: list[dict]) -> list[dict]:
+        response = requests.post(self.url, json={"messages": messages}, timeout=self.timeout)
+        response.raise_for_status()
+        return []
+
+
+class FirebaseTransport:
+    """FCM via firebase_admin (optional dependency, credentials from GOOGLE_APPLICATION_CREDENTIALS)."""
+    MAX_BATCH = 500  # send_each limit
+
+    def __init__(self):
+        import firebase_admin
+        from firebase_admin import messaging
+        if not firebase_admin._apps:
+            firebase_admin.initialize_app()
+        self.messaging = messaging
+
+    def send(self, messages: list[dict]) -> list[dict]:
+        failed = []
+        for start in range(0, len(messages), self.MAX_BATCH):
+            chunk = messages[start:start + self.MAX_BATCH]
+            response = self.messaging.send_each([
+                self.messaging.Message(
+                    token=message["token"],
+                    notification=self.messaging.Notification(title=message["title"], body=message["body"]),
+                    data={key: str(value) for key, value in message["data"].items()},
+                )
+                for message in chunk
+            ])
+            failed.extend(message for message, result in zip(chunk, response.responses) if not result.success)
+        return failed
+
+
+TRANSPORTS = {"file": FileTransport, "http": HttpTransport, "firebase": FirebaseTransport}
+_transport = None
+
+
+def get_transport():
+    global _transport
+    if _transport is None:
+        _transport = TRANSPORTS[NOTIFY_TRANSPORT]()
+    return _transport
+
+
+# ---------- Dedupe, batching, metrics ----------
+
+_redis = None
+
+
+def get_redis() -> redis.Redis:
+    global _redis
+    if _redis is None:
+        _redis = redis.Redis.from_url(NOTIFY_REDIS_URL)
+    return _redis
+
+
+def alert_payload(alert: dict) -> dict:
+    """JSON-safe copy of a triggered alert; the trigger time becomes the epoch tick_ts used for latency."""
+    triggered_at = alert.get("triggered_at") or datetime.utcnow()
+    return {
+        "id": alert["id"],
+        "user_id": alert["user_id"],
+        "symbol": alert["symbol"],
+        "direction": alert["direction"],
+        "threshold": alert["threshold"],
+        "triggered_price": alert["triggered_price"],
+        "tick_ts": (triggered_at - datetime(1970, 1, 1)).total_seconds(),
+    }
+
+
+def cooldown_key(alert: dict) -> str:
+    return f"notify:cooldown:{alert['user_id']}:{alert['symbol']}:{alert['direction']}"
+
+
+# ✅ SET NX EX per user/symbol/direction: only the first trigger inside the cooldown window goes out
+def claim_alerts(alerts: list[dict]) -> list[dict]:
+    if not alerts:
+        return []
+    pipe = get_redis().pipeline(transaction=False)
+    for alert in alerts:
+        pipe.set(cooldown_key(alert), alert["id"], nx=True, ex=NOTIFY_COOLDOWN_SECONDS)
+    claimed = pipe.execute()
+    return [alert for alert, fresh in zip(alerts, claimed) if fresh]
+
+
+def release_claims(keys) -> None:
+    """Undo claims whose push never went out, so the next trigger inside the window is not suppressed."""
+    keys = list(dict.fromkeys(keys))
+    if keys:
+        get_redis().delete(*keys)
+
+
+def build_messages(alerts: list[dict], tokens: dict[int, list[str]]) -> list[dict]:
+    """One message per device of each user, summarising every alert of theirs in this batch."""
+    by_user = defaultdict(list)
+    for alert in alerts:
+        by_user[alert["user_id"]].append(alert)
+
+    messages = []
+    for user_id, user_alerts in by_user.items():
+        if len(user_alerts) == 1:
+            alert = user_alerts[0]
+            title = f"{alert['symbol']} is {alert['direction']} {alert['threshold']:g}"
+        else:
+            title = f"{len(user_alerts)} price alerts triggered"
+        body = ", ".join(f"{alert['symbol']} @ {alert['triggered_price']:g}" for alert in user_alerts)
+        data = {"alert_ids": ",".join(str(alert["id"]) for alert in user_alerts)}
+        tick_ts = min(alert["tick_ts"] for alert in user_alerts)  # Oldest tick: worst-case latency of the batch
+        cooldown = [cooldown_key(alert) for alert in user_alerts]  # Released if this message is finally dropped
+
+        for token in tokens.get(user_id, []):
+            messages.append({
+                "user_id": user_id, "token": token, "title": title, "body": body, "data": data,
+                "tick_ts": tick_ts, "cooldown": cooldown,
+            })
+    return messages
+
+
+def record_delivery(delivered: list[dict], failed: int = 0):
+    """Counters per minute plus a rolling window of tick-to-delivery latencies (ms)."""
+    now = time.time()
+    minute = int(now // 60)
+    pipe = get_redis().pipeline(transaction=False)
+    if delivered:
+        pipe.incrby("notify:delivered", len(delivered))
+        pipe.incrby(f"notify:delivered:{minute}", len(delivered))
+        pipe.expire(f"notify:delivered:{minute}", 3600)
+        pipe.lpush("notify:latency_ms", *[round((now - message["tick_ts"]) * 1000) for message in delivered])
+        pipe.ltrim("notify:latency_ms", 0, LATENCY_SAMPLES - 1)
+    if failed:
+        pipe.incrby("notify:failed", failed)
+    pipe.execute()
+
+
+def delivery_metrics(window_minutes: int = 5) -> dict:
+    r = get_redis()
+    minute = int(time.time() // 60)
+    recent = r.mget([f"notify:delivered:{m}" for m in range(minute - window_minutes + 1, minute + 1)])
+    latencies = sorted(int(value) for value in r.lrange("notify:latency_ms", 0, -1))
+
+    def percentile(p):
+        return latencies[min(int(len(latencies) * p), len(latencies) - 1)] if latencies else None
+
+    return {
+        "delivered_total": int(r.get("notify:delivered") or 0),
+        "failed_total": int(r.get("notify:failed") or 0),
+        "per_minute": round(sum(int(value or 0) for value in recent) / window_minutes, 2),
+        "latency_ms": {"samples": len(latencies), "p50": percentile(0.5), "p95": percentile(0.95), "max": latencies[-1] if latencies else None},
+    }
+
+
+# ---------- Device tokens ----------
+
+# ✅ A token belongs to whichever user registered it last (shared browsers re-register on login)
+async def register_device(db: AsyncSession, user_id: int, data: DeviceTokenCreate):
+    stmt = insert(DeviceToken).values(user_id=user_id, token=data.token, platform=data.platform)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["token"],
+            set_={"user_id": user_id, "platform": data.platform, "last_seen_at": datetime.utcnow()}
+        )
+    )
+    await db.commit()
+
+
+async def remove_device(db: AsyncSession, user_id: int, token: str) -> bool:
+    result = await db.execute(
+        delete(DeviceToken)
+        .where(DeviceToken.user_id == user_id, DeviceToken.token == token)
+        .returning(DeviceToken.id)
+    )
+    removed = result.first() is not None
+    await db.commit()
+    return removed
+
+
+async def device_tokens(db: AsyncSession, user_ids) -> dict[int, list[str]]:
+    result = await db.execute(
+        select(DeviceToken.user_id, DeviceToken.token).where(DeviceToken.user_id.in_(list(user_ids)))
+    )
+    tokens = defaultdict(list)
+    for user_id, token in result.all():
+        tokens[user_id].append(token)
+    return tokens
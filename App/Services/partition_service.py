@@ -0,0 +1,135 @@
+# App/Services/partition_service.py
+
+from sqlalchemy import text
+from datetime import datetime, date
+import os
+
+
+# Table -> (partition key column, retention in months; 0 keeps every partition)
+PARTITIONED_TABLES = {
+    "stock_analysis_snapshots": ("timestamp", int(os.getenv("SNAPSHOT_RETENTION_MONTHS", 24))),
+    "portfolio_snapshots": ("created_at", int(os.getenv("SNAPSHOT_RETENTION_MONTHS", 24))),
+    "stock_history": ("recorded_at", int(os.getenv("STOCK_HISTORY_RETENTION_MONTHS", 6))),
+}
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", 3))
+PARTITION_RETENTION_MODE = os.getenv("PARTITION_RETENTION_MODE", "drop")  # "drop" or "detach" (keep as archive table)
+
+
+def _add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def archive_name(name: str, now: datetime | None = None) -> str:
+    """Detached partitions are kept as <table>_pYYYYMM_archived_YYYYMMDD."""
+    return f"{name}_archived_{(now or datetime.utcnow()):%Y%m%d}"
+
+
+async def _is_partitioned(conn, table: str) -> bool:
+    result = await conn.execute(
+        text("SELECT relkind = 'p' FROM pg_class WHERE relname = :table AND relkind IN ('r', 'p')"),
+        {"table": table}
+    )
+    return bool(result.scalar())
+
+
+async def _ensure_month(conn, table: str, month: date) -> bool:
+    name = partition_name(table, month)
+    result = await conn.execute(text("SELECT to_regclass(:name) IS NULL"), {"name": name})
+    if not result.scalar():
+        return False
+
+    await conn.execute(text(
+        f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" '
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+    ))
+    print(f"🗂️ Created partition {name}")
+    return True
+
+
+# ✅ Monthly partitions from the current month through PARTITION_MONTHS_AHEAD months ahead
+async def ensure_partitions(conn, now: datetime | None = None) -> int:
+    """Works with an AsyncConnection or AsyncSession; the caller commits."""
+    this_month = (now or datetime.utcnow()).date().replace(day=1)
+    created = 0
+
+    for table in PARTITIONED_TABLES:
+        if not await _is_partitioned(conn, table):
+            continue  # Migration not applied yet
+
+        for offset in range(PARTITION_MONTHS_AHEAD + 1):
+            created += await _ensure_month(conn, table, _add_months(this_month, offset))
+
+    return created
+
+
+# ✅ Past months too, for backfills that write rows dated before the current month
+async def ensure_partition_range(conn, table: str, start: date, end: date) -> int:
+    if not await _is_partitioned(conn, table):
+        return 0
+    month, created = start.replace(day=1), 0
+    while month <= end:
+        created += await _ensure_month(conn, table, month)
+        month = _add_months(month, 1)
+    return created
+
+
+def retention_start(table: str, now: datetime | None = None) -> date | None:
+    """First day still kept by retention (None when the table keeps everything)."""
+    retention_months = PARTITIONED_TABLES[table][1]
+    if retention_months <= 0:
+        return None
+    return _add_months((now or datetime.utcnow()).date().replace(day=1), -retention_months)
+
+
+# ✅ Retention: detach (and drop) whole monthly partitions instead of DELETEing rows
+async def apply_retention(conn, now: datetime | None = None) -> list[str]:
+    this_month = (now or datetime.utcnow()).date().replace(day=1)
+    removed = []
+
+    for table, (_, retention_months) in PARTITIONED_TABLES.items():
+        if retention_months <= 0 or not await _is_partitioned(conn, table):
+            continue
+
+        cutoff = partition_name(table, _add_months(this_month, -retention_months))
+        result = await conn.execute(
+            text("""
+                SELECT child.relname
+                FROM pg_inherits
+                JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+                JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+                WHERE parent.relname = :table
+                ORDER BY child.relname
+            """),
+            {"table": table}
+        )
+
+        # Names sort chronologically (<table>_pYYYYMM); everything before the cutoff month goes
+        for name in result.scalars().all():
+            if not name.startswith(f"{table}_p") or name >= cutoff:
+                continue
+
+            await conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"'))
+            if PARTITION_RETENTION_MODE == "drop":
+                await conn.execute(text(f'DROP TABLE "{name}"'))
+            else:
+                # Free the partition name so a backfill into that month can create it again
+                archived = archive_name(name, now)
+                await conn.execute(text(f'ALTER TABLE "{name}" RENAME TO "{archived}"'))
+                name = archived
+            removed.append(name)
+            print(f"🧹 Retired partition {name} ({PARTITION_RETENTION_MODE})")
+
+    return removed
+
+
+async def maintain_partitions(db) -> dict:
+    created = await ensure_partitions(db)
+    removed = await apply_retention(db)
+    await db.commit()
+    return {"created": created, "removed": removed}
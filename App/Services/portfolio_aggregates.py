@@ -0,0 +1,165 @@
+# App/Services/portfolio_aggregates.py
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import text, func
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.dialects.postgresql import insert
+from App.Models.stock import PortfolioAggregate, UserStock, StockData, Stock
+from datetime import datetime
+
+
+DEADLOCK_RETRIES = 3
+
+
+# One statement per tick: every holding of a moved symbol is re-marked, and the
+# (new - old mark) x quantity deltas are summed per holder into their running totals.
+# FOR UPDATE makes a concurrent tick on the same symbol read the mark this one leaves;
+# rows are locked in key order (holdings by id, then totals by user_id) so concurrent
+# writers with overlapping holders queue instead of deadlocking.
+APPLY_DELTAS_SQL = text("""
+    WITH prices AS (
+        SELECT * FROM unnest(CAST(:symbols AS text[]), CAST(:prices AS float8[])) AS p(symbol, price)
+    ),
+    locked AS (
+        SELECT us.id, us.user_id, us.quantity, COALESCE(us.mark_price, us.purchase_price) AS mark, prices.price
+        FROM user_stocks us
+        JOIN prices ON prices.symbol = us.symbol
+        WHERE us.mark_price IS DISTINCT FROM prices.price
+        ORDER BY us.id
+        FOR UPDATE OF us
+    ),
+    agg_locked AS (
+        SELECT agg.user_id
+        FROM portfolio_aggregates agg
+        WHERE agg.user_id IN (SELECT user_id FROM locked)
+        ORDER BY agg.user_id
+        FOR UPDATE
+    ),
+    moved AS (
+        UPDATE user_stocks us
+        SET mark_price = locked.price
+        FROM locked
+        WHERE us.id = locked.id
+        RETURNING locked.user_id, (locked.price - locked.mark) * locked.quantity AS delta
+    )
+    UPDATE portfolio_aggregates agg
+    SET current_value = agg.current_value + d.delta, updated_at = :now
+    FROM (SELECT user_id, SUM(delta) AS delta FROM moved GROUP BY user_id) d
+    JOIN agg_locked ON agg_locked.user_id = d.user_id
+    WHERE agg.user_id = d.user_id
+""")
+
+
+# ✅ O(holders of the moved symbols); call inside the price writer's transaction
+async def apply_price_deltas(db: AsyncSession, prices: dict[str, float]):
+    prices = {symbol: float(price) for symbol, price in prices.items() if price is not None}
+    if not prices:
+        return
+    params = {"symbols": list(prices), "prices": list(prices.values()), "now": datetime.utcnow()}
+
+    # 🔁 A deadlock with a writer outside this ordering only rolls back the savepoint, then retries
+    for attempt in range(DEADLOCK_RETRIES):
+        try:
+            async with db.begin_nested():
+                await db.execute(APPLY_DELTAS_SQL, params)
+            return
+        except DBAPIError as e:
+            if getattr(e.orig, "sqlstate", None) != "40P01" or attempt == DEADLOCK_RETRIES - 1:
+                raise
+            print(f"⚠️ Deadlock applying price deltas, retrying ({attempt + 1}/{DEADLOCK_RETRIES}).")
+
+
+async def _adjust(db: AsyncSession, user_id: int, investment: float, value: float, holdings: int):
+    stmt = insert(PortfolioAggregate).values(
+        user_id=user_id, total_investment=investment, current_value=value,
+        holdings=holdings, updated_at=datetime.utcnow()
+    )
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={
+                "total_investment": PortfolioAggregate.total_investment + stmt.excluded.total_investment,
+                "current_value": PortfolioAggregate.current_value + stmt.excluded.current_value,
+                "holdings": PortfolioAggregate.holdings + stmt.excluded.holdings,
+                "updated_at": stmt.excluded.updated_at,
+            }
+        )
+    )
+
+
+async def latest_price(db: AsyncSession, symbol: str):
+    result = await db.execute(
+        select(func.coalesce(StockData.current_price, Stock.price))
+        .select_from(Stock)
+        .outerjoin(StockData, StockData.symbol == Stock.symbol)
+        .where(Stock.symbol == symbol)
+    )
+    return result.scalar()
+
+
+# ✅ Holding edits: remove the old contribution, add the new one, in the caller's transaction
+async def holding_added(db: AsyncSession, holding: UserStock):
+    if holding.mark_price is None:
+        holding.mark_price = await latest_price(db, holding.symbol) or holding.purchase_price
+    await _adjust(db, holding.user_id, holding.purchase_price * holding.quantity, holding.mark_price * holding.quantity, 1)
+
+
+async def holding_removed(db: AsyncSession, holding: UserStock):
+    mark = holding.mark_price if holding.mark_price is not None else holding.purchase_price
+    await _adjust(db, holding.user_id, -holding.purchase_price * holding.quantity, -mark * holding.quantity, -1)
+
+
+async def holding_changed(db: AsyncSession, holding: UserStock, old_purchase_price: float, old_quantity: int):
+    mark = holding.mark_price if holding.mark_price is not None else old_purchase_price
+    holding.mark_price = mark
+    await _adjust(
+        db, holding.user_id,
+        holding.purchase_price * holding.quantity - old_purchase_price * old_quantity,
+        mark * (holding.quantity - old_quantity),
+        0
+    )
+
+
+def _totals(row) -> dict:
+    investment, value = row.total_investment, row.current_value
+    profit_loss = value - investment
+    return {
+        "total_investment": investment,
+        "current_value": value,
+        "total_profit_loss": profit_loss,
+        "overall_change_percentage": profit_loss / investment * 100 if investment > 0 else 0.0,
+        "holdings": row.holdings,
+        "updated_at": row.updated_at,
+    }
+
+
+# ✅ O(1): one primary-key read
+async def get_portfolio_totals(db: AsyncSession, user_id: int) -> dict:
+    row = await db.get(PortfolioAggregate, user_id)
+    if row is None:
+        return {"total_investment": 0.0, "current_value": 0.0, "total_profit_loss": 0.0,
+                "overall_change_percentage": 0.0, "holdings": 0, "updated_at": None}
+    return _totals(row)
+
+
+# ✅ Reconcile: re-mark every holding at the latest price and recompute every total (clears float drift)
+async def rebuild_portfolio_aggregates(db: AsyncSession) -> int:
+    await db.execute(text("""
+        UPDATE user_stocks us
+        SET mark_price = COALESCE(sd.current_price, s.price, us.purchase_price)
+        FROM user_stocks u
+        LEFT JOIN stock_data sd ON sd.symbol = u.symbol
+        LEFT JOIN stocks s ON s.symbol = u.symbol
+        WHERE u.id = us.id
+    """))
+    await db.execute(text("DELETE FROM portfolio_aggregates"))
+    result = await db.execute(text("""
+        INSERT INTO portfolio_aggregates (user_id, total_investment, current_value, holdings, updated_at)
+        SELECT user_id, SUM(purchase_price * quantity), SUM(mark_price * quantity), COUNT(*), :now
+        FROM user_stocks
+        GROUP BY user_id
+    """), {"now": datetime.utcnow()})
+    await db.commit()
+    print(f"🧮 Rebuilt portfolio aggregates for {result.rowcount} user(s).")
+    return result.rowcount
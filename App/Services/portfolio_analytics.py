@@ -0,0 +1,136 @@
+# App/Services/portfolio_analytics.py
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import func, insert
+from App.Models.stock import UserStock, Stock, StockData, PortfolioSnapshot
+from App.Services.quote_board import quote_board
+from datetime import datetime
+from typing import Iterable, Optional
+import numpy as np
+import pandas as pd
+
+
+HOLDING_COLUMNS = ["user_id", "symbol", "name", "purchase_price", "quantity", "live_price"]
+
+
+def holdings_frame(rows: Iterable) -> pd.DataFrame:
+    """Columns from ORM objects, Row objects or dicts carrying HOLDING_COLUMNS."""
+    records = [
+        row if isinstance(row, dict) else {column: getattr(row, column, None) for column in HOLDING_COLUMNS}
+        for row in rows
+    ]
+    frame = pd.DataFrame.from_records(records, columns=HOLDING_COLUMNS)
+    frame["purchase_price"] = frame["purchase_price"].astype("f8")
+    frame["quantity"] = pd.to_numeric(frame["quantity"])  # Stays integer when every row has one
+    frame["live_price"] = frame["live_price"].astype("f8")
+    return frame
+
+
+# ✅ Per-holding and per-user P&L, weights and % change, all as column operations
+def analyze_holdings(frame: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Returns (holdings with derived columns, one totals row per user_id)."""
+    holdings = frame.copy()
+    holdings["total_investment"] = holdings["purchase_price"] * holdings["quantity"]
+    holdings["current_value"] = holdings["live_price"] * holdings["quantity"]
+    holdings["profit_loss"] = holdings["current_value"] - holdings["total_investment"]
+
+    purchase = holdings["purchase_price"].to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change = np.where(purchase > 0, (holdings["live_price"].to_numpy() - purchase) / purchase * 100, 0.0)
+    holdings["percentage_change"] = np.round(change, 2)
+
+    totals = holdings.groupby("user_id", sort=True)[["total_investment", "current_value", "profit_loss"]].sum()
+    totals = totals.rename(columns={"profit_loss": "total_profit_loss"})
+
+    invested = totals["total_investment"].to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        totals["overall_change_percentage"] = np.where(invested > 0, totals["total_profit_loss"].to_numpy() / invested * 100, 0.0)
+
+    # Weight of each holding inside its own user's portfolio
+    user_value = holdings["user_id"].map(totals["current_value"]).to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        holdings["weight"] = np.where(user_value > 0, holdings["current_value"].to_numpy() / user_value, 0.0)
+
+    return holdings, totals
+
+
+def _clean(value):
+    if isinstance(value, (np.floating, float)):
+        return None if np.isnan(value) else float(value)
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+def portfolio_summary(holdings: pd.DataFrame, totals: pd.DataFrame, user_id=None) -> dict:
+    """The analyze_portfolio response shape for one user (or the only user present)."""
+    if user_id is None:
+        user_id = totals.index[0] if len(totals) else None
+    if user_id is None or user_id not in totals.index:
+        return {"total_investment": 0, "current_value": 0, "total_profit_loss": 0, "stock_analysis": [], "overall_change_percentage": 0}
+
+    total = totals.loc[user_id]
+    rows = holdings[holdings["user_id"] == user_id]
+    columns = [
+        "symbol", "name", "purchase_price", "live_price", "quantity", "profit_loss",
+        "percentage_change", "total_investment", "current_value", "weight"
+    ]
+    stock_analysis = [
+        {column: _clean(value) for column, value in zip(columns, values)}
+        for values in rows[columns].itertuples(index=False, name=None)
+    ]
+
+    return {
+        "total_investment": float(total["total_investment"]),
+        "current_value": float(total["current_value"]),
+        "total_profit_loss": float(total["total_profit_loss"]),
+        "stock_analysis": stock_analysis,
+        "overall_change_percentage": float(total["overall_change_percentage"]),
+    }
+
+
+# ✅ Holdings of one, some or all users with their latest known price, in one query
+async def load_holdings(db: AsyncSession, user_ids: Optional[list[int]] = None) -> pd.DataFrame:
+    query = (
+        select(
+            UserStock.user_id, UserStock.symbol, UserStock.name, UserStock.purchase_price, UserStock.quantity,
+            func.coalesce(StockData.current_price, Stock.price, UserStock.purchase_price).label("live_price")
+        )
+        .outerjoin(StockData, StockData.symbol == UserStock.symbol)
+        .outerjoin(Stock, Stock.symbol == UserStock.symbol)
+    )
+    if user_ids is not None:
+        query = query.where(UserStock.user_id.in_(user_ids))
+
+    result = await db.execute(query)
+    frame = holdings_frame(dict(row) for row in result.mappings().all())
+
+    # 📋 Prefer the shared-memory board: it is never older than stock_data on this host
+    live = {symbol: quote_board.price(symbol) for symbol in frame["symbol"].unique()}
+    frame["live_price"] = frame["symbol"].map(live).astype("f8").fillna(frame["live_price"])
+    return frame
+
+
+# ✅ Revalue every user's portfolio in one vectorized pass and store one snapshot per user
+async def revalue_all_users(db: AsyncSession, save_snapshots: bool = True) -> pd.DataFrame:
+    _, totals = analyze_holdings(await load_holdings(db))
+    if save_snapshots and len(totals):
+        now = datetime.utcnow()
+        await db.execute(
+            insert(PortfolioSnapshot),
+            [
+                {
+                    "user_id": int(user_id),
+                    "total_investment": float(row.total_investment),
+                    "current_value": float(row.current_value),
+                    "total_profit_loss": float(row.total_profit_loss),
+                    "overall_change": float(row.overall_change_percentage),
+                    "created_at": now,
+                }
+                for user_id, row in totals.iterrows()
+            ]
+        )
+        await db.commit()
+        print(f"📸 Saved portfolio snapshots for {len(totals)} user(s).")
+    return totals
@@ -0,0 +1,49 @@
+# App/Services/price_events.py
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func
+import json
+import os
+import time
+
+
+PRICE_EVENTS_CHANNEL = os.getenv("PRICE_EVENTS_CHANNEL", "price_events")
+EVENTS_PER_NOTIFY = 100  # Keeps each payload well under Postgres' 8000-byte NOTIFY limit
+
+
+def event_version() -> int:
+    """Microseconds since the epoch: later writes win when events arrive out of order."""
+    return time.time_ns() // 1000
+
+
+async def _notify(db: AsyncSession, key: str, events: list):
+    for start in range(0, len(events), EVENTS_PER_NOTIFY):
+        payload = json.dumps({key: events[start:start + EVENTS_PER_NOTIFY]}, separators=(",", ":"))
+        await db.execute(select(func.pg_notify(PRICE_EVENTS_CHANNEL, payload)))
+
+
+# ✅ Call before the writer's commit: NOTIFY is transactional, so listeners only hear committed prices
+async def publish_price_events(db: AsyncSession, quotes: dict[str, dict]):
+    """quotes: symbol -> dict with "current_price" and optionally "percent_change" and "volume"."""
+    version = event_version()
+    events = [
+        [
+            symbol,
+            float(q["current_price"]),
+            None if q.get("percent_change") is None else round(float(q["percent_change"]), 4),
+            version,
+            None if q.get("volume") is None else int(q["volume"]),
+        ]
+        for symbol, q in quotes.items()
+        if q.get("current_price") is not None
+    ]
+    if events:
+        await _notify(db, "p", events)
+
+
+async def publish_alert_events(db: AsyncSession, added: list[tuple] = (), removed: list[int] = ()):
+    """Keep every worker's alert index in step: added = (id, symbol, direction, threshold)."""
+    if added:
+        await _notify(db, "a", [list(alert) for alert in added])
+    if removed:
+        await _notify(db, "r", list(removed))
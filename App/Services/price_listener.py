@@ -0,0 +1,115 @@
+# App/Services/price_listener.py
+
+from sqlalchemy.engine import make_url
+from App.Config.database import DATABASE_URL, SessionLocal
+from App.Services.price_events import PRICE_EVENTS_CHANNEL
+from App.Services.alert_service import alert_index, load_alert_index
+from App.Services.trending_service import trending_tracker, invalidate_trending_cache
+from App.Services.quote_board import quote_board
+from datetime import datetime
+import asyncio
+import json
+import asyncpg
+
+
+RECONNECT_MAX_SECONDS = 30
+
+
+class PriceEventListener:
+    """One LISTEN connection per API worker that applies other workers' writes to this worker's caches."""
+
+    def __init__(self, channel: str = PRICE_EVENTS_CHANNEL):
+        self.channel = channel
+        self.versions: dict[str, int] = {}  # symbol -> newest event version applied
+        self.received = 0
+        self._task = None
+
+    # ---------- Applying events ----------
+
+    def apply_prices(self, events: list):
+        for event in events:
+            symbol, price, change, version, volume = (event + [None])[:5]  # Events from older writers carry no volume
+            if version <= self.versions.get(symbol, 0):
+                continue  # Out of order: a newer price is already applied
+            self.versions[symbol] = version
+
+            trending_tracker.observe(symbol, price, change, volume)
+
+            # The board is shared per host, so only a writer on another host leaves it behind
+            updated_at = version / 1_000_000
+            current = quote_board.get(symbol)
+            if current is None or (current["last_updated"] - datetime(1970, 1, 1)).total_seconds() < updated_at:
+                quote_board.publish({symbol: {
+                    "current_price": price,
+                    "percent_change": change if change is not None else (current or {}).get("percent_change"),
+                    "previous_close_price": (current or {}).get("previous_close_price"),
+                    "volume": volume if volume is not None else (current or {}).get("volume"),
+                }}, updated_at)
+
+        invalidate_trending_cache()
+
+    def _dispatch(self, connection, pid, channel, payload: str):
+        try:
+            # The writer's own worker hears its events too; applying them again is a no-op
+            message = json.loads(payload)
+            self.received += 1
+            if "p" in message:
+                self.apply_prices(message["p"])
+            for alert_id, symbol, direction, threshold in message.get("a", []):
+                alert_index.add(alert_id, symbol, direction, threshold)
+            for alert_id in message.get("r", []):
+                alert_index.remove(alert_id)
+        except Exception as e:
+            print(f"❌ Bad price event: {e}")
+
+    # ---------- Connection ----------
+
+    async def _resync(self):
+        """Events sent while disconnected are lost: rebuild what they would have updated."""
+        async with SessionLocal() as db:
+            await load_alert_index(db)
+        invalidate_trending_cache()
+
+    async def _run(self):
+        dsn = make_url(DATABASE_URL).set(drivername="postgresql").render_as_string(hide_password=False)
+        delay, connected_before = 1, False
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(dsn)
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _: closed.set())
+                await connection.add_listener(self.channel, self._dispatch)
+                print(f"📡 Listening for price events on '{self.channel}'.")
+
+                if connected_before:
+                    await self._resync()
+                connected_before, delay = True, 1
+
+                await closed.wait()
+                print("⚠️ Price event connection lost, reconnecting.")
+            except asyncio.CancelledError:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+                raise
+            except Exception as e:
+                print(f"❌ Price event listener error: {e}")
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_SECONDS)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+price_listener = PriceEventListener()
@@ -0,0 +1,239 @@
+# App/Services/quote_board.py
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from App.Models.stock import StockData
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+import fcntl
+import math
+import os
+import time
+import numpy as np
+
+
+QUOTE_BOARD_PATH = os.getenv("QUOTE_BOARD_PATH", "App/Data/quote_board.bin")  # Same path for every worker on the host
+QUOTE_BOARD_CAPACITY = int(os.getenv("QUOTE_BOARD_CAPACITY", 16384))  # Slots are never reused, size for the symbol universe
+
+MAGIC = 0x51424431  # "QBD1"
+HEADER_BYTES = 64
+SYMBOL_BYTES = 16
+HEADER_DTYPE = np.dtype([("magic", "<u4"), ("capacity", "<u4"), ("count", "<u4"), ("pad", "<u4"), ("version", "<u8")])
+ROW_DTYPE = np.dtype([
+    ("seq", "<u8"),            # Seqlock: odd while the row is being written
+    ("symbol", f"S{SYMBOL_BYTES}"),
+    ("last", "<f8"),
+    ("prev_close", "<f8"),
+    ("change_pct", "<f8"),
+    ("volume", "<i8"),
+    ("updated_at", "<f8"),     # Epoch seconds (UTC)
+])
+READ_RETRIES = 100
+
+
+def _nan_to_none(value: float):
+    return None if math.isnan(value) else value
+
+
+class QuoteBoard:
+    """Latest quote per symbol in an mmap'd file shared by every worker process on the host.
+
+    Writers serialise on an flock and bump each row's seq to odd, write, then to even;
+    readers copy the row and retry if the seq was odd or moved (seqlock), so reads never lock.
+    A symbol's slot never moves, so each process caches symbol -> slot and only scans new slots.
+    """
+
+    def __init__(self, path: str = QUOTE_BOARD_PATH, capacity: int = QUOTE_BOARD_CAPACITY):
+        self.path = Path(path)
+        self.capacity = capacity
+        self._header = None
+        self._rows = None
+        self._fields = None  # Per-field 1-D views: scalar indexing is far cheaper than row slices
+        self._slots: dict[str, int] = {}
+        self._known = 0  # Slots already indexed into _slots
+
+    # ---------- Segment ----------
+
+    @contextmanager
+    def _write_lock(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix(".lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _create(self):
+        """Size and stamp the file if no process has yet (caller holds the write lock)."""
+        size = HEADER_BYTES + self.capacity * ROW_DTYPE.itemsize
+        with open(self.path, "a+b") as f:
+            if os.fstat(f.fileno()).st_size >= size:
+                return
+            f.truncate(size)
+        header = np.memmap(self.path, dtype=HEADER_DTYPE, mode="r+", shape=(1,))
+        header[0] = (MAGIC, self.capacity, 0, 0, 0)
+        header.flush()
+
+    def _attach(self) -> bool:
+        if self._rows is not None:
+            return True
+        if not self.path.exists():
+            return False
+        header = np.memmap(self.path, dtype=HEADER_DTYPE, mode="r+", shape=(1,))
+        if header[0]["magic"] != MAGIC:
+            return False
+        capacity = int(header[0]["capacity"])
+        self._header = header
+        self._rows = np.memmap(self.path, dtype=ROW_DTYPE, mode="r+", offset=HEADER_BYTES, shape=(capacity,))
+        self._fields = {name: self._rows[name] for name in ROW_DTYPE.names}
+        self.capacity = capacity
+        return True
+
+    def _sync_slots(self):
+        count = int(self._header[0]["count"])
+        if count > self._known:
+            names = self._rows["symbol"][self._known:count]
+            for offset, name in enumerate(names):
+                self._slots[name.decode()] = self._known + offset
+            self._known = count
+
+    def _slot(self, symbol: str):
+        slot = self._slots.get(symbol)
+        if slot is None:
+            self._sync_slots()  # Another process may have added it since
+            slot = self._slots.get(symbol)
+        return slot
+
+    # ---------- Writes ----------
+
+    def publish(self, quotes: dict[str, dict], updated_at: float | None = None) -> int:
+        """Write quote_service / feat_service field dicts (optional per-quote "updated_at" epoch); never raises."""
+        if not quotes:
+            return 0
+        updated_at = updated_at or time.time()
+        try:
+            with self._write_lock():
+                if not self._attach():
+                    self._create()
+                    self._attach()
+
+                written = 0
+                for symbol, q in quotes.items():
+                    if q.get("current_price") is None:
+                        continue
+                    encoded = symbol.encode()
+                    if len(encoded) > SYMBOL_BYTES:
+                        # A truncated name would never match in other processes and get a second slot
+                        print(f"⚠️ Symbol {symbol} is longer than {SYMBOL_BYTES} bytes, not published to the quote board.")
+                        continue
+                    slot = self._slot(symbol)
+                    if slot is None:
+                        count = int(self._header[0]["count"])
+                        if count >= self.capacity:
+                            print(f"⚠️ Quote board full ({self.capacity} slots), {symbol} not published.")
+                            continue
+                        slot = count
+                        self._rows["symbol"][slot] = encoded
+
+                    f = self._fields
+                    seq = int(f["seq"][slot]) & ~1  # A writer that died mid-row left it odd: start from even again
+                    f["seq"][slot] = seq + 1  # Odd: readers retry
+                    f["last"][slot] = q["current_price"]
+                    f["prev_close"][slot] = np.nan if q.get("previous_close_price") is None else q["previous_close_price"]
+                    f["change_pct"][slot] = np.nan if q.get("percent_change") is None else q["percent_change"]
+                    f["volume"][slot] = q.get("volume") or 0
+                    f["updated_at"][slot] = q.get("updated_at") or updated_at
+                    f["seq"][slot] = seq + 2
+
+                    if slot == int(self._header[0]["count"]):
+                        # Publish the new slot only once its row is complete
+                        self._header["count"][0] = slot + 1
+                        self._slots[symbol] = slot
+                        self._known = slot + 1
+                    written += 1
+
+                self._header["version"][0] += 1
+                return written
+        except Exception as e:
+            print(f"❌ Quote board publish failed: {e}")
+            return 0
+
+    # ---------- Reads (lock-free) ----------
+
+    def _read_row(self, slot: int, names=("last", "prev_close", "change_pct", "volume", "updated_at")):
+        f = self._fields
+        seq = f["seq"]
+        for _ in range(READ_RETRIES):
+            before = seq[slot]
+            if before & 1:
+                continue
+            values = [f[name][slot] for name in names]
+            if seq[slot] == before:
+                return values
+        return None
+
+    def get(self, symbol: str) -> dict | None:
+        if not self._attach():
+            return None
+        slot = self._slot(symbol)
+        if slot is None:
+            return None
+        row = self._read_row(slot)
+        if row is None:
+            return None
+        last, prev_close, change_pct, volume, updated_at = row
+        return {
+            "symbol": symbol,
+            "current_price": float(last),
+            "previous_close_price": _nan_to_none(float(prev_close)),
+            "percent_change": _nan_to_none(float(change_pct)),
+            "volume": int(volume),
+            "last_updated": datetime.utcfromtimestamp(float(updated_at)),
+        }
+
+    def quotes(self, symbols) -> dict[str, dict]:
+        result = {}
+        for symbol in symbols:
+            quote = self.get(symbol)
+            if quote is not None:
+                result[symbol] = quote
+        return result
+
+    def price(self, symbol: str) -> float | None:
+        if not self._attach():
+            return None
+        slot = self._slot(symbol)
+        if slot is None:
+            return None
+        row = self._read_row(slot, ("last",))
+        return None if row is None else float(row[0])
+
+    def __len__(self):
+        return int(self._header[0]["count"]) if self._attach() else 0
+
+
+quote_board = QuoteBoard()
+
+
+# ✅ First process up fills the board from stock_data so reads hit before the first refresh
+async def seed_quote_board(db: AsyncSession) -> int:
+    if len(quote_board):
+        return 0
+    result = await db.execute(
+        select(
+            StockData.symbol, StockData.current_price, StockData.previous_close_price,
+            StockData.percent_change, StockData.volume, StockData.last_updated
+        )
+    )
+    quotes = {
+        row["symbol"]: {
+            **row,
+            "updated_at": (row["last_updated"] - datetime(1970, 1, 1)).total_seconds() if row["last_updated"] else None,
+        }
+        for row in result.mappings().all()
+    }
+    written = quote_board.publish(quotes)
+    print(f"📋 Quote board seeded with {written} symbol(s).")
+    return written
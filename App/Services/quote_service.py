@@ -0,0 +1,173 @@
+# App/Services/quote_service.py
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import bindparam, insert
+from App.Models.stock import Stock, StockData, StockHistory
+from App.Services.active_symbols import get_active_symbols
+from App.Services.history_store import history_store, make_bars, day_ts
+from App.Services.rollup_service import refresh_rollups
+from App.Services.indicator_service import indicator_engine
+from App.Services.alert_service import evaluate_price_ticks
+from App.Services.trending_service import trending_tracker
+from App.Services.quote_board import quote_board
+from App.Services.price_events import publish_price_events
+from App.Services.portfolio_aggregates import apply_price_deltas
+from App.Services.refresh_planner import provider_calls, QUOTE_CALLS_PER_SYMBOL
+from datetime import datetime
+import asyncio
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+
+def symbol_frame(data: pd.DataFrame, symbol: str):
+    """Pick one ticker's columns out of a (possibly multi-ticker) yf.download frame."""
+    if isinstance(data.columns, pd.MultiIndex):
+        if symbol not in data.columns.get_level_values(0):
+            return None
+        return data[symbol]
+    return data
+
+
+def _to_float(value):
+    return None if pd.isna(value) else float(value)
+
+
+# ✅ Fetch latest quotes for many symbols with a single provider call
+def fetch_quotes(symbols: list[str]) -> dict[str, dict]:
+    """Blocking bulk quote fetch; run it with asyncio.to_thread from async code."""
+    if not symbols:
+        return {}
+
+    try:
+        provider_calls.record(len(symbols) * QUOTE_CALLS_PER_SYMBOL)
+        data = yf.download(
+            tickers=" ".join(symbols), period="5d", interval="1d",
+            group_by="ticker", auto_adjust=False, progress=False
+        )
+    except Exception as e:
+        print(f"❌ Bulk quote fetch failed: {e}")
+        return {}
+
+    quotes = {}
+    for symbol in symbols:
+        frame = symbol_frame(data, symbol)
+        if frame is None:
+            continue
+
+        frame = frame.dropna(subset=["Close"])
+        if frame.empty:
+            print(f"❌ No quote data for {symbol}, skipping.")
+            continue
+
+        latest = frame.iloc[-1]
+        current_price = float(latest["Close"])
+        prev_close = float(frame["Close"].iloc[-2]) if len(frame) >= 2 else None
+        percent_change = round(((current_price - prev_close) / prev_close) * 100, 2) if prev_close else None
+        volume = _to_float(latest.get("Volume"))
+
+        quotes[symbol] = {
+            "symbol": symbol,
+            "current_price": current_price,
+            "previous_close_price": prev_close,
+            "percent_change": percent_change,
+            "high_24h": _to_float(latest.get("High")),
+            "low_24h": _to_float(latest.get("Low")),
+            "volume": int(volume) if volume is not None else None,
+            "open": _to_float(latest.get("Open")),
+            "bar_date": pd.Timestamp(frame.index[-1]).date(),
+        }
+
+    return quotes
+
+
+# ✅ Every symbol someone holds or watches (read from the maintained hot set)
+async def get_tracked_symbols(db: AsyncSession) -> list[str]:
+    return await get_active_symbols(db)
+
+
+# ✅ Write fetched quotes to `stocks`, `stock_data` and `stock_history` with one statement per table
+async def save_quotes(db: AsyncSession, quotes: dict[str, dict]) -> int:
+    if not quotes:
+        return 0
+
+    now = datetime.utcnow()
+    stocks = Stock.__table__
+    stock_data = StockData.__table__
+
+    await db.execute(
+        stocks.update()
+        .where(stocks.c.symbol == bindparam("b_symbol"))
+        .values(price=bindparam("b_price"), change=bindparam("b_change")),
+        [
+            {"b_symbol": symbol, "b_price": q["current_price"], "b_change": q["percent_change"] or 0.0}
+            for symbol, q in quotes.items()
+        ]
+    )
+
+    await db.execute(
+        stock_data.update()
+        .where(stock_data.c.symbol == bindparam("b_symbol"))
+        .values(
+            current_price=bindparam("b_current_price"),
+            previous_close_price=bindparam("b_previous_close_price"),
+            percent_change=bindparam("b_percent_change"),
+            high_24h=bindparam("b_high_24h"),
+            low_24h=bindparam("b_low_24h"),
+            volume=bindparam("b_volume"),
+            last_updated=now
+        ),
+        [
+            {
+                "b_symbol": symbol,
+                "b_current_price": q["current_price"],
+                "b_previous_close_price": q["previous_close_price"],
+                "b_percent_change": q["percent_change"],
+                "b_high_24h": q["high_24h"],
+                "b_low_24h": q["low_24h"],
+                "b_volume": q["volume"],
+            }
+            for symbol, q in quotes.items()
+        ]
+    )
+
+    # 📌 One history row per refreshed StockData row, copied server-side in a single INSERT ... SELECT
+    await db.execute(
+        insert(StockHistory).from_select(
+            [
+                "symbol", "company_name", "current_price", "previous_close_price",
+                "percent_change", "high_24h", "low_24h", "volume", "recorded_at"
+            ],
+            select(
+                StockData.symbol, StockData.company_name, StockData.current_price,
+                StockData.previous_close_price, StockData.percent_change,
+                StockData.high_24h, StockData.low_24h, StockData.volume, StockData.last_updated
+            ).where(StockData.symbol.in_(list(quotes)))
+        )
+    )
+
+    await publish_price_events(db, quotes)  # 📡 Delivered to other workers on commit
+    await apply_price_deltas(db, {symbol: q["current_price"] for symbol, q in quotes.items()})  # 🧮 Holders' running totals
+    await db.commit()
+    append_quote_bars(quotes)
+    await refresh_rollups(db, {symbol: q["bar_date"] for symbol, q in quotes.items()})
+    await asyncio.to_thread(indicator_engine.refresh, list(quotes))  # 📈 Off the event loop: may recompute whole series
+    trending_tracker.observe_quotes(quotes)
+    quote_board.publish(quotes)  # 📋 Every API worker on the host sees it without a DB read
+    await evaluate_price_ticks(db, {symbol: q["current_price"] for symbol, q in quotes.items()})
+    print(f"✅ Saved quotes for {len(quotes)} symbol(s).")
+    return len(quotes)
+
+
+# 📊 Mirror each quote as today's daily bar in the columnar history store
+def append_quote_bars(quotes: dict[str, dict]):
+    for symbol, q in quotes.items():
+        try:
+            bar = make_bars(
+                [day_ts(q["bar_date"])], [q.get("open", np.nan)], [q["high_24h"]],
+                [q["low_24h"]], [q["current_price"]], [q["volume"] or 0]
+            )
+            history_store.append(symbol, bar)
+        except Exception as e:
+            print(f"❌ History store append failed for {symbol}: {e}")
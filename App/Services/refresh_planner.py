@@ -0,0 +1,208 @@
+# App/Services/refresh_planner.py
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from App.Services.active_symbols import get_active_symbol_counts
+from App.Services.market_hours import exchange_for_symbol, is_exchange_open, next_open
+from collections import Counter, deque
+from datetime import datetime, timedelta
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+
+
+PROVIDER_CALLS_PER_MINUTE = int(os.getenv("PROVIDER_CALLS_PER_MINUTE", 60))  # Hard provider rate limit
+BASE_REFRESH_SECONDS = int(os.getenv("MARKET_REFRESH_MINUTES", 5)) * 60     # Interval for a symbol with demand 1
+MIN_REFRESH_SECONDS = int(os.getenv("MIN_REFRESH_SECONDS", 60))             # Floor for the most popular symbols
+TRAFFIC_WINDOW_MINUTES = 30
+TRAFFIC_WEIGHT = 0.5  # One recent request counts as half a holder
+RETRY_BASE_SECONDS = int(os.getenv("QUOTE_RETRY_SECONDS", 30))             # First retry after a failed fetch, doubling after that
+
+
+# ✅ Provider calls actually made in the last 60s, by every fetch path in this process
+class ProviderCallLedger:
+    def __init__(self, window_seconds: int = 60):
+        self.window_seconds = window_seconds
+        self._calls = deque()  # (monotonic time, calls)
+        self._used = 0
+        self._lock = threading.Lock()
+
+    def _trim(self, now: float):
+        while self._calls and self._calls[0][0] <= now - self.window_seconds:
+            self._used -= self._calls.popleft()[1]
+
+    def record(self, calls: int = 1):
+        now = time.monotonic()
+        with self._lock:
+            self._calls.append((now, calls))
+            self._used += calls
+            self._trim(now)
+
+    def remaining(self, limit: int) -> int:
+        with self._lock:
+            self._trim(time.monotonic())
+            return max(limit - self._used, 0)
+
+
+provider_calls = ProviderCallLedger()
+QUOTE_CALLS_PER_SYMBOL = 1  # yf.download requests each ticker's chart separately
+
+
+# ✅ Sliding-window counter of symbol lookups served by the API
+class RequestTraffic:
+    def __init__(self, window_minutes: int = TRAFFIC_WINDOW_MINUTES):
+        self.window_minutes = window_minutes
+        self._buckets = deque()  # (minute, Counter) oldest first
+        self._lock = threading.Lock()
+
+    def _trim(self, minute: int):
+        while self._buckets and self._buckets[0][0] <= minute - self.window_minutes:
+            self._buckets.popleft()
+
+    def record(self, symbol: str, now: datetime | None = None):
+        minute = int((now or datetime.utcnow()).timestamp() // 60)
+        with self._lock:
+            if not self._buckets or self._buckets[-1][0] != minute:
+                self._buckets.append((minute, Counter()))
+            self._buckets[-1][1][symbol.upper()] += 1
+            self._trim(minute)
+
+    def counts(self, now: datetime | None = None) -> Counter:
+        minute = int((now or datetime.utcnow()).timestamp() // 60)
+        total = Counter()
+        with self._lock:
+            self._trim(minute)
+            for _, bucket in self._buckets:
+                total.update(bucket)
+        return total
+
+
+request_traffic = RequestTraffic()
+
+
+# ✅ Per-symbol demand: holders + watchers + weighted recent requests
+async def compute_symbol_demand(db: AsyncSession) -> dict[str, float]:
+    demand = Counter()
+
+    # O(active symbols) read of the maintained ref counts, no scan of per-user tables
+    for symbol, (holders, watchers) in (await get_active_symbol_counts(db)).items():
+        demand[symbol] += holders + watchers
+
+    for symbol, count in request_traffic.counts().items():
+        if symbol in demand:  # Only refresh symbols someone holds or watches
+            demand[symbol] += TRAFFIC_WEIGHT * count
+
+    return dict(demand)
+
+
+class RefreshPlanner:
+    """Min-heap of symbols keyed by next-due time; popular symbols come due more often."""
+
+    def __init__(
+        self,
+        calls_per_minute: int = PROVIDER_CALLS_PER_MINUTE,
+        base_interval: int = BASE_REFRESH_SECONDS,
+        min_interval: int = MIN_REFRESH_SECONDS,
+    ):
+        self.calls_per_minute = calls_per_minute
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.demand: dict[str, float] = {}
+        self.demand_updated_at: datetime | None = None
+        self._heap = []   # (due, seq, symbol)
+        self._due = {}    # symbol -> due; heap entries that disagree are stale
+        self._seq = itertools.count()
+        self._in_flight = set()  # Popped by take_due, not yet marked refreshed or failed
+        self._failures = Counter()
+
+    def __len__(self):
+        return len(self._due)
+
+    def interval_for(self, symbol: str) -> timedelta:
+        weight = max(self.demand.get(symbol, 0.0), 1.0)
+        seconds = max(self.min_interval, self.base_interval / math.sqrt(weight))
+        return timedelta(seconds=seconds)
+
+    def _schedule(self, symbol: str, due: datetime):
+        self._due[symbol] = due
+        heapq.heappush(self._heap, (due, next(self._seq), symbol))
+
+    def set_demand(self, demand: dict[str, float], now: datetime | None = None):
+        """Swap in fresh demand; new symbols are due immediately, dropped ones are forgotten."""
+        now = now or datetime.utcnow()
+        self.demand = demand
+        self.demand_updated_at = now
+
+        for symbol in list(self._due):
+            if symbol not in demand:
+                del self._due[symbol]
+
+        for symbol in demand:
+            if symbol in self._in_flight:
+                continue  # Being fetched now: mark_refreshed / mark_failed reschedules it
+            if symbol not in self._due:
+                self._schedule(symbol, now)
+            else:
+                # Demand went up: pull the next refresh forward if it is now too far out
+                earliest = now + self.interval_for(symbol)
+                if self._due[symbol] > earliest:
+                    self._schedule(symbol, earliest)
+
+        if len(self._heap) > 2 * len(self._due) + 64:
+            self._heap = [(due, seq, s) for due, seq, s in self._heap if self._due.get(s) == due]
+            heapq.heapify(self._heap)
+
+    def take_due(self, now: datetime | None = None, budget: int | None = None) -> list[str]:
+        """Pop due symbols whose exchange is open, up to `budget` provider calls (default: what the
+        last minute's calls left of the limit); closed ones wait for the next open."""
+        now = now or datetime.utcnow()
+        budget = provider_calls.remaining(self.calls_per_minute) if budget is None else budget
+        market_open = {}
+        due_symbols = []
+
+        while self._heap and (len(due_symbols) + 1) * QUOTE_CALLS_PER_SYMBOL <= budget:
+            due, _, symbol = self._heap[0]
+            if due > now:
+                break
+            heapq.heappop(self._heap)
+
+            if self._due.get(symbol) != due:
+                continue  # Stale entry (rescheduled or dropped)
+
+            exchange = exchange_for_symbol(symbol)
+            if exchange.code not in market_open:
+                market_open[exchange.code] = is_exchange_open(exchange, now)
+
+            if not market_open[exchange.code]:
+                self._schedule(symbol, next_open(exchange, now))
+                continue
+
+            del self._due[symbol]
+            self._in_flight.add(symbol)
+            due_symbols.append(symbol)
+
+        return due_symbols
+
+    def mark_refreshed(self, symbols: list[str], now: datetime | None = None):
+        now = now or datetime.utcnow()
+        for symbol in symbols:
+            self._in_flight.discard(symbol)
+            self._failures.pop(symbol, None)
+            if symbol in self.demand:
+                self._schedule(symbol, now + self.interval_for(symbol))
+
+    def mark_failed(self, symbols: list[str], now: datetime | None = None):
+        """Requeue symbols whose fetch raised or returned nothing, backing off exponentially up to their interval."""
+        now = now or datetime.utcnow()
+        for symbol in symbols:
+            self._in_flight.discard(symbol)
+            if symbol not in self.demand:
+                continue
+            self._failures[symbol] += 1
+            backoff = RETRY_BASE_SECONDS * 2 ** (self._failures[symbol] - 1)
+            self._schedule(symbol, now + min(timedelta(seconds=backoff), self.interval_for(symbol)))
+
+
+refresh_planner = RefreshPlanner()
@@ -0,0 +1,145 @@
+# App/Services/risk_service.py
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from App.Models.stock import UserStock
+from App.Services.active_symbols import get_active_symbols
+from App.Services.history_store import history_store
+from App.Services.quote_board import quote_board
+from statistics import NormalDist
+from datetime import datetime
+import asyncio
+import os
+import numpy as np
+
+
+RISK_BENCHMARK = os.getenv("RISK_BENCHMARK", "^NSEI")
+RISK_WINDOW_DAYS = int(os.getenv("RISK_WINDOW_DAYS", 252))  # Trading-day returns in the model
+RISK_MIN_OBSERVATIONS = int(os.getenv("RISK_MIN_OBSERVATIONS", 60))  # Fewer real returns and a symbol is left out
+TRADING_DAYS_PER_YEAR = 252
+
+_model = None
+_build_lock = asyncio.Lock()
+
+
+def _calendar(symbols: list[str], window: int) -> np.ndarray:
+    """The last window + 1 trading days: the benchmark's, or every symbol's if it has no bars."""
+    bars = history_store.read(RISK_BENCHMARK)
+    if len(bars) > window // 2:
+        return np.asarray(bars["ts"][-(window + 1):])
+    stamps = [np.asarray(history_store.read(symbol)["ts"][-(window + 1):]) for symbol in symbols]
+    stamps = np.unique(np.concatenate(stamps)) if stamps else np.empty(0, dtype="<i8")
+    return stamps[-(window + 1):]
+
+
+def aligned_returns(symbols: list[str], calendar: np.ndarray) -> np.ndarray:
+    """days x symbols simple returns on the calendar from as-of closes; NaN where a symbol has no bar yet."""
+    closes = np.full((len(calendar), len(symbols)), np.nan)
+    for column, symbol in enumerate(symbols):
+        bars = history_store.read(symbol)
+        if not len(bars):
+            continue
+        index = np.searchsorted(bars["ts"], calendar, side="right") - 1
+        found = index >= 0
+        closes[found, column] = bars["close"][index[found]]
+    return closes[1:] / closes[:-1] - 1
+
+
+def build_risk_model(symbols: list[str], window: int = RISK_WINDOW_DAYS) -> dict | None:
+    """Returns, covariance and betas for every held symbol over one shared window (blocking: run in a thread)."""
+    calendar = _calendar(symbols, window)
+    if len(calendar) < 2:
+        return None
+
+    returns = aligned_returns(symbols, calendar)
+    observed = np.isfinite(returns).sum(axis=0) >= min(RISK_MIN_OBSERVATIONS, len(returns))
+    symbols = [symbol for symbol, keep in zip(symbols, observed) if keep]
+    returns = np.nan_to_num(returns[:, observed])  # Days before a symbol's first bar count as flat
+
+    benchmark = np.nan_to_num(aligned_returns([RISK_BENCHMARK], calendar)[:, 0])
+    centered = returns - returns.mean(axis=0)
+    bench_centered = benchmark - benchmark.mean()
+    bench_var = bench_centered @ bench_centered / max(len(benchmark) - 1, 1)
+
+    return {
+        "day": datetime.utcnow().date(),
+        "symbols": symbols,
+        "column": {symbol: i for i, symbol in enumerate(symbols)},
+        "returns": returns,                                            # days x symbols
+        "mean": returns.mean(axis=0),
+        "cov": centered.T @ centered / max(len(returns) - 1, 1),       # symbols x symbols
+        "beta": (centered.T @ bench_centered / max(len(benchmark) - 1, 1)) / bench_var if bench_var > 0 else np.full(len(symbols), np.nan),
+        "last_close": np.array([float(history_store.read(symbol)["close"][-1]) for symbol in symbols]),
+        "start": datetime.utcfromtimestamp(int(calendar[0])).date(),
+        "end": datetime.utcfromtimestamp(int(calendar[-1])).date(),
+    }
+
+
+# ✅ Built once per day per process; the history backfill job forces a rebuild once new bars land
+async def get_risk_model(db: AsyncSession, force: bool = False) -> dict | None:
+    global _model
+    today = datetime.utcnow().date()
+    if not force and _model is not None and _model["day"] == today:
+        return _model
+
+    async with _build_lock:
+        if not force and _model is not None and _model["day"] == today:
+            return _model  # Another request built it while this one waited
+        symbols = sorted(await get_active_symbols(db, held=True, watched=False))
+        model = await asyncio.to_thread(build_risk_model, symbols)
+        if model is not None:
+            _model = model
+            print(f"📐 Risk model built for {len(model['symbols'])} symbol(s), {model['start']} to {model['end']}.")
+        return _model
+
+
+# ✅ Per user: weight-vector products against the cached matrices
+async def portfolio_risk(db: AsyncSession, user_id: int, confidence: float = 0.95) -> dict | None:
+    model = await get_risk_model(db)
+    if model is None:
+        return None
+
+    result = await db.execute(select(UserStock.symbol, UserStock.quantity).where(UserStock.user_id == user_id))
+    quantities = {}
+    for symbol, quantity in result.all():
+        quantities[symbol] = quantities.get(symbol, 0) + quantity
+
+    column = model["column"]
+    held = [symbol for symbol in quantities if symbol in column]
+    if not held:
+        return None
+
+    idx = np.array([column[symbol] for symbol in held])
+    prices = np.array([quote_board.price(symbol) or np.nan for symbol in held])
+    prices = np.where(np.isnan(prices), model["last_close"][idx], prices)
+    values = prices * np.array([quantities[symbol] for symbol in held], dtype="f8")
+    total = values.sum()
+    if total <= 0:
+        return None
+    weights = values / total
+
+    variance = weights @ model["cov"][np.ix_(idx, idx)] @ weights
+    volatility = float(np.sqrt(max(variance, 0.0)))
+    mean = float(weights @ model["mean"][idx])
+    history = model["returns"][:, idx] @ weights                       # The portfolio's daily returns
+
+    historical_var = float(-np.quantile(history, 1 - confidence))
+    parametric_var = NormalDist().inv_cdf(confidence) * volatility - mean
+    uncovered = len(quantities) - len(held)
+
+    return {
+        "as_of": model["end"],
+        "window_start": model["start"],
+        "observations": len(history),
+        "benchmark": RISK_BENCHMARK,
+        "confidence": confidence,
+        "portfolio_value": round(float(total), 2),
+        "volatility_daily": round(volatility, 6),
+        "volatility_annual": round(volatility * TRADING_DAYS_PER_YEAR ** 0.5, 6),
+        "beta": None if np.isnan(model["beta"][idx]).any() else round(float(weights @ model["beta"][idx]), 4),
+        "var_historical_pct": round(historical_var * 100, 4),
+        "var_historical": round(historical_var * float(total), 2),
+        "var_parametric_pct": round(parametric_var * 100, 4),
+        "var_parametric": round(parametric_var * float(total), 2),
+        "symbols_without_history": uncovered,
+    }
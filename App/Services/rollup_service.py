@@ -0,0 +1,148 @@
+# App/Services/rollup_service.py
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.dialects.postgresql import insert
+from App.Models.stock import PriceRollup
+from App.Services.history_store import history_store
+from datetime import datetime, date, timedelta
+from typing import Optional
+import pandas as pd
+
+
+RESOLUTIONS = ("day", "week", "month")  # Finest to coarsest
+BUCKET_DAYS = {"day": 1, "week": 7, "month": 30}
+DEFAULT_MAX_POINTS = 500
+
+
+def bucket_start(day: date, resolution: str) -> date:
+    if resolution == "week":
+        return day - timedelta(days=day.weekday())
+    if resolution == "month":
+        return day.replace(day=1)
+    return day
+
+
+# ✅ Finest resolution whose bucket count still fits the point budget
+def choose_resolution(start: date, end: date, max_points: int = DEFAULT_MAX_POINTS) -> str:
+    span_days = max((end - start).days, 1)
+    for resolution in RESOLUTIONS:
+        if span_days / BUCKET_DAYS[resolution] <= max_points:
+            return resolution
+    return RESOLUTIONS[-1]
+
+
+def _rollup_rows(symbol: str, since: date) -> list[dict]:
+    """Day rows from `since`, plus every week/month bucket containing `since` or later, from the store."""
+    start = min(bucket_start(since, "week"), bucket_start(since, "month"))
+    bars = history_store.read(symbol, datetime.combine(start, datetime.min.time()))
+    if not len(bars):
+        return []
+
+    frame = pd.DataFrame({
+        "open": bars["open"], "high": bars["high"], "low": bars["low"],
+        "close": bars["close"], "volume": bars["volume"],
+    }, index=pd.to_datetime(bars["ts"], unit="s"))
+    frame["day"] = frame.index.date
+    frame["week"] = (frame.index - pd.to_timedelta(frame.index.weekday, unit="D")).date
+    frame["month"] = frame.index.to_period("M").start_time.date
+
+    rows = []
+    for resolution in RESOLUTIONS:
+        # Buckets starting before the touched one are unchanged (and only partly read), skip them
+        part = frame[frame[resolution] >= bucket_start(since, resolution)]
+        grouped = part.groupby(resolution, sort=True).agg(
+            open=("open", "first"),  # First non-null open (snapshot bars have none)
+            high=("high", "max"),
+            low=("low", "min"),
+            close=("close", "last"),
+            volume=("volume", "sum"),
+            bar_count=("close", "size"),
+        )
+        for bucket, row in grouped.iterrows():
+            rows.append({
+                "symbol": symbol,
+                "resolution": resolution,
+                "bucket_start": bucket,
+                "open": None if pd.isna(row["open"]) else float(row["open"]),
+                "high": None if pd.isna(row["high"]) else float(row["high"]),
+                "low": None if pd.isna(row["low"]) else float(row["low"]),
+                "close": float(row["close"]),
+                "volume": int(row["volume"]),
+                "bar_count": int(row["bar_count"]),
+                "updated_at": datetime.utcnow(),
+            })
+
+    return rows
+
+
+# ✅ Recompute only the buckets touched by newly ingested bars (symbol -> earliest changed day)
+async def refresh_rollups(db: AsyncSession, touched: dict[str, date]) -> int:
+    rows = []
+    for symbol, since in touched.items():
+        try:
+            rows.extend(_rollup_rows(symbol.upper(), since))
+        except Exception as e:
+            print(f"❌ Rollup computation failed for {symbol}: {e}")
+
+    if not rows:
+        return 0
+
+    stmt = insert(PriceRollup)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["symbol", "resolution", "bucket_start"],
+            set_={
+                "open": stmt.excluded.open,
+                "high": stmt.excluded.high,
+                "low": stmt.excluded.low,
+                "close": stmt.excluded.close,
+                "volume": stmt.excluded.volume,
+                "bar_count": stmt.excluded.bar_count,
+                "updated_at": stmt.excluded.updated_at,
+            }
+        ),
+        rows
+    )
+    await db.commit()
+    return len(rows)
+
+
+async def get_rollups(
+    db: AsyncSession,
+    symbol: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    resolution: Optional[str] = None,
+    max_points: int = DEFAULT_MAX_POINTS,
+) -> dict:
+    """Columnar rollup series; resolution defaults to choose_resolution over the range."""
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=365)
+    resolution = resolution or choose_resolution(start, end, max_points)
+
+    result = await db.execute(
+        select(
+            PriceRollup.bucket_start, PriceRollup.open, PriceRollup.high,
+            PriceRollup.low, PriceRollup.close, PriceRollup.volume
+        )
+        .where(
+            PriceRollup.symbol == symbol.upper(),
+            PriceRollup.resolution == resolution,
+            PriceRollup.bucket_start >= bucket_start(start, resolution),
+            PriceRollup.bucket_start <= end
+        )
+        .order_by(PriceRollup.bucket_start)
+    )
+    rows = result.all()
+
+    return {
+        "symbol": symbol.upper(),
+        "resolution": resolution,
+        "bucket_start": [row.bucket_start.isoformat() for row in rows],
+        "open": [row.open for row in rows],
+        "high": [row.high for row in rows],
+        "low": [row.low for row in rows],
+        "close": [row.close for row in rows],
+        "volume": [row.volume for row in rows],
+    }
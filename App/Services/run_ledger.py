@@ -0,0 +1,199 @@
+# App/Services/run_ledger.py
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import update, func
+from sqlalchemy.dialects.postgresql import insert
+from App.Models.user import User
+from App.Models.stock import RefreshRun, RefreshRunChunk
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+import os
+import zlib
+
+
+REFRESH_CHUNK_SIZE = int(os.getenv("REFRESH_CHUNK_SIZE", 50))
+RUN_STALE_MINUTES = int(os.getenv("RUN_STALE_MINUTES", 30))  # A running run without a checkpoint for this long is presumed dead
+RUN_MAX_RESUMES = int(os.getenv("RUN_MAX_RESUMES", 5))  # A run picked up this many times is left failed until the next day
+
+
+def _stale_cutoff() -> datetime:
+    return datetime.utcnow() - timedelta(minutes=RUN_STALE_MINUTES)
+
+
+def _run_date_start() -> datetime:
+    """Runs belong to the UTC day they started on; an older unfinished run is never resumed."""
+    return datetime.combine(datetime.utcnow().date(), datetime.min.time())
+
+
+# ✅ Resume today's unfinished run of this job, or start a new one; None while another process runs it or it gave up
+async def start_or_resume_run(db: AsyncSession, job_name: str, chunk_size: int = REFRESH_CHUNK_SIZE) -> Optional[RefreshRun]:
+    # Serialise starters of the same job across processes for the rest of this transaction
+    await db.execute(select(func.pg_advisory_xact_lock(zlib.crc32(f"refresh_run:{job_name}".encode()))))
+
+    result = await db.execute(
+        select(RefreshRun)
+        .where(RefreshRun.job_name == job_name, RefreshRun.status.in_(["running", "failed"]))
+        .order_by(RefreshRun.started_at.desc())
+    )
+    unfinished = result.scalars().all()
+
+    # Only today's newest run is resumable: yesterday's cursor would skip users for today
+    today = _run_date_start()
+    run = unfinished[0] if unfinished and unfinished[0].started_at >= today else None
+    for candidate in unfinished:
+        if candidate is not run:
+            candidate.status = "abandoned"  # Superseded by a newer run, or from an earlier day
+
+    if run is not None and run.status == "running" and (run.updated_at or run.started_at) > _stale_cutoff():
+        await db.commit()
+        print(f"⏭️ {job_name} run {run.id} is checkpointing in another process, not starting a second one.")
+        return None
+
+    if run is not None and run.resume_count >= RUN_MAX_RESUMES:
+        run.status = "failed"
+        await db.commit()
+        print(f"🛑 {job_name} run {run.id} was resumed {run.resume_count} time(s), giving up until tomorrow.")
+        return None
+
+    if run:
+        run.status = "running"
+        run.resume_count += 1
+        run.updated_at = datetime.utcnow()  # Heartbeat: claims the run for this process
+        print(f"♻️ Resuming {job_name} run {run.id} after user {run.cursor} ({run.chunks_completed} chunk(s) done, resume {run.resume_count}/{RUN_MAX_RESUMES}).")
+    else:
+        run = RefreshRun(job_name=job_name, chunk_size=chunk_size, status="running")
+        db.add(run)
+
+    await db.commit()
+    await db.refresh(run)
+    return run
+
+
+# ✅ Trigger for the resume job: today's unfinished run that failed or stopped checkpointing, with resumes left
+async def has_resumable_run(db: AsyncSession, job_name: str) -> bool:
+    result = await db.execute(
+        select(RefreshRun.id)
+        .where(
+            RefreshRun.job_name == job_name,
+            RefreshRun.started_at >= _run_date_start(),
+            RefreshRun.resume_count < RUN_MAX_RESUMES,
+        )
+        .where(
+            (RefreshRun.status == "failed")
+            | ((RefreshRun.status == "running") & (func.coalesce(RefreshRun.updated_at, RefreshRun.started_at) <= _stale_cutoff()))
+        )
+        .limit(1)
+    )
+    return result.scalar() is not None
+
+
+# ✅ Ledger row for (run, chunk), written in the chunk's transaction; a replayed chunk writes it again
+async def _claim_chunk(db: AsyncSession, run_id: int, chunk_index: int, user_ids: list[int]) -> int:
+    result = await db.execute(
+        insert(RefreshRunChunk)
+        .values(
+            run_id=run_id,
+            chunk_index=chunk_index,
+            first_user_id=user_ids[0],
+            last_user_id=user_ids[-1],
+            status="running",
+            started_at=datetime.utcnow()
+        )
+        .on_conflict_do_update(
+            index_elements=["run_id", "chunk_index"],
+            set_={"last_user_id": user_ids[-1], "started_at": datetime.utcnow()}
+        )
+        .returning(RefreshRunChunk.id)
+    )
+    return result.scalar_one()
+
+
+async def _checkpoint(db: AsyncSession, run_id: int, chunk_id: int, cursor: int, processed: int, failed: int):
+    await db.execute(
+        update(RefreshRunChunk)
+        .where(RefreshRunChunk.id == chunk_id)
+        .values(status="completed", processed=processed, failed=failed, finished_at=datetime.utcnow())
+    )
+    await db.execute(
+        update(RefreshRun)
+        .where(RefreshRun.id == run_id)
+        .values(
+            cursor=cursor,
+            chunks_completed=RefreshRun.chunks_completed + 1,
+            users_processed=RefreshRun.users_processed + processed,
+            users_failed=RefreshRun.users_failed + failed,
+            updated_at=datetime.utcnow()
+        )
+    )
+    await db.commit()
+
+
+async def run_checkpointed(
+    db: AsyncSession,
+    job_name: str,
+    process_user: Callable[[int, AsyncSession], Awaitable[None]],
+    chunk_size: int = REFRESH_CHUNK_SIZE,
+) -> Optional[int]:
+    """Run `process_user` over all users in id order, committing a checkpoint after every chunk.
+
+    Each chunk is one transaction: the work `process_user` leaves in the session (it must not
+    commit) commits together with the chunk's ledger row and the run cursor, so a crash replays
+    at most one chunk. Each user runs in a savepoint; a user whose process_user raises is rolled
+    back alone and counted as failed. Returns the run id, or None if another process owns the run
+    or it has used up its resumes for the day.
+    """
+    run = await start_or_resume_run(db, job_name, chunk_size)
+    if run is None:
+        return None
+    # Plain locals: a failed checkpoint rolls the session back, which expires ORM instances
+    run_id, cursor, chunk_index, chunk_size = run.id, run.cursor, run.chunks_completed, run.chunk_size
+
+    try:
+        while True:
+            result = await db.execute(
+                select(User.id)
+                .where(User.id > cursor)
+                .order_by(User.id)
+                .limit(chunk_size)
+            )
+            user_ids = result.scalars().all()
+            if not user_ids:
+                break
+
+            chunk_id = await _claim_chunk(db, run_id, chunk_index, user_ids)
+
+            processed = failed = 0
+            for user_id in user_ids:
+                try:
+                    print(f"📈 Updating user {user_id}...")
+                    async with db.begin_nested():
+                        await process_user(user_id, db)
+                    processed += 1
+                except Exception as e:
+                    failed += 1
+                    print(f"❌ Error updating user {user_id}: {e}")
+
+            # ✅ Checkpoint: chunk work, chunk status and run cursor commit together
+            last_user_id = user_ids[-1]
+            await _checkpoint(db, run_id, chunk_id, last_user_id, processed, failed)
+            print(f"✅ {job_name} run {run_id}: chunk {chunk_index} committed (through user {last_user_id}).")
+
+            cursor = last_user_id
+            chunk_index += 1
+
+    except Exception as e:
+        await db.rollback()
+        await db.execute(update(RefreshRun).where(RefreshRun.id == run_id).values(status="failed"))
+        await db.commit()
+        print(f"❌ {job_name} run {run_id} failed after user {cursor}: {e}")
+        raise
+
+    await db.execute(
+        update(RefreshRun)
+        .where(RefreshRun.id == run_id)
+        .values(status="completed", finished_at=datetime.utcnow())
+    )
+    await db.commit()
+    print(f"🏁 {job_name} run {run_id} completed through user {cursor}.")
+    return run_id
@@ -18,6 +18,16 @@ from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime, timedelta
 from typing import List, Optional
 from fastapi import HTTPException
+from App.Services.active_symbols import adjust_active_symbol
+from App.Services.history_store import record_frame
+from App.Services.backfill_service import schedule_backfill
+from App.Services.downsampling import lttb
+from App.Services.portfolio_analytics import holdings_frame, analyze_holdings, portfolio_summary
+from App.Services.alert_service import evaluate_price_ticks
+from App.Services.trending_service import trending_tracker
+from App.Services.quote_board import quote_board
+from App.Services.price_events import publish_price_events
+from App.Services.portfolio_aggregates import apply_price_deltas, holding_added, holding_changed, holding_removed
 import pytz
 
 
@@ -28,6 +38,12 @@ india_tz = pytz.timezone("Asia/Kolkata")
 CSV_FILE_PATH = "App/Data/company_data.csv"  # Update with your actual path
 
 
+def _last_volume(info: pd.DataFrame) -> int:
+    """Latest bar's volume; yfinance leaves it NaN on some bars."""
+    volume = info["Volume"].iloc[-1]
+    return int(volume) if pd.notna(volume) else 0
+
+
 # ✅ Create a new stock
 async def create_stock(db: AsyncSession, stock_data: StockCreate):
     new_stock = Stock(**stock_data.model_dump())  # Convert Pydantic model to dictionary
@@ -57,7 +73,9 @@ async def update_stock(db: AsyncSession, symbol: str, stock_data: StockUpdate):
     
     for key, value in stock_data.model_dump(exclude_unset=True).items():
         setattr(stock, key, value)  # Update only provided fields
-    
+
+    await publish_price_events(db, {stock.symbol: {"current_price": stock.price, "percent_change": stock.change}})
+    await apply_price_deltas(db, {stock.symbol: stock.price})
     await db.commit()
     await db.refresh(stock)
     return stock
@@ -133,6 +151,8 @@ async def update_selected_stocks(db: AsyncSession, symbols: list):
                 if stock:
                     old_price = stock.price
                     stock.price = latest_price
+                    await publish_price_events(db, {symbol: {"current_price": latest_price}})
+                    await apply_price_deltas(db, {symbol: latest_price})
                     await db.commit()
                     await db.refresh(stock)
                     print(f"✅ Updated {symbol}: ${latest_price}")
@@ -151,15 +171,27 @@ async def get_available_stocks(db: AsyncSession):
     return [{"symbol": s[0], "name": s[1]} for s in stocks]
 
 
+async def _holds_symbol(db: AsyncSession, user_id: int, symbol: str) -> bool:
+    """Whether the user already has a lot of this symbol (holder_count counts users, not lots)."""
+    result = await db.execute(
+        select(UserStock.id).where(UserStock.user_id == user_id, UserStock.symbol == symbol).limit(1)
+    )
+    return result.scalar() is not None
+
+
 # ✅ Add a stock for a specific user
 async def add_user_stock(db: AsyncSession, stock_data: UserStockCreate, user_id: int):
     try:
         new_stock = UserStock(**stock_data.model_dump(), user_id=user_id)
+        if not await _holds_symbol(db, user_id, new_stock.symbol):
+            await adjust_active_symbol(db, new_stock.symbol, holders=1)
         db.add(new_stock)
+        await holding_added(db, new_stock)  # 🧮 Same transaction as the holding itself
         await db.commit()
         await db.refresh(new_stock)  # ✅ Ensure stock is fully stored before updating
 
         print(f"✅ New stock {new_stock.symbol} added, now updating stock data...")
+        schedule_backfill(new_stock.symbol)  # 📚 First-time history load runs in the background
 
         # 2️⃣ Trigger stock data update
         await update_all_user_stocks(db, user_id)
@@ -181,15 +213,19 @@ async def get_user_stocks(db: AsyncSession, user_id: int):
 
 # ✅ Update stock for a specific user
 async def update_user_stock(db: AsyncSession, stock_id: int, stock_data: UserStockUpdate, user_id: int):
-    result = await db.execute(select(UserStock).where(UserStock.id == stock_id, UserStock.user_id == user_id))
+    result = await db.execute(
+        select(UserStock).where(UserStock.id == stock_id, UserStock.user_id == user_id).with_for_update()  # Hold off ticks re-marking it
+    )
     stock = result.scalars().first()
 
     if not stock:
         return {"error": "Stock not found or unauthorized"}
 
+    old_purchase_price, old_quantity = stock.purchase_price, stock.quantity
     for key, value in stock_data.model_dump(exclude_unset=True).items():
         setattr(stock, key, value)
 
+    await holding_changed(db, stock, old_purchase_price, old_quantity)
     await db.commit()
     await db.refresh(stock)
     return stock
@@ -197,13 +233,19 @@ async def update_user_stock(db: AsyncSession, stock_id: int, stock_data: UserSto
 
 # ✅ Delete stock for a specific user
 async def delete_user_stock(db: AsyncSession, stock_id: int, user_id: int):
-    result = await db.execute(select(UserStock).where(UserStock.id == stock_id, UserStock.user_id == user_id))
+    result = await db.execute(
+        select(UserStock).where(UserStock.id == stock_id, UserStock.user_id == user_id).with_for_update()
+    )
     stock = result.scalars().first()
 
     if not stock:
         return {"error": "Stock not found or unauthorized"}
 
     await db.delete(stock)
+    await db.flush()
+    if not await _holds_symbol(db, user_id, stock.symbol):
+        await adjust_active_symbol(db, stock.symbol, holders=-1)  # Their last lot of it
+    await holding_removed(db, stock)
     await db.commit()
     return {"message": "Stock deleted successfully"}
 
@@ -232,45 +274,10 @@ async def fetch_live_price(symbol: str):
 
 # ✅ Fetch Latest Stock Data for Portfolio Analysis
 async def analyze_portfolio(latest_snapshots: list[StockAnalysisSnapshot]):
-    portfolio_summary = {
-        "total_investment": 0,
-        "current_value": 0,
-        "total_profit_loss": 0,
-        "stock_analysis": []
-    }
-
-    for stock in latest_snapshots:
-        live_price = stock.live_price  # ✅ Use stored live price  
-        total_investment = stock.purchase_price * stock.quantity
-        current_value = live_price * stock.quantity
-        profit_loss = current_value - total_investment
-        percentage_change = ((live_price - stock.purchase_price) / stock.purchase_price) * 100
-
-        # Update portfolio summary
-        portfolio_summary["total_investment"] += total_investment
-        portfolio_summary["current_value"] += current_value
-        portfolio_summary["total_profit_loss"] += profit_loss
-
-        # Store individual stock analysis
-        portfolio_summary["stock_analysis"].append({
-            "symbol": stock.symbol,
-            "name": stock.name,
-            "purchase_price": stock.purchase_price,
-            "live_price": live_price,
-            "quantity": stock.quantity,
-            "profit_loss": profit_loss,
-            "percentage_change": round(percentage_change, 2),
-            "total_investment": total_investment,
-            "current_value": current_value
-        })
-
-    # Calculate overall change percentage
-    portfolio_summary["overall_change_percentage"] = (
-        (portfolio_summary["total_profit_loss"] / portfolio_summary["total_investment"]) * 100
-        if portfolio_summary["total_investment"] > 0 else 0
-    )
-
-    return portfolio_summary
+    frame = holdings_frame(latest_snapshots)
+    frame["user_id"] = 0  # One portfolio: the caller already filtered to a single user
+    holdings, totals = analyze_holdings(frame)
+    return portfolio_summary(holdings, totals, 0)
 
 
 
@@ -431,20 +438,29 @@ async def update_all_user_stocks(db: AsyncSession, user_id: int):
         print(f"✅ Found {len(user_stocks)} stocks for user {user_id}.")
 
         # 2️⃣ Fetch live data for each stock
+        prices = {}
         for stock in user_stocks:
             try:
                 ticker = stock.symbol
                 yf_stock = yf.Ticker(ticker)
                 info = yf_stock.history(period="2d")  # ✅ Get last 2 days' data
+                record_frame(ticker, info)
 
                 if len(info) < 2:
                     print(f"❌ Not enough data for {ticker}, skipping.")
                     continue
 
                 latest_price = info["Close"].iloc[-1]
+                prices[ticker] = float(latest_price)
                 prev_close = info["Close"].iloc[-2]
                 change = latest_price - prev_close
                 change_percent = round((change / prev_close) * 100, 2)
+                quote = {
+                    "current_price": float(latest_price), "previous_close_price": float(prev_close),
+                    "percent_change": float(change_percent), "volume": _last_volume(info)
+                }
+                trending_tracker.observe_quotes({ticker: quote})
+                quote_board.publish({ticker: quote})
 
                 purchase_price = stock.purchase_price
                 quantity = stock.quantity
@@ -466,7 +482,10 @@ async def update_all_user_stocks(db: AsyncSession, user_id: int):
                     # ✅ Update existing snapshot
                     await db.execute(
                         update(StockAnalysisSnapshot)
-                        .where(StockAnalysisSnapshot.id == existing_snapshot.id)
+                        .where(
+                            StockAnalysisSnapshot.id == existing_snapshot.id,
+                            StockAnalysisSnapshot.timestamp == existing_snapshot.timestamp  # Prunes to one partition
+                        )
                         .values(
                             live_price=latest_price,
                             profit_loss=profit_loss,
@@ -496,9 +515,13 @@ async def update_all_user_stocks(db: AsyncSession, user_id: int):
                 print(f"❌ Error fetching data for {stock.symbol}: {e}")
 
         # ✅ Commit all changes once
+        await publish_price_events(db, {ticker: {"current_price": price} for ticker, price in prices.items()})
+        await apply_price_deltas(db, prices)
         await db.commit()
         print("✅ Stock analysis snapshot updated successfully.")
 
+        await evaluate_price_ticks(db, prices)
+
     except Exception as e:
         await db.rollback()
         print(f"❌ Error updating stock snapshots: {e}")
@@ -508,9 +531,10 @@ async def fetch_stock_history(
     symbol: str,
     start_date: Optional[datetime],
     end_date: Optional[datetime],
-    db: AsyncSession
-) -> List[StockAnalysisSnapshot]:
-    """Fetch stock history for a given symbol within a date range"""
+    db: AsyncSession,
+    max_points: Optional[int] = None
+) -> List[dict]:
+    """Fetch stock history for a given symbol within a date range, optionally LTTB-downsampled"""
 
     # ✅ Default: Last 7 days if no start_date provided
     if not start_date:
@@ -520,9 +544,14 @@ async def fetch_stock_history(
     if not end_date:
         end_date = datetime.utcnow()
 
-    # 🛠️ Query database for filtered stock history
+    # 🛠️ Query only the charted columns, not full snapshot objects
     query = (
-        select(StockAnalysisSnapshot)
+        select(
+            StockAnalysisSnapshot.timestamp,
+            StockAnalysisSnapshot.live_price,
+            StockAnalysisSnapshot.current_value,
+            StockAnalysisSnapshot.percentage_change
+        )
         .where(StockAnalysisSnapshot.symbol == symbol)
         .where(StockAnalysisSnapshot.timestamp >= start_date)
         .where(StockAnalysisSnapshot.timestamp <= end_date)
@@ -530,12 +559,13 @@ async def fetch_stock_history(
     )
 
     result = await db.execute(query)
-    stock_records = result.scalars().all()
+    stock_records = [dict(row) for row in result.mappings().all()]
 
     if not stock_records:
         raise HTTPException(status_code=404, detail="No history found for this stock in the given date range")
 
-    return stock_records
+    # 📉 Constant-size payload however long the range is
+    return lttb(stock_records, "timestamp", "live_price", max_points)
 
 
 
@@ -544,103 +574,127 @@ async def fetch_stock_history(
 
 
 
-async def update_user_stocks(user_id: int, db: AsyncSession):
+async def stage_user_stocks(user_id: int, db: AsyncSession, prices: dict | None = None):
     """
-    ✅ Updates stock analysis snapshots for the user (now UTC based).
+    ✅ Stages the user's stock analysis snapshots (UTC) in the session without committing.
+    Provider failures skip a stock; database errors propagate to the caller's transaction.
     """
-    try:
-        # 🕒 Use UTC for all datetime logic
-        today_utc = datetime.utcnow().date()
-
-        result = await db.execute(
-            select(StockAnalysisSnapshot.timestamp)
-            .where(StockAnalysisSnapshot.user_id == user_id)
-            .order_by(StockAnalysisSnapshot.timestamp.desc())
-            .limit(1)
-        )
-        last_updated = result.scalar()
+    today_utc = datetime.utcnow().date()
 
-        if last_updated and last_updated.date() == today_utc:
-            print("🔹 Data is already updated today (UTC). Skipping fetch.")
-            return
-
-        stocks = await db.execute(select(UserStock).where(UserStock.user_id == user_id))
-        user_stocks = stocks.scalars().all()
-
-        print(f"👥 Found {len(user_stocks)} stock(s) for user {user_id}.")
-
-        for stock in user_stocks:
-            try:
-                ticker = stock.symbol
-                print(f"📈 Fetching data for stock: {ticker}")
-                yf_stock = yf.Ticker(ticker)
-                info = yf_stock.history(period="2d")
-
-                print(f"Fetched data for {ticker}: {info}")
-
-                if len(info) < 2:
-                    print(f"❌ Not enough data for {ticker}, skipping.")
-                    continue
-
-                latest_price = info["Close"].iloc[-1]
-                prev_close = info["Close"].iloc[-2]
-                change = latest_price - prev_close
-                change_percent = round((change / prev_close) * 100, 2)
-
-                purchase_price = stock.purchase_price
-                quantity = stock.quantity
-                total_investment = purchase_price * quantity
-                current_value = latest_price * quantity
-                profit_loss = round(current_value - total_investment, 2)
+    result = await db.execute(
+        select(StockAnalysisSnapshot.timestamp)
+        .where(StockAnalysisSnapshot.user_id == user_id)
+        .order_by(StockAnalysisSnapshot.timestamp.desc())
+        .limit(1)
+    )
+    last_updated = result.scalar()
 
-                # ✅ Use UTC timestamp
-                utc_now = datetime.utcnow()
+    if last_updated and last_updated.date() == today_utc:
+        print("🔹 Data is already updated today (UTC). Skipping fetch.")
+        return
 
-                existing_snapshot = await db.execute(
-                    select(StockAnalysisSnapshot).where(
-                        StockAnalysisSnapshot.user_id == user_id,
-                        StockAnalysisSnapshot.symbol == ticker,
-                        StockAnalysisSnapshot.timestamp >= datetime.combine(today_utc, datetime.min.time())
-                    )
+    stocks = await db.execute(select(UserStock).where(UserStock.user_id == user_id))
+    user_stocks = stocks.scalars().all()
+
+    print(f"👥 Found {len(user_stocks)} stock(s) for user {user_id}.")
+
+    for stock in user_stocks:
+        ticker = stock.symbol
+        try:
+            print(f"📈 Fetching data for stock: {ticker}")
+            yf_stock = yf.Ticker(ticker)
+            info = yf_stock.history(period="2d")
+            record_frame(ticker, info)
+        except Exception as e:
+            print(f"❌ Error fetching data for {ticker}: {e}")
+            continue
+
+        print(f"Fetched data for {ticker}: {info}")
+
+        if len(info) < 2:
+            print(f"❌ Not enough data for {ticker}, skipping.")
+            continue
+
+        latest_price = info["Close"].iloc[-1]
+        if prices is not None:
+            prices[ticker] = float(latest_price)
+        prev_close = info["Close"].iloc[-2]
+        change = latest_price - prev_close
+        change_percent = round((change / prev_close) * 100, 2)
+        quote = {
+            "current_price": float(latest_price), "previous_close_price": float(prev_close),
+            "percent_change": float(change_percent), "volume": _last_volume(info)
+        }
+        trending_tracker.observe_quotes({ticker: quote})
+        quote_board.publish({ticker: quote})
+
+        purchase_price = stock.purchase_price
+        quantity = stock.quantity
+        total_investment = purchase_price * quantity
+        current_value = latest_price * quantity
+        profit_loss = round(current_value - total_investment, 2)
+
+        # ✅ Use UTC timestamp
+        utc_now = datetime.utcnow()
+
+        existing_snapshot = await db.execute(
+            select(StockAnalysisSnapshot).where(
+                StockAnalysisSnapshot.user_id == user_id,
+                StockAnalysisSnapshot.symbol == ticker,
+                StockAnalysisSnapshot.timestamp >= datetime.combine(today_utc, datetime.min.time())
+            )
+        )
+        existing_snapshot = existing_snapshot.scalars().first()
+
+        if existing_snapshot:
+            await db.execute(
+                update(StockAnalysisSnapshot)
+                .where(
+                    StockAnalysisSnapshot.id == existing_snapshot.id,
+                    StockAnalysisSnapshot.timestamp == existing_snapshot.timestamp  # Prunes to one partition
                 )
-                existing_snapshot = existing_snapshot.scalars().first()
+                .values(
+                    live_price=latest_price,
+                    profit_loss=profit_loss,
+                    percentage_change=change_percent,
+                    current_value=current_value,
+                    timestamp=utc_now  # ✅ Now UTC timestamp
+                )
+            )
+            print(f"🔄 Updated snapshot for {ticker}.")
+        else:
+            new_snapshot = StockAnalysisSnapshot(
+                user_id=user_id,
+                symbol=ticker,
+                name=stock.name,
+                purchase_price=purchase_price,
+                live_price=latest_price,
+                quantity=quantity,
+                profit_loss=profit_loss,
+                percentage_change=change_percent,
+                total_investment=total_investment,
+                current_value=current_value,
+                timestamp=utc_now  # ✅ Now UTC timestamp
+            )
+            db.add(new_snapshot)
+            print(f"✅ Inserted new snapshot for {ticker}.")
 
-                if existing_snapshot:
-                    await db.execute(
-                        update(StockAnalysisSnapshot)
-                        .where(StockAnalysisSnapshot.id == existing_snapshot.id)
-                        .values(
-                            live_price=latest_price,
-                            profit_loss=profit_loss,
-                            percentage_change=change_percent,
-                            current_value=current_value,
-                            timestamp=utc_now  # ✅ Now UTC timestamp
-                        )
-                    )
-                    print(f"🔄 Updated snapshot for {ticker}.")
-                else:
-                    new_snapshot = StockAnalysisSnapshot(
-                        user_id=user_id,
-                        symbol=ticker,
-                        name=stock.name,
-                        purchase_price=purchase_price,
-                        live_price=latest_price,
-                        quantity=quantity,
-                        profit_loss=profit_loss,
-                        percentage_change=change_percent,
-                        total_investment=total_investment,
-                        current_value=current_value,
-                        timestamp=utc_now  # ✅ Now UTC timestamp
-                    )
-                    db.add(new_snapshot)
-                    print(f"✅ Inserted new snapshot for {ticker}.")
 
-            except Exception as e:
-                print(f"❌ Error fetching data for {stock.symbol}: {e}")
+async def update_user_stocks(user_id: int, db: AsyncSession):
+    """
+    ✅ Updates stock analysis snapshots for one user and commits (the on-demand route).
+    """
+    try:
+        prices = {}
+        await stage_user_stocks(user_id, db, prices)
 
+        await publish_price_events(db, {ticker: {"current_price": price} for ticker, price in prices.items()})
+        await apply_price_deltas(db, prices)
         await db.commit()
         print("✅ Stock analysis snapshot updated successfully.")
 
+        await evaluate_price_ticks(db, prices)
+
     except Exception as e:
         await db.rollback()
         print(f"❌ Error updating stock snapshots for user {user_id}: {e}")
\ No newline at end of file
@@ -0,0 +1,205 @@
+# App/Services/trending_service.py
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert
+from App.Models.stock import TrendingStock, StockData
+from App.Schemas.stock import TrendingStockSchema
+from App.Services.quote_board import quote_board
+from datetime import datetime
+import heapq
+import os
+import threading
+import time
+
+
+TRENDING_TOP_K = int(os.getenv("TRENDING_TOP_K", 10))                      # Rows per list (gainers / losers / most active)
+TRENDING_FLUSH_SECONDS = int(os.getenv("TRENDING_FLUSH_SECONDS", 60))      # How often trending_stocks is rewritten
+TRENDING_CACHE_SECONDS = int(os.getenv("TRENDING_CACHE_SECONDS", 30))      # /stocks/trending response cache
+COMPACT_FACTOR = 4  # Rebuild a heap once stale entries outnumber live ones this many times over
+
+# list -> ranking key from (change, volume); None keeps the symbol out of that list
+METRICS = {
+    "gainers": lambda change, volume: change,
+    "losers": lambda change, volume: None if change is None else -change,
+    "most_active": lambda change, volume: volume,
+}
+
+
+class _LazyHeap:
+    """Max-heap of (key, symbol, version); an entry is live only while its version is the symbol's latest.
+
+    A tick pushes one entry (O(log n)) and leaves the superseded one in place; reads pop past
+    stale entries and drop them, and a compaction keeps the heap within COMPACT_FACTOR x live.
+    """
+
+    def __init__(self):
+        self.heap = []
+
+    def push(self, key: float, symbol: str, version: int):
+        heapq.heappush(self.heap, (-key, symbol, version))
+
+    def top(self, k: int, quotes: dict) -> list[str]:
+        live, symbols = [], []
+        while self.heap and len(symbols) < k:
+            entry = heapq.heappop(self.heap)
+            quote = quotes.get(entry[1])
+            if quote is not None and quote[4] == entry[2]:
+                live.append(entry)
+                symbols.append(entry[1])
+        for entry in live:
+            heapq.heappush(self.heap, entry)
+        return symbols
+
+    def compact(self, entries: list[tuple]):
+        self.heap = entries
+        heapq.heapify(self.heap)
+
+
+# ✅ Streaming top-k movers: per-tick heap pushes instead of sorting the universe
+class TrendingTracker:
+    def __init__(self, k: int = TRENDING_TOP_K):
+        self.k = k
+        self._quotes: dict[str, tuple] = {}  # symbol -> (name, price, change, volume, version)
+        self._heaps = {metric: _LazyHeap() for metric in METRICS}
+        self._version = 0
+        self._lock = threading.Lock()
+        self.dirty = False
+
+    def __len__(self):
+        return len(self._quotes)
+
+    def observe(self, symbol: str, price: float, change: float | None, volume: int | None, name: str | None = None):
+        """Fields passed as None keep their last observed value (price-only events)."""
+        if price is None:
+            return
+        with self._lock:
+            self._version += 1
+            previous = self._quotes.get(symbol)
+            if previous:
+                name = name or previous[0]
+                change = previous[2] if change is None else change
+                volume = previous[3] if volume is None else volume
+            self._quotes[symbol] = (name, float(price), change, volume, self._version)
+
+            for metric, ranking in METRICS.items():
+                key = ranking(change, volume)
+                if key is not None:
+                    self._heaps[metric].push(float(key), symbol, self._version)
+                    if len(self._heaps[metric].heap) > COMPACT_FACTOR * len(self._quotes) + 64:
+                        self._compact(metric)
+            self.dirty = True
+
+    def observe_quotes(self, quotes: dict[str, dict]):
+        """quote_service / feat_service field dicts keyed by symbol."""
+        for symbol, q in quotes.items():
+            self.observe(symbol, q.get("current_price"), q.get("percent_change"), q.get("volume"), q.get("company_name"))
+
+    def _compact(self, metric: str):
+        ranking = METRICS[metric]
+        entries = []
+        for symbol, (_, _, change, volume, version) in self._quotes.items():
+            key = ranking(change, volume)
+            if key is not None:
+                entries.append((-float(key), symbol, version))
+        self._heaps[metric].compact(entries)
+
+    def top(self, metric: str, k: int | None = None) -> list[dict]:
+        with self._lock:
+            symbols = self._heaps[metric].top(k or self.k, self._quotes)
+            return [self._row(symbol) for symbol in symbols]
+
+    def _row(self, symbol: str) -> dict:
+        name, price, change, volume, _ = self._quotes[symbol]
+        return {"symbol": symbol, "name": name or symbol, "price": price, "change": change or 0.0, "volume": int(volume or 0)}
+
+    def snapshot(self) -> tuple[int, dict[str, list[dict]]]:
+        """(version, top rows per list): pass the version to mark_flushed once the rows are stored."""
+        with self._lock:
+            version = self._version
+        return version, {metric: self.top(metric) for metric in METRICS}
+
+    def mark_flushed(self, version: int):
+        with self._lock:
+            if self._version == version:
+                self.dirty = False  # A tick that landed during the write keeps it dirty
+
+
+trending_tracker = TrendingTracker()
+
+
+# ✅ Start from the latest stored quotes so a fresh process ranks the whole universe, not just its own ticks
+async def seed_trending(db: AsyncSession) -> int:
+    result = await db.execute(
+        select(StockData.symbol, StockData.company_name, StockData.current_price, StockData.percent_change, StockData.volume)
+    )
+    for symbol, name, price, change, volume in result.all():
+        trending_tracker.observe(symbol, price, change, volume, name)
+    print(f"🔥 Trending tracker seeded with {len(trending_tracker)} symbol(s).")
+    return len(trending_tracker)
+
+
+# ✅ Upsert the current top-k union in one statement, then drop rows that fell out of every list
+async def flush_trending(db: AsyncSession) -> int:
+    """Run from one process only (the scheduler gates it): each worker's tracker is a slightly different view."""
+    if not trending_tracker.dirty:
+        return 0
+
+    now = datetime.utcnow()
+    version, snapshot = trending_tracker.snapshot()
+    rows = {}
+    for metric_rows in snapshot.values():
+        for row in metric_rows:
+            rows[row["symbol"]] = {**row, "last_updated": now}
+    if not rows:
+        trending_tracker.mark_flushed(version)
+        return 0
+
+    stmt = insert(TrendingStock).values(list(rows.values()))
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["symbol"],
+            set_={
+                "name": stmt.excluded.name,
+                "price": stmt.excluded.price,
+                "change": stmt.excluded.change,
+                "volume": stmt.excluded.volume,
+                "last_updated": stmt.excluded.last_updated,
+            }
+        )
+    )
+    await db.execute(delete(TrendingStock).where(TrendingStock.symbol.not_in(list(rows))))
+    await db.commit()
+    trending_tracker.mark_flushed(version)
+    return len(rows)
+
+
+_cache = {"at": 0.0, "limit": None, "data": None}
+
+
+def invalidate_trending_cache():
+    _cache["at"] = 0.0
+
+
+async def get_trending(db: AsyncSession, limit: int = TRENDING_TOP_K) -> dict:
+    """Gainers, losers and most active from trending_stocks, cached for TRENDING_CACHE_SECONDS."""
+    if _cache["limit"] == limit and time.monotonic() - _cache["at"] < TRENDING_CACHE_SECONDS:
+        return _cache["data"]
+
+    result = await db.execute(select(TrendingStock))
+    rows = [TrendingStockSchema.model_validate(row).model_dump() for row in result.scalars().all()]
+    for row in rows:
+        live = quote_board.get(row["symbol"])
+        if live and live["last_updated"] > row["last_updated"]:
+            row.update(price=live["current_price"], change=live["percent_change"] or row["change"], volume=live["volume"])
+
+    # The table only holds the top-k union, so ranking it here is a few dozen rows
+    data = {
+        "gainers": sorted((r for r in rows if r["change"] > 0), key=lambda r: r["change"], reverse=True)[:limit],
+        "losers": sorted((r for r in rows if r["change"] < 0), key=lambda r: r["change"])[:limit],
+        "most_active": sorted(rows, key=lambda r: r["volume"], reverse=True)[:limit],
+        "last_updated": max((r["last_updated"] for r in rows), default=None),
+    }
+    _cache.update(at=time.monotonic(), limit=limit, data=data)
+    return data
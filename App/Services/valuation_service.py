@@ -0,0 +1,171 @@
+# App/Services/valuation_service.py
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import insert, delete
+from App.Models.stock import UserStock, PortfolioSnapshot
+from App.Services.history_store import history_store, day_ts
+from App.Services.partition_service import ensure_partition_range, retention_start
+from datetime import datetime, date, timedelta
+from typing import Optional
+import numpy as np
+import pandas as pd
+import os
+
+
+DAY_SECONDS = 86400
+MAX_VALUATION_DAYS = 3660  # ~10 years of daily points per request
+SNAPSHOT_BACKFILL_USERS = int(os.getenv("SNAPSHOT_BACKFILL_USERS", 500))  # Users valued per dates x holdings pass
+SNAPSHOT_INSERT_ROWS = 5000
+
+
+def day_stamps(start: date, end: date) -> np.ndarray:
+    """Every calendar day in [start, end] as 00:00 UTC epoch seconds (the history store's bar key)."""
+    return np.arange(day_ts(start), day_ts(end) + 1, DAY_SECONDS, dtype="<i8")
+
+
+# ✅ Last close on or before each date, per symbol: one searchsorted per symbol over its whole date series
+def asof_prices(symbols: list[str], stamps: np.ndarray) -> np.ndarray:
+    """dates x symbols matrix of as-of closes; NaN before a symbol's first stored bar."""
+    prices = np.full((len(stamps), len(symbols)), np.nan)
+    if not len(stamps):
+        return prices
+    end = pd.Timestamp(int(stamps[-1]), unit="s").to_pydatetime()
+    for column, symbol in enumerate(symbols):
+        bars = history_store.read(symbol, None, end)
+        if not len(bars):
+            continue
+        index = np.searchsorted(bars["ts"], stamps, side="right") - 1
+        found = index >= 0
+        prices[found, column] = bars["close"][index[found]]
+    return prices
+
+
+def value_holdings(holdings: pd.DataFrame, stamps: np.ndarray, prices: Optional[pd.DataFrame] = None):
+    """Per-user invested and market value at every date, in one dates x holdings pass.
+
+    holdings: user_id, symbol, purchase_price, quantity, purchase_ts (epoch seconds, 0 if unknown).
+    A holding counts from its purchase day on; before its first stored bar it is valued at cost.
+    prices: optional dates x symbols as-of closes already read for these stamps (shared across batches).
+    Returns (user_ids, invested, value) with the two matrices shaped dates x users.
+    """
+    holdings = holdings.sort_values("user_id", kind="stable")
+    if prices is None:
+        symbols = list(dict.fromkeys(holdings["symbol"]))
+        prices = pd.DataFrame(asof_prices(symbols, stamps), columns=symbols)
+
+    prices = prices.to_numpy()[:, prices.columns.get_indexer(holdings["symbol"])]            # dates x holdings
+    cost = holdings["purchase_price"].to_numpy(dtype="f8")
+    prices = np.where(np.isnan(prices), cost, prices)
+
+    purchase_day = holdings["purchase_ts"].to_numpy(dtype="<i8") // DAY_SECONDS * DAY_SECONDS
+    held = (stamps[:, None] >= purchase_day[None, :]) * holdings["quantity"].to_numpy(dtype="f8")  # dates x holdings
+
+    user_ids, starts = np.unique(holdings["user_id"].to_numpy(), return_index=True)
+    if not len(user_ids):
+        empty = np.zeros((len(stamps), 0))
+        return user_ids, empty, empty
+    invested = np.add.reduceat(held * cost, starts, axis=1)
+    value = np.add.reduceat(held * prices, starts, axis=1)
+    return user_ids, invested, value
+
+
+async def load_dated_holdings(db: AsyncSession, user_ids: Optional[list[int]] = None) -> pd.DataFrame:
+    query = select(UserStock.user_id, UserStock.symbol, UserStock.purchase_price, UserStock.quantity, UserStock.purchase_date)
+    if user_ids is not None:
+        query = query.where(UserStock.user_id.in_(user_ids))
+    result = await db.execute(query)
+
+    frame = pd.DataFrame(result.all(), columns=["user_id", "symbol", "purchase_price", "quantity", "purchase_date"])
+    purchased = pd.to_datetime(frame["purchase_date"])
+    frame["purchase_ts"] = np.where(purchased.isna(), 0, purchased.values.astype("datetime64[s]").astype("<i8"))
+    return frame.drop(columns="purchase_date")
+
+
+# ✅ A user's daily portfolio curve over [start, end] (start == end answers "worth on that day")
+async def portfolio_value_series(db: AsyncSession, user_id: int, start: Optional[date] = None, end: Optional[date] = None) -> dict:
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=365)
+    start = max(start, end - timedelta(days=MAX_VALUATION_DAYS - 1))
+    stamps = day_stamps(start, end)
+
+    holdings = await load_dated_holdings(db, [user_id])
+    _, invested, value = value_holdings(holdings, stamps)
+    invested = invested[:, 0] if invested.shape[1] else np.zeros(len(stamps))
+    value = value[:, 0] if value.shape[1] else np.zeros(len(stamps))
+
+    return {
+        "dates": stamps.astype("datetime64[s]").astype("datetime64[D]").astype(str).tolist(),
+        "total_investment": np.round(invested, 2).tolist(),
+        "current_value": np.round(value, 2).tolist(),
+        "total_profit_loss": np.round(value - invested, 2).tolist(),
+    }
+
+
+# ✅ Regenerate every user's daily snapshot series in [start, end]: one price read, then batches of users
+async def backfill_portfolio_snapshots(db: AsyncSession, start: Optional[date] = None, end: Optional[date] = None) -> int:
+    """One row per user per day (00:00 UTC, the bar key), replacing whatever the range held.
+
+    Defaults: end is yesterday, start is the earliest known purchase; both are clipped to snapshot retention.
+    """
+    end = end or datetime.utcnow().date() - timedelta(days=1)
+    holdings = await load_dated_holdings(db)
+    if holdings.empty:
+        return 0
+
+    known = holdings["purchase_ts"][holdings["purchase_ts"] > 0]
+    first_purchase = pd.Timestamp(int(known.min()), unit="s").date() if len(known) else end - timedelta(days=365)
+    start = start or first_purchase
+    kept = retention_start("portfolio_snapshots")
+    if kept is not None:
+        start = max(start, kept)
+    if start > end:
+        return 0
+
+    stamps = day_stamps(start, end)
+    symbols = list(dict.fromkeys(holdings["symbol"]))
+    prices = pd.DataFrame(asof_prices(symbols, stamps), columns=symbols)  # Every symbol read once for all users
+    created_at = pd.to_datetime(stamps, unit="s").to_pydatetime()
+    range_start, range_end = datetime.combine(start, datetime.min.time()), datetime.combine(end + timedelta(days=1), datetime.min.time())
+
+    await ensure_partition_range(db, "portfolio_snapshots", start, end)
+
+    all_users = np.unique(holdings["user_id"].to_numpy())
+    written = 0
+    for offset in range(0, len(all_users), SNAPSHOT_BACKFILL_USERS):
+        batch = all_users[offset:offset + SNAPSHOT_BACKFILL_USERS]
+        user_ids, invested, value = value_holdings(holdings[holdings["user_id"].isin(batch)], stamps, prices)
+
+        # 🧹 Replaces the ad-hoc rows (gaps, duplicates) the performance endpoint left in the range
+        await db.execute(
+            delete(PortfolioSnapshot)
+            .where(PortfolioSnapshot.user_id.in_(batch.tolist()))
+            .where(PortfolioSnapshot.created_at >= range_start)
+            .where(PortfolioSnapshot.created_at < range_end)
+        )
+
+        day_index, user_index = np.nonzero(invested > 0)  # Days before a user's first purchase get no row
+        investment = invested[day_index, user_index]
+        current = value[day_index, user_index]
+        profit_loss = current - investment
+        rows = [
+            {
+                "user_id": user_id,
+                "total_investment": total_investment,
+                "current_value": current_value,
+                "total_profit_loss": total_profit_loss,
+                "overall_change": overall_change,
+                "created_at": created_at[day],
+            }
+            for user_id, day, total_investment, current_value, total_profit_loss, overall_change in zip(
+                user_ids[user_index].tolist(), day_index.tolist(), investment.tolist(),
+                current.tolist(), profit_loss.tolist(), (profit_loss / investment * 100).tolist()
+            )
+        ]
+        for chunk in range(0, len(rows), SNAPSHOT_INSERT_ROWS):
+            await db.execute(insert(PortfolioSnapshot), rows[chunk:chunk + SNAPSHOT_INSERT_ROWS])
+        await db.commit()
+        written += len(rows)
+
+    print(f"📸 Backfilled {written} portfolio snapshot(s) for {len(all_users)} user(s), {start} to {end}.")
+    return written
@@ -10,6 +10,14 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 CELERY_ENABLE_UTC = True
 
+CELERY_INCLUDE = ['App.tasks.update_snapshots', 'App.tasks.notifications']
+
+# Push delivery gets its own queue so a slow endpoint never delays other tasks:
+#   celery -A App.celery_worker worker -Q notifications
+CELERY_TASK_ROUTES = {
+    'App.tasks.notifications.*': {'queue': 'notifications'},
+}
+
 
 CELERYBEAT_SCHEDULE = {
     # 'update_snapshots_every_2h': {
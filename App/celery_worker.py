@@ -5,6 +5,8 @@ from App.celery_config import (
     CELERY_BROKER_URL,
     CELERY_RESULT_BACKEND,
     CELERY_TIMEZONE,
+    CELERY_INCLUDE,
+    CELERY_TASK_ROUTES,
     CELERYBEAT_SCHEDULE,
 )
 
@@ -15,6 +17,8 @@ celery.config_from_object({
     'result_backend': CELERY_RESULT_BACKEND,
     'timezone': CELERY_TIMEZONE,
     'enable_utc': True,
+    'include': CELERY_INCLUDE,
+    'task_routes': CELERY_TASK_ROUTES,
 })
 
 celery.conf.beat_schedule = CELERYBEAT_SCHEDULE
@@ -0,0 +1,87 @@
+# tasks/notifications.py
+
+from App.celery_worker import celery
+from App.tasks.worker_loop import run_async, worker_session
+from App.Services.notification_service import (
+    alert_payload, claim_alerts, release_claims, cooldown_key, build_messages, record_delivery, device_tokens, get_transport
+)
+import asyncio
+import os
+
+
+NOTIFY_MAX_RETRIES = int(os.getenv("NOTIFY_MAX_RETRIES", 5))
+NOTIFY_RETRY_BASE_SECONDS = int(os.getenv("NOTIFY_RETRY_BASE_SECONDS", 5))
+
+
+def _backoff(retries: int) -> int:
+    return min(NOTIFY_RETRY_BASE_SECONDS * 2 ** retries, 600)
+
+
+def _send(messages: list[dict]) -> list[dict]:
+    """Hand one batch to the transport; returns the messages still to deliver."""
+    try:
+        failed = get_transport().send(messages)
+    except Exception as e:
+        print(f"❌ Push batch of {len(messages)} failed: {e}")
+        failed = messages
+
+    failed_ids = {id(message) for message in failed}
+    record_delivery([message for message in messages if id(message) not in failed_ids])
+    return failed
+
+
+async def _tokens_for(user_ids):
+    async with worker_session() as session:
+        return await device_tokens(session, user_ids)
+
+
+@celery.task(bind=True, max_retries=NOTIFY_MAX_RETRIES)
+def send_push_batch(self, messages: list[dict]):
+    failed = _send(messages)
+    if not failed:
+        return len(messages)
+
+    if self.request.retries >= self.max_retries:
+        record_delivery([], failed=len(failed))
+        release_claims(key for message in failed for key in message.get("cooldown", []))
+        print(f"❌ Dropping {len(failed)} push message(s) after {self.request.retries} retries.")
+        return len(messages) - len(failed)
+
+    # 🔁 Only what failed is retried, with exponential backoff
+    raise self.retry(args=[failed], countdown=_backoff(self.request.retries))
+
+
+# ✅ One task per evaluation pass: dedupe, look up devices, one batch per destination set
+@celery.task
+def deliver_alert_notifications(alerts: list[dict]):
+    alerts = claim_alerts(alerts)
+    if not alerts:
+        return 0
+
+    try:
+        tokens = run_async(_tokens_for({alert["user_id"] for alert in alerts}))
+    except Exception:
+        release_claims(cooldown_key(alert) for alert in alerts)  # Nothing was sent: don't hold the cooldown
+        raise
+
+    messages = build_messages(alerts, tokens)
+    if not messages:
+        print(f"📭 {len(alerts)} alert(s) triggered for users without a registered device.")
+        return 0
+
+    failed = _send(messages)
+    if failed:
+        send_push_batch.apply_async(args=[failed], countdown=_backoff(0))
+    print(f"📨 Delivered {len(messages) - len(failed)}/{len(messages)} push message(s) for {len(alerts)} alert(s).")
+    return len(messages) - len(failed)
+
+
+async def enqueue_alert_notifications(triggered: list[dict]):
+    """Publish triggered alerts to the notifications queue; never blocks or fails the caller's pipeline."""
+    if not triggered:
+        return
+    try:
+        payload = [alert_payload(alert) for alert in triggered]
+        await asyncio.to_thread(deliver_alert_notifications.apply_async, args=[payload], retry=False)
+    except Exception as e:
+        print(f"❌ Could not enqueue {len(triggered)} alert notification(s): {e}")
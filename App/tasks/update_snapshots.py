@@ -1,19 +1,24 @@
 # tasks/update_snapshots.py
 
 from App.celery_worker import celery
-from App.Config.database import get_db
+from App.tasks.worker_loop import run_async, worker_session
+from App.Services.run_ledger import run_checkpointed
+from App.Services.history_store import record_frame
+from App.Services.alert_service import load_alert_index, evaluate_price_ticks
+from App.Services.price_events import publish_price_events
+from App.Services.portfolio_aggregates import apply_price_deltas
+from App.Services.valuation_service import backfill_portfolio_snapshots
 from App.Models.user import User
 from App.Models.stock import StockAnalysisSnapshot, UserStock
 from sqlalchemy.future import select
 from sqlalchemy import update
 import yfinance as yf
-from datetime import datetime, timedelta
-import asyncio
+from datetime import datetime, date, timedelta
 
 
 
 
-async def _update_user_snapshot(user_id: int, db):
+async def _update_user_snapshot(user_id: int, db, prices: dict | None = None):
     result = await db.execute(select(UserStock).where(UserStock.user_id == user_id))
     user_stocks = result.scalars().all()
 
@@ -41,12 +46,15 @@ async def _update_user_snapshot(user_id: int, db):
         try:
             print(f"📈 Fetching data for {ticker}")
             info = yf.Ticker(ticker).history(period="2d")
+            record_frame(ticker, info)
 
             if info.empty or len(info) < 2:
                 print(f"❌ Not enough data for {ticker}. Skipping.")
                 continue
 
             latest_price = info["Close"].iloc[-1]
+            if prices is not None:
+                prices[ticker] = float(latest_price)
             prev_price = info["Close"].iloc[-2]
             pct_change = round(((latest_price - prev_price) / prev_price) * 100, 2)
 
@@ -69,7 +77,10 @@ async def _update_user_snapshot(user_id: int, db):
             if snapshot:
                 await db.execute(
                     update(StockAnalysisSnapshot)
-                    .where(StockAnalysisSnapshot.id == snapshot.id)
+                    .where(
+                        StockAnalysisSnapshot.id == snapshot.id,
+                        StockAnalysisSnapshot.timestamp == snapshot.timestamp  # Prunes to one partition
+                    )
                     .values(
                         live_price=latest_price,
                         profit_loss=profit_loss,
@@ -105,15 +116,38 @@ async def _update_user_snapshot(user_id: int, db):
 @celery.task
 def update_all_users_snapshots():
     print("📡 Starting scheduled update...")
-    asyncio.run(_run_update_task())
+    run_async(_run_update_task())  # ✅ Reuses this worker's loop and connection pool
 
 async def _run_update_task():
-    async for session in get_db():
-        user_ids = (await session.execute(select(User.id))).scalars().all()
+    async with worker_session() as session:
+        await load_alert_index(session)  # Rules may have changed since this worker last ran
+        prices = {}
+
+        # ✅ Snapshots added per user are committed with each chunk's checkpoint
+        await run_checkpointed(
+            session, "user_snapshots",
+            lambda user_id, db: _update_user_snapshot(user_id, db, prices)
+        )
+        print("✅ All users updated.")
 
-        for user_id in user_ids:
-            print(f"👤 Updating stocks for user: {user_id}")
-            await _update_user_snapshot(user_id, session)
-        
+        # 📡 API workers apply the prices this job saw to their caches
+        await publish_price_events(session, {ticker: {"current_price": price} for ticker, price in prices.items()})
+        await apply_price_deltas(session, prices)
         await session.commit()
-        print("✅ All users updated.")
+
+        # 🔔 Alerts are evaluated after the checkpointed run so they never commit half a chunk
+        await evaluate_price_ticks(session, prices)
+
+
+# ✅ Full regeneration of every user's daily portfolio series (dates as "YYYY-MM-DD", both optional)
+@celery.task
+def backfill_portfolio_snapshot_series(start: str | None = None, end: str | None = None):
+    print("📸 Backfilling portfolio snapshot series...")
+    return run_async(_run_snapshot_backfill(
+        date.fromisoformat(start) if start else None,
+        date.fromisoformat(end) if end else None
+    ))
+
+async def _run_snapshot_backfill(start, end):
+    async with worker_session() as session:
+        return await backfill_portfolio_snapshots(session, start, end)
@@ -0,0 +1,57 @@
+# tasks/worker_loop.py
+
+from celery.signals import worker_process_init, worker_process_shutdown
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from App.Config.database import DATABASE_URL, engine as parent_engine
+import asyncio
+
+
+# One event loop + engine per worker process, reused by every task it runs.
+# Meant for the prefork (default) and solo pools, where tasks run one at a time per process.
+_loop = None
+_engine = None
+_session_factory = None
+
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    global _loop, _engine, _session_factory
+
+    # 🔌 Pool connections inherited from the parent across fork must never be reused here
+    parent_engine.sync_engine.dispose(close=False)
+
+    _loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_loop)
+
+    _engine = create_async_engine(DATABASE_URL, pool_pre_ping=True)
+    _session_factory = async_sessionmaker(bind=_engine, class_=AsyncSession, expire_on_commit=False)
+    print("🧵 Worker event loop and DB engine initialized.")
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_process(**kwargs):
+    global _loop, _engine, _session_factory
+
+    if _loop is None:
+        return
+
+    if _engine is not None:
+        _loop.run_until_complete(_engine.dispose())
+    _loop.close()
+    _loop = _engine = _session_factory = None
+    print("🧵 Worker event loop and DB engine disposed.")
+
+
+def run_async(coro):
+    """Run a coroutine to completion on this process's long-lived loop."""
+    if _loop is None:
+        # Solo pool / eager mode never fires worker_process_init
+        init_worker_process()
+    return _loop.run_until_complete(coro)
+
+
+def worker_session() -> AsyncSession:
+    """New session bound to this process's engine (use inside run_async coroutines)."""
+    if _session_factory is None:
+        init_worker_process()
+    return _session_factory()
@@ -0,0 +1,61 @@
+"""Create refresh run ledger tables
+
+Revision ID: 3473b1a2ebaa
+Revises: 7157acbf5575
+Create Date: 2026-10-19 09:12:41.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3473b1a2ebaa'
+down_revision: Union[str, None] = '7157acbf5575'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('refresh_runs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('job_name', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('cursor', sa.Integer(), nullable=False),
+    sa.Column('chunk_size', sa.Integer(), nullable=False),
+    sa.Column('chunks_completed', sa.Integer(), nullable=False),
+    sa.Column('users_processed', sa.Integer(), nullable=False),
+    sa.Column('users_failed', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_refresh_runs_id'), 'refresh_runs', ['id'], unique=False)
+    op.create_index(op.f('ix_refresh_runs_job_name'), 'refresh_runs', ['job_name'], unique=False)
+    op.create_table('refresh_run_chunks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('run_id', sa.Integer(), nullable=False),
+    sa.Column('chunk_index', sa.Integer(), nullable=False),
+    sa.Column('first_user_id', sa.Integer(), nullable=False),
+    sa.Column('last_user_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('processed', sa.Integer(), nullable=False),
+    sa.Column('failed', sa.Integer(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['run_id'], ['refresh_runs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('run_id', 'chunk_index', name='uq_refresh_run_chunk')
+    )
+    op.create_index(op.f('ix_refresh_run_chunks_id'), 'refresh_run_chunks', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_refresh_run_chunks_id'), table_name='refresh_run_chunks')
+    op.drop_table('refresh_run_chunks')
+    op.drop_index(op.f('ix_refresh_runs_job_name'), table_name='refresh_runs')
+    op.drop_index(op.f('ix_refresh_runs_id'), table_name='refresh_runs')
+    op.drop_table('refresh_runs')
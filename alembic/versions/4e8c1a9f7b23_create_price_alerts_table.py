@@ -0,0 +1,44 @@
+"""Create price_alerts table
+
+Revision ID: 4e8c1a9f7b23
+Revises: d2f7b9e04a61
+Create Date: 2026-10-19 18:05:31.227460
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4e8c1a9f7b23'
+down_revision: Union[str, None] = 'd2f7b9e04a61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('price_alerts',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('symbol', sa.String(), nullable=False),
+    sa.Column('direction', sa.String(), nullable=False),
+    sa.Column('threshold', sa.Float(), nullable=False),
+    sa.Column('active', sa.Boolean(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('triggered_at', sa.DateTime(), nullable=True),
+    sa.Column('triggered_price', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_price_alerts_id'), 'price_alerts', ['id'], unique=False)
+    op.create_index(op.f('ix_price_alerts_user_id'), 'price_alerts', ['user_id'], unique=False)
+    op.create_index('ix_price_alerts_active_symbol', 'price_alerts', ['active', 'symbol'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_price_alerts_active_symbol', table_name='price_alerts')
+    op.drop_index(op.f('ix_price_alerts_user_id'), table_name='price_alerts')
+    op.drop_index(op.f('ix_price_alerts_id'), table_name='price_alerts')
+    op.drop_table('price_alerts')
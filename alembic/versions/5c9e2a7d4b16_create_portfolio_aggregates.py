@@ -0,0 +1,54 @@
+"""Create portfolio_aggregates and index user_stocks by symbol
+
+Revision ID: 5c9e2a7d4b16
+Revises: b7d3e58c2f10
+Create Date: 2026-10-19 20:31:47.102953
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c9e2a7d4b16'
+down_revision: Union[str, None] = 'b7d3e58c2f10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('portfolio_aggregates',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('total_investment', sa.Float(), nullable=False),
+    sa.Column('current_value', sa.Float(), nullable=False),
+    sa.Column('holdings', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.add_column('user_stocks', sa.Column('mark_price', sa.Float(), nullable=True))
+    op.create_index(op.f('ix_user_stocks_symbol'), 'user_stocks', ['symbol'], unique=False)
+
+    # Value every holding at its latest known price, then total per user
+    op.execute("""
+        UPDATE user_stocks us
+        SET mark_price = COALESCE(sd.current_price, s.price, us.purchase_price)
+        FROM user_stocks u
+        LEFT JOIN stock_data sd ON sd.symbol = u.symbol
+        LEFT JOIN stocks s ON s.symbol = u.symbol
+        WHERE u.id = us.id
+    """)
+    op.execute("""
+        INSERT INTO portfolio_aggregates (user_id, total_investment, current_value, holdings, updated_at)
+        SELECT user_id, SUM(purchase_price * quantity), SUM(mark_price * quantity), COUNT(*), now() AT TIME ZONE 'utc'
+        FROM user_stocks
+        GROUP BY user_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_user_stocks_symbol'), table_name='user_stocks')
+    op.drop_column('user_stocks', 'mark_price')
+    op.drop_table('portfolio_aggregates')
@@ -0,0 +1,64 @@
+"""Move watchlist arrays to watchlist_items
+
+Revision ID: 6512eb231c79
+Revises: 3473b1a2ebaa
+Create Date: 2026-10-19 11:40:07.532915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '6512eb231c79'
+down_revision: Union[str, None] = '3473b1a2ebaa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('watchlist_items',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('symbol', sa.String(), nullable=False),
+    sa.Column('added_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'symbol')
+    )
+    op.create_index('ix_watchlist_items_symbol_user_id', 'watchlist_items', ['symbol', 'user_id'], unique=False)
+
+    # The watchlist table was created by create_all, so it may not exist on a fresh database
+    if sa.inspect(op.get_bind()).has_table('watchlist'):
+        op.execute("""
+            INSERT INTO watchlist_items (user_id, symbol, added_at)
+            SELECT user_id, symbol, MIN(added_at)
+            FROM (
+                SELECT user_id, UNNEST(stocks) AS symbol, COALESCE(created_at, NOW()) AS added_at
+                FROM watchlist
+            ) AS items
+            WHERE symbol IS NOT NULL
+            GROUP BY user_id, symbol
+        """)
+        op.drop_table('watchlist')
+
+
+def downgrade() -> None:
+    op.create_table('watchlist',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('stocks', postgresql.ARRAY(sa.String()), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_watchlist_id'), 'watchlist', ['id'], unique=False)
+    op.execute("""
+        INSERT INTO watchlist (user_id, stocks, created_at, updated_at)
+        SELECT user_id, ARRAY_AGG(symbol ORDER BY added_at), MIN(added_at), MAX(added_at)
+        FROM watchlist_items
+        GROUP BY user_id
+    """)
+    op.drop_index('ix_watchlist_items_symbol_user_id', table_name='watchlist_items')
+    op.drop_table('watchlist_items')
@@ -0,0 +1,163 @@
+"""Partition snapshot and history tables by month
+
+Revision ID: 9a41c2e7d3b8
+Revises: c45a5b1ff1f0
+Create Date: 2026-10-19 16:42:10.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a41c2e7d3b8'
+down_revision: Union[str, None] = 'c45a5b1ff1f0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+MONTHS_AHEAD = 3
+
+
+def _columns(table):
+    id_column = sa.Column('id', sa.Integer(), server_default=sa.text(f"nextval('{table}_id_seq')"), nullable=False)
+    if table == 'stock_analysis_snapshots':
+        return [
+            id_column,
+            sa.Column('user_id', sa.Integer(), nullable=True),
+            sa.Column('symbol', sa.String(), nullable=True),
+            sa.Column('name', sa.String(), nullable=True),
+            sa.Column('purchase_price', sa.Float(), nullable=True),
+            sa.Column('live_price', sa.Float(), nullable=True),
+            sa.Column('quantity', sa.Integer(), nullable=True),
+            sa.Column('profit_loss', sa.Float(), nullable=True),
+            sa.Column('percentage_change', sa.Float(), nullable=True),
+            sa.Column('total_investment', sa.Float(), nullable=True),
+            sa.Column('current_value', sa.Float(), nullable=True),
+            sa.Column('timestamp', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['symbol'], ['stocks.symbol']),
+        ]
+    if table == 'portfolio_snapshots':
+        return [
+            id_column,
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('total_investment', sa.Float(), nullable=False),
+            sa.Column('current_value', sa.Float(), nullable=False),
+            sa.Column('total_profit_loss', sa.Float(), nullable=False),
+            sa.Column('overall_change', sa.Float(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        ]
+    return [
+        id_column,
+        sa.Column('symbol', sa.String(), nullable=False),
+        sa.Column('company_name', sa.String(), nullable=True),
+        sa.Column('recorded_at', sa.DateTime(), nullable=False),
+        sa.Column('current_price', sa.Float(), nullable=False),
+        sa.Column('previous_close_price', sa.Float(), nullable=True),
+        sa.Column('percent_change', sa.Float(), nullable=True),
+        sa.Column('high_24h', sa.Float(), nullable=True),
+        sa.Column('low_24h', sa.Float(), nullable=True),
+        sa.Column('volume', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['symbol'], ['stock_data.symbol']),
+    ]
+
+
+# table -> (partition key, indexes as (name, columns))
+TABLES = {
+    'stock_analysis_snapshots': ('timestamp', [
+        ('ix_stock_analysis_snapshots_id', ['id']),
+        ('ix_stock_analysis_snapshots_symbol', ['symbol']),
+        ('ix_stock_analysis_snapshots_symbol_timestamp', ['symbol', 'timestamp']),
+    ]),
+    'portfolio_snapshots': ('created_at', [
+        ('ix_portfolio_snapshots_user_id_created_at', ['user_id', 'created_at']),
+    ]),
+    'stock_history': ('recorded_at', [
+        ('ix_stock_history_id', ['id']),
+        ('ix_stock_history_symbol', ['symbol']),
+    ]),
+}
+
+
+def _create_month_partitions(table, key):
+    # One partition per month from the oldest row through MONTHS_AHEAD months from now
+    op.execute(f"""
+        DO $$
+        DECLARE
+            month date;
+        BEGIN
+            FOR month IN
+                SELECT generate_series(
+                    date_trunc('month', LEAST(COALESCE((SELECT MIN("{key}") FROM "{table}_unpartitioned"), NOW()), NOW())),
+                    date_trunc('month', NOW()) + interval '{MONTHS_AHEAD} months',
+                    interval '1 month'
+                )::date
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF "{table}" FOR VALUES FROM (%L) TO (%L)',
+                    '{table}_p' || to_char(month, 'YYYYMM'), month, (month + interval '1 month')::date
+                );
+            END LOOP;
+        END $$;
+    """)
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    for table, (key, indexes) in TABLES.items():
+        exists = inspector.has_table(table)
+        if exists:
+            op.rename_table(table, f'{table}_unpartitioned')
+            op.execute(f'ALTER TABLE "{table}_unpartitioned" RENAME CONSTRAINT "{table}_pkey" TO "{table}_unpartitioned_pkey"')
+            op.execute(f'ALTER SEQUENCE IF EXISTS "{table}_id_seq" OWNED BY NONE')
+            for name, _ in indexes:
+                op.execute(f'DROP INDEX IF EXISTS "{name}"')
+        else:
+            op.execute(f'CREATE TABLE "{table}_unpartitioned" ("{key}" timestamp)')  # Empty stand-in for the copy
+        op.execute(f'CREATE SEQUENCE IF NOT EXISTS "{table}_id_seq"')
+
+        op.create_table(table,
+        *_columns(table),
+        sa.PrimaryKeyConstraint('id', key, name=f'{table}_pkey'),
+        postgresql_partition_by=f'RANGE ({key})'
+        )
+        _create_month_partitions(table, key)
+
+        # Copy existing rows; ids are preserved and the sequence carries on from them
+        if exists:
+            columns = ', '.join(f'"{column.name}"' for column in _columns(table) if isinstance(column, sa.Column))
+            values = columns.replace(f'"{key}"', f'COALESCE("{key}", NOW())')
+            op.execute(f'INSERT INTO "{table}" ({columns}) SELECT {values} FROM "{table}_unpartitioned"')
+
+        op.execute(f'ALTER SEQUENCE "{table}_id_seq" OWNED BY "{table}".id')
+        op.drop_table(f'{table}_unpartitioned')
+
+        for name, columns in indexes:
+            op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    for table, (key, indexes) in TABLES.items():
+        op.rename_table(table, f'{table}_partitioned')
+        op.execute(f'ALTER TABLE "{table}_partitioned" RENAME CONSTRAINT "{table}_pkey" TO "{table}_partitioned_pkey"')
+        op.execute(f'ALTER SEQUENCE "{table}_id_seq" OWNED BY NONE')
+        for name, _ in indexes:
+            op.execute(f'DROP INDEX IF EXISTS "{name}"')
+
+        op.create_table(table,
+        *_columns(table),
+        sa.PrimaryKeyConstraint('id', name=f'{table}_pkey')
+        )
+
+        columns = ', '.join(f'"{column.name}"' for column in _columns(table) if isinstance(column, sa.Column))
+        op.execute(f'INSERT INTO "{table}" ({columns}) SELECT {columns} FROM "{table}_partitioned"')
+        op.execute(f'ALTER SEQUENCE "{table}_id_seq" OWNED BY "{table}".id')
+        op.drop_table(f'{table}_partitioned')  # Drops every monthly partition with it
+
+        for name, columns in indexes:
+            op.create_index(name, table, columns, unique=False)
@@ -0,0 +1,26 @@
+"""Add resume_count to refresh_runs
+
+Revision ID: a8e3f1c9d2b7
+Revises: 5c9e2a7d4b16
+Create Date: 2026-10-19 22:14:08.531276
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8e3f1c9d2b7'
+down_revision: Union[str, None] = '5c9e2a7d4b16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('refresh_runs', sa.Column('resume_count', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('refresh_runs', 'resume_count')
@@ -0,0 +1,44 @@
+"""Create active_symbols table
+
+Revision ID: c45a5b1ff1f0
+Revises: 6512eb231c79
+Create Date: 2026-10-19 13:05:52.640311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c45a5b1ff1f0'
+down_revision: Union[str, None] = '6512eb231c79'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('active_symbols',
+    sa.Column('symbol', sa.String(), nullable=False),
+    sa.Column('holder_count', sa.Integer(), nullable=False),
+    sa.Column('watcher_count', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('symbol')
+    )
+
+    # Seed the ref counts: distinct holders (not lots) and watchlist rows
+    op.execute("""
+        INSERT INTO active_symbols (symbol, holder_count, watcher_count, updated_at)
+        SELECT symbol, SUM(holders), SUM(watchers), NOW()
+        FROM (
+            SELECT symbol, COUNT(DISTINCT user_id) AS holders, 0 AS watchers FROM user_stocks GROUP BY symbol
+            UNION ALL
+            SELECT symbol, 0 AS holders, COUNT(*) AS watchers FROM watchlist_items GROUP BY symbol
+        ) AS counts
+        GROUP BY symbol
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('active_symbols')